@@ -0,0 +1,95 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Benchmark the final store of collected objects
+
+Stores the same object stores in a new provenance database with one
+AlchemyProxy.store per table (the previous Collector.store), and with a
+single BulkWriter transaction. Reports rows per second per table.
+
+Usage: python benchmarks/bench_bulk_store.py [rows]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import shutil
+import sys
+import tempfile
+import time
+
+
+def create_stores(count):
+    """Create object stores with count objects per table"""
+    from noworkflow.now.persistence.lightweight import ObjectStore
+    from noworkflow.now.persistence.lightweight import CodeComponentLW
+    from noworkflow.now.persistence.lightweight import DependencyLW
+    from noworkflow.now.persistence.lightweight import EvaluationLW
+    from noworkflow.now.persistence.lightweight import MemberLW
+    stores = [
+        ObjectStore(CodeComponentLW), ObjectStore(EvaluationLW),
+        ObjectStore(DependencyLW), ObjectStore(MemberLW),
+    ]
+    components, evaluations, dependencies, members = stores
+    for index in range(1, count + 1):
+        components.add("t", "x{}".format(index), "name", "w", index, 0,
+                       index, 4, -1)
+        evaluations.add("t", index, index, 0.5 + index, repr(index))
+        dependencies.add("t", 1, index, 1, index, "dependency", False,
+                         None, None, None)
+        members.add("t", 1, index, 1, index, "[{}]".format(index),
+                    0.5 + index, "Put")
+    return stores
+
+
+def measure(name, count, store_all):
+    """Store objects in a new database and print rows per second per table
+    The total includes the commit of the transaction"""
+    from noworkflow.now.persistence import persistence_config
+    directory = tempfile.mkdtemp()
+    try:
+        persistence_config.connect(directory)
+        stores = create_stores(count)
+        start = time.perf_counter()
+        elapsed = store_all(stores)
+        total = time.perf_counter() - start
+        for store, seconds in zip(stores, elapsed):
+            print("{:<8}{:<16}{:>12}{:>16.0f}".format(
+                name, store.cls.model.__model__.__tablename__, count,
+                count / seconds))
+        print("{:<8}{:<16}{:>12}{:>16.0f}".format(
+            name, "total", count * len(stores),
+            count * len(stores) / total))
+    finally:
+        shutil.rmtree(directory)
+
+
+def timed(store_one, stores):
+    """Return elapsed time of store_one for each store"""
+    elapsed = []
+    for store in stores:
+        start = time.perf_counter()
+        store_one(store)
+        elapsed.append(time.perf_counter() - start)
+    return elapsed
+
+
+def main():
+    """Run benchmark"""
+    from noworkflow.now.persistence.lightweight import BulkWriter
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+
+    def proxy(stores):
+        return timed(lambda store: store.do_store(False), stores)
+
+    def bulk(stores):
+        with BulkWriter() as writer:
+            return timed(lambda store: store.do_store(False, writer), stores)
+
+    print("{:<8}{:<16}{:>12}{:>16}".format("store", "table", "rows", "rows/s"))
+    measure("proxy", count, proxy)
+    measure("bulk", count, bulk)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Benchmark the collection overhead of if/else and if/elif/else branches
+
+Runs a loop with and without conditional statements, both with python
+and with 'now run'. The per-branch overhead is the difference between each
+loop and the loop without conditionals divided by the number of iterations.
+
+Usage: python benchmarks/bench_conditions.py [iterations] [repeat]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+
+SCRIPT = """\
+import time
+def run(n):
+    total = 0
+    for i in range(n):
+        {body}
+    return total
+start = time.perf_counter()
+run({iterations})
+print("elapsed", time.perf_counter() - start)
+"""
+
+IF_ELSE = """\
+if i % 3 == 0:
+            total += 1
+        else:
+            total += 3"""
+
+IF_ELIF_ELSE = """\
+if i % 3 == 0:
+            total += 1
+        elif i % 3 == 1:
+            total += 2
+        else:
+            total += 3"""
+
+PLAIN = """\
+i % 3 == 0
+        total += 1"""
+
+SCRIPTS = (
+    ("plain.py", PLAIN),
+    ("if_else.py", IF_ELSE),
+    ("if_elif_else.py", IF_ELIF_ELSE),
+)
+
+
+def elapsed(command, directory):
+    """Run command and return the elapsed time printed by the script"""
+    output = subprocess.check_output(
+        command, cwd=directory, stderr=subprocess.STDOUT
+    ).decode("utf-8")
+    for line in output.splitlines():
+        if line.startswith("elapsed"):
+            return float(line.split()[1])
+    raise RuntimeError("Invalid output:\n" + output)
+
+
+def measure(command, directory, repeat):
+    """Return the best elapsed time of repeated runs"""
+    return min(elapsed(command, directory) for _ in range(repeat))
+
+
+def main():
+    """Run benchmark"""
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    directory = tempfile.mkdtemp()
+    try:
+        for name, body in SCRIPTS:
+            with open(os.path.join(directory, name), "w") as script:
+                script.write(SCRIPT.format(body=body, iterations=iterations))
+        print("{:<10}{:<18}{:>12}{:>18}".format(
+            "", "script", "time (s)", "per branch (us)"
+        ))
+        for tool, command in (("python", [sys.executable]),
+                              ("now run", ["now", "run"])):
+            plain = measure(command + ["plain.py"], directory, repeat)
+            print("{:<10}{:<18}{:>12.4f}".format(tool, "plain.py", plain))
+            for name, _ in SCRIPTS[1:]:
+                result = measure(command + [name], directory, repeat)
+                print("{:<10}{:<18}{:>12.4f}{:>18.2f}".format(
+                    tool, name, result, (result - plain) / iterations * 1e6
+                ))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
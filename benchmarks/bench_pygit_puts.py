@@ -0,0 +1,80 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Benchmark blob puts of the pygit content engine
+
+Writes the same small blobs to a new bare repository by reopening the
+repository for each blob (the previous do_put), with the cached repository
+handle of do_put, and in batches with do_put_many. Requires pygit2.
+
+Usage: python benchmarks/bench_pygit_puts.py [blobs] [size] [batch]
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+
+def reopen_put(content_path, object_hashes, content, filename):
+    """Put blob reopening the repository"""
+    from pygit2 import Repository
+    repo = Repository(content_path)
+    object_hashes[filename] = str(repo.create_blob(content))
+
+
+def measure(name, blobs, put_all):
+    """Put blobs in a new repository and print blobs per second"""
+    from pygit2 import init_repository
+    directory = tempfile.mkdtemp()
+    try:
+        content_path = os.path.join(directory, "content.git")
+        init_repository(content_path, bare=True)
+        start = time.perf_counter()
+        put_all(content_path, {}, blobs)
+        elapsed = time.perf_counter() - start
+        print("{:<14}{:>12.4f}{:>16.0f}".format(
+            name, elapsed, len(blobs) / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+
+def main():
+    """Run benchmark"""
+    try:
+        from noworkflow.now.persistence.content.pygit_engine import PyGitEngine
+    except ImportError:
+        print("pygit2 is not installed")
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 1024
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 256
+    blobs = [
+        (os.urandom(size), "file{}".format(index)) for index in range(count)
+    ]
+
+    def reopen(content_path, object_hashes, blobs):
+        for content, filename in blobs:
+            reopen_put(content_path, object_hashes, content, filename)
+
+    def cached(content_path, object_hashes, blobs):
+        for content, filename in blobs:
+            PyGitEngine.do_put(content_path, object_hashes, content, filename)
+
+    def batched(content_path, object_hashes, blobs):
+        for start in range(0, len(blobs), batch):
+            PyGitEngine.do_put_many(
+                content_path, object_hashes, blobs[start:start + batch])
+
+    print("{:<14}{:>12}{:>16}".format("put", "time (s)", "blobs/s"))
+    measure("reopen", blobs, reopen)
+    measure("cached", blobs, cached)
+    measure("do_put_many", blobs, batched)
+
+
+if __name__ == "__main__":
+    main()
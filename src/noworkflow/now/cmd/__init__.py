@@ -14,6 +14,7 @@ from .command import Command, SmartFormatter
 from .cmd_run import Run
 from .cmd_debug import Debug
 from .cmd_import import Import
+from .cmd_ingest import Ingest
 from .cmd_push import Push
 from .cmd_pull import Pull
 from .cmd_list import List
@@ -30,6 +31,7 @@ from .cmd_prov import Prov
 from .cmd_schema import Schema
 from .cmd_kernel import Kernel
 from .cmd_gc import GC
+from .cmd_db import DB
 from .cmd_evaluation import Evaluation
 from .cmd_clean import Clean
 from .cmd_ast import Ast
@@ -53,6 +55,7 @@ def main():
         Dataflow(),
         Export(),
         Import(),
+        Ingest(),
         Push(),
         Pull(),
         Restore(),
@@ -64,6 +67,7 @@ def main():
         Schema(),
         Kernel(),
         GC(),
+        DB(),
         Evaluation(),
         Clean(),
         Ast()
@@ -106,5 +110,6 @@ __all__ = [
     "Push",
     "Pull",
     "Import",
+    "Ingest",
     "Ast",
 ]
@@ -0,0 +1,62 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+""""now db" command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import sys
+
+from ..persistence import persistence_config, relational
+from ..persistence.migrations import schema_version
+from ..persistence.query_plans import analyze
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+class DB(Command):
+    """Inspect the provenance database"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("action", type=str.lower, choices=["analyze"],
+                help="R|analyze: run EXPLAIN QUERY PLAN on the standard "
+                     "queries\nand report full scans and partial searches")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+        add_arg("-a", "--all", action="store_true",
+                help="show the plans of all queries")
+        add_arg("--sql", action="store_true",
+                help="show the SQL of the reported queries")
+
+    def execute(self, args):
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        if args.action == "analyze":
+            self.analyze(args)
+
+    def analyze(self, args):                                                     # pylint: disable=no-self-use
+        """Report query plans of the standard queries"""
+        with relational.engine.connect() as connection:
+            version = schema_version(connection)
+        plans = analyze(relational.engine, relational.session)
+        problems = 0
+        for plan in plans:
+            if not plan.problems and not args.all:
+                continue
+            problems += bool(plan.problems)
+            print(plan.name)
+            if args.sql:
+                print("  " + " ".join(plan.sql.split()))
+            for detail in plan.details:
+                print("  " + detail)
+            for problem in plan.problems:
+                print("  ! " + problem)
+        print_msg("schema version {}: {} queries analyzed, {} with full scans "
+                  "or partial searches".format(
+                      version, len(plans), problems), True)
+        if problems:
+            sys.exit(1)
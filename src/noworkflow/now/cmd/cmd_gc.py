@@ -2,14 +2,14 @@
 # Copyright (c) 2016 Polytechnic Institute of New York University.
 # This file is part of noWorkflow.
 # Please, consult the license terms in the LICENSE file.
-""""now list" command"""
+""""now gc" command"""
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 import os
 
-from ..persistence.models import Trial
-from ..persistence import persistence_config
+from ..persistence import persistence_config, relational
+from ..persistence.references import referenced_hashes
 from ..utils.io import print_msg
 from ..persistence import content
 
@@ -28,8 +28,38 @@ class GC(Command):
                 help="executes aggressively the garbage collection in the content database")
         add_arg("--content-engine", type=str,
                 help="set the content database engine")
+        add_arg("--plain", action="store_true",
+                help="remove contents that are not referenced by trials or "
+                     "by event logs waiting for ingestion, from plain, "
+                     "chunked, and pack content databases")
+        add_arg("--dry-run", action="store_true",
+                help="with --plain, only report the reclaimable contents")
+        add_arg("--workers", type=int, default=None, metavar="N",
+                help="with --plain, number of threads that remove contents")
 
     def execute(self, args):
         persistence_config.content_engine = args.content_engine
         persistence_config.connect_existing(args.dir or os.getcwd())
-        content.gc()
+        try:
+            if args.plain:
+                self.sweep(args)
+            else:
+                content.gc(args.aggressive)
+        finally:
+            content.close()
+
+    def sweep(self, args):                                                       # pylint: disable=no-self-use
+        """Remove unreferenced contents"""
+        live = referenced_hashes(
+            relational.session, persistence_config.provenance_path)
+        try:
+            removed, size = content.sweep(
+                live, dry_run=args.dry_run, workers=args.workers)
+        except NotImplementedError:
+            print_msg("the content engine does not support --plain. "
+                      "Use 'now gc' to run the git garbage collection", True)
+            return
+        if not args.dry_run and content.fingerprints is not None:
+            content.fingerprints.forget(removed)
+        print_msg("{} {} unreferenced contents ({} bytes)".format(
+            "found" if args.dry_run else "removed", len(removed), size), True)
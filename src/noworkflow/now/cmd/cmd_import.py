@@ -44,10 +44,14 @@ class Import(Command):
                 help="set absolute project path where is the database to import.")
         add_arg("--label", type=str,
                 help="optional label for the import.")
+        add_arg("--bulk", action="store_true",
+                help="use the bulk storage profile of the target database "
+                     "and import with secondary indexes dropped, rebuilding "
+                     "them afterwards")
 
     def import_content(self,args):
         
-        targetFiles=self.targetContent.listAll()
+        targetFiles=set(self.targetContent.listAll())
         sourceFiles=self.sourceContent.listAll()
         
         [self.addFile(x) for x in sourceFiles if x not in targetFiles]
@@ -72,6 +76,8 @@ class Import(Command):
 
 
     def execute(self, args):
+        if args.bulk:
+            persistence_config.storage_profile = "bulk"
 
         self.populate(args)
             
@@ -91,7 +97,7 @@ class Import(Command):
        
         persistence_config.connect(args.target or os.getcwd())
 
-        import_bundle(bundle)
+        import_bundle(bundle, bulk=args.bulk)
 
         print("Imported successfully")
        
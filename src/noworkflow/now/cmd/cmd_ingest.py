@@ -0,0 +1,85 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""'now ingest' command"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+
+from collections import defaultdict
+
+from ..persistence.event_log import EventLog, event_log_path, pending_logs
+from ..persistence.models import MetaModel, Trial, TrialDefinition
+from ..persistence import persistence_config, relational
+from ..utils.io import print_msg
+
+from .command import Command
+
+
+def ingest(trial_id, batch_size=10000, keep=False):
+    """Bulk load the event log of a trial into the relational database
+    Return the number of ingested rows"""
+    log = EventLog(event_log_path(persistence_config.provenance_path, trial_id))
+    batches = defaultdict(list)
+    total = 0
+    with relational.engine.begin() as conn:
+        for model, columns, row in log.read():
+            batch = batches[(model, columns)]
+            batch.append(row)
+            if len(batch) >= batch_size:
+                MetaModel.__classes__[model].store_rows(columns, batch, conn)
+                total += len(batch)
+                del batch[:]
+        for (model, columns), batch in batches.items():
+            MetaModel.__classes__[model].store_rows(columns, batch, conn)
+            total += len(batch)
+    TrialDefinition.share(trial_id)
+    if not keep:
+        os.remove(log.path)
+    return total
+
+
+class Ingest(Command):
+    """Load trial event logs into the provenance database"""
+
+    def add_arguments(self):
+        add_arg = self.add_argument
+        add_arg("trial", type=str, nargs="?",
+                help="trial id or none for all pending trials")
+        add_arg("--dir", type=str,
+                help="set project path where is the database. Default to "
+                     "current directory")
+        add_arg("-k", "--keep", action="store_true",
+                help="keep the event log after ingesting it")
+        add_arg("--content-engine", type=str,
+                help="set the content database engine")
+        add_arg("--bulk", action="store_true",
+                help="use the bulk storage profile of the database and "
+                     "ingest with secondary indexes dropped, rebuilding them "
+                     "afterwards")
+
+    def execute(self, args):
+        persistence_config.content_engine = args.content_engine
+        if args.bulk:
+            persistence_config.storage_profile = "bulk"
+        persistence_config.connect_existing(args.dir or os.getcwd())
+        if args.trial:
+            trial_ids = [Trial(trial_ref=args.trial).id]
+        else:
+            trial_ids = pending_logs(persistence_config.provenance_path)
+        if not trial_ids:
+            print_msg("there are no event logs to ingest", True)
+            return
+        with relational.ingest_mode(args.bulk):
+            for trial_id in trial_ids:
+                path = event_log_path(
+                    persistence_config.provenance_path, trial_id)
+                if not os.path.isfile(path):
+                    print_msg("trial {} has no event log".format(trial_id),
+                              True)
+                    continue
+                total = ingest(trial_id, keep=args.keep)
+                print_msg("trial {}: {} rows ingested".format(trial_id, total),
+                          True)
@@ -27,17 +27,25 @@ class Pull(Command):
     def __init__(self, *args, **kwargs):
         super(Pull, self).__init__(*args, **kwargs)
         self.url=None
+        self.bulk=False
   
 
     def add_arguments(self):
         add_arg = self.add_argument
         add_arg("--url", type=str,
                 help="set target url of push command")
+        add_arg("--bulk", action="store_true",
+                help="use the bulk storage profile of the database and "
+                     "import with secondary indexes dropped, rebuilding them "
+                     "afterwards")
 
     def populate(self,args):
         if not (args.url):  
             raise ValueError("--url can't be empty")
         self.url=args.url
+        self.bulk=args.bulk
+        if self.bulk:
+            persistence_config.storage_profile = "bulk"
 
     def get(self,url):
         headers = {'Accept-Encoding': 'gzip'}
@@ -63,7 +71,7 @@ class Pull(Command):
         bundle=BundleLW()
         bundle.from_json(pvContent)
         
-        import_bundle(bundle)
+        import_bundle(bundle, bulk=self.bulk)
         
         return True
     
@@ -79,7 +87,7 @@ class Pull(Command):
         if sourceFiles == self.text_invalid_experiment_id:
             print(self.text_importing_files_failed + " " + sourceFiles)
             return False
-        targetFiles=content.listAll()
+        targetFiles=set(content.listAll())
         filesToImport=[x for x in sourceFiles if x not in targetFiles]
         [self.importFile(filesUrl+"/"+x) for x in filesToImport]
         
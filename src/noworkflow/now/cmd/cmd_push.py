@@ -90,7 +90,8 @@ class Push(Command):
             print(self.text_exporting_files_failed +  " " + targetFiles)
             return False
         
-        sourceFiles=content.listAll()        
+        targetFiles=set(targetFiles)
+        sourceFiles=content.listAll()
         filesToExport=[x for x in sourceFiles if x not in targetFiles]
         if (filesToExport.__len__()>0):
             zipF=BytesIO()
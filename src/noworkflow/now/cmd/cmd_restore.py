@@ -15,6 +15,8 @@ from datetime import datetime
 from future.utils import viewitems
 
 from ..collection.metadata import Metascript
+from ..collection.prov_execution.capture import CapturePolicy, SKIP
+from ..collection.prov_execution.capture import CAPTURE_POLICY_ARGUMENT
 from ..persistence.models import Trial, Module, FileAccess, Tag
 from ..persistence.models import CodeComponent, CodeBlock, Argument
 from ..persistence import persistence_config, content
@@ -30,6 +32,8 @@ class Restore(Command):
     def __init__(self, *args, **kwargs):
         super(Restore, self).__init__(*args, **kwargs)
         self.print_msg = True
+        self.trial = None
+        self.policy = None
 
     def add_arguments(self):
         add_arg = self.add_argument
@@ -133,12 +137,26 @@ class Restore(Command):
         new_code_hash = file_hash(path)
         if code_hash == new_code_hash:
             return False
+        policy = self.policy
+        if mode != "script" and policy and policy.action(path) == SKIP:
+            print_msg("File {} was not captured by the capture policy of "
+                      "trial {}. Skipping it".format(path, self.trial.id),
+                      self.print_msg)
+            return False
         if code_hash is None and mode != "script":
             os.remove(path)
             print_msg("File {} removed".format(path), self.print_msg)
             return True
         elif code_hash is not None:
-            load_file = content.get(code_hash)
+            try:
+                load_file = content.get(code_hash)
+            except (KeyError, OSError):
+                if policy is None:
+                    raise
+                print_msg("Content of file {} was not stored by the capture "
+                          "policy of trial {}. Skipping it".format(
+                              path, self.trial.id), self.print_msg)
+                return False
             try:
                 parent = os.path.dirname(path)
                 if parent:
@@ -187,6 +205,7 @@ class Restore(Command):
         metascript = Metascript().read_restore_args(args)
         persistence_config.connect_existing(args.dir or os.getcwd())
         self.trial = trial = metascript.trial = Trial(trial_ref=args.trial)
+        self.policy = trial_capture_policy(trial)
         metascript.trial_id = trial.id
         metascript.name = trial.script
         metascript.path = trial.path
@@ -292,8 +311,17 @@ def file_hash(path):
     if not os.path.isfile(abs_path):
         return None
     else:
-        with open(abs_path, "rb") as fil:
-            return content.put(fil.read(), abs_path)
+        return content.put_file(abs_path)
+
+
+def trial_capture_policy(trial):
+    """Return capture policy recorded with trial or None"""
+    for argument in trial.arguments:
+        if argument.name == CAPTURE_POLICY_ARGUMENT:
+            return CapturePolicy.loads(
+                argument.value, base_path=persistence_config.base_path
+            )
+    return None
 
 
 def skip_dict(args):
@@ -11,9 +11,12 @@ import os
 import sys
 
 from ..collection.metadata import Metascript
-from ..persistence.models import Tag, Trial, Argument
+from ..collection.prov_execution.structures import LoopSampling
+from ..collection.prov_execution.capture import parse_size
+from ..persistence.models import Tag, Trial, Argument, TrialDefinition
 from ..utils import io, metaprofiler
 from ..persistence import content
+from ..persistence.content.hashes import ALGORITHMS
 
 from .command import Command
 
@@ -27,6 +30,26 @@ def non_negative(string):
     return value
 
 
+def loop_sampling(string):
+    """Check if argument is a loop sampling: first=K,every=N,last=M"""
+    try:
+        return LoopSampling.parse(string)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "{} is not a valid loop sampling. "
+            "Use first=K,every=N,last=M".format(string))
+
+
+def size(string):
+    """Check if argument is a size in bytes, with optional K, M, G, T suffix"""
+    try:
+        return parse_size(string)
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            "{} is not a valid size. Use a number of bytes with an optional "
+            "K, M, G, or T suffix".format(string))
+
+
 class ScriptArgs(argparse.Action):                                               # pylint: disable=too-few-public-methods
     """Action to create script attribute"""
     def __call__(self, parser, namespace, values, option_string=None):
@@ -54,6 +77,8 @@ def run(metascript, args=None):
         metascript.create_arguments(args)
         arguments = metascript.arguments_store
         Argument.store(arguments, True)
+        if metascript.use_event_log:
+            metascript.open_event_log()
 
         io.print_msg("collecting deployment provenance")
         metascript.deployment.collect_provenance()
@@ -63,12 +88,18 @@ def run(metascript, args=None):
         metascript.deployment.store_provenance()
         metascript.definition.store_provenance()
         metascript.execution.store_provenance()
+        if not metascript.use_event_log:
+            TrialDefinition.share(metascript.trial_id)
 
         Tag.create_automatic_tag(*metascript.create_automatic_tag_args())
         Trial.set_user_based_on_env(metascript.trial_id)
         metaprofiler.meta_profiler.save()
         content.commit_content(metascript.message or "Trial {}".format(metascript.trial_id))
+        if metascript.use_event_log:
+            io.print_msg("run 'now ingest {}' to load the provenance into the "
+                         "database".format(metascript.trial_id), True)
     finally:
+        metascript.close_event_log()
         metascript.create_last()
 
 class Run(Command):
@@ -119,6 +150,61 @@ class Run(Command):
         add_arg("-S", "--call-storage-frequency", type=non_negative,
                 default=self.default_call_storage_frequency,
                 help="frequency (in calls) to save partial provenance")
+        add_arg("--loop-sampling", type=loop_sampling, metavar="SAMPLING",
+                help="collect only some loop iterations, in the format "
+                     "first=K,every=N,last=M. Other iterations are summarized "
+                     "by iteration count and duration")
+        add_arg("--repr-max-chars", type=non_negative, metavar="N",
+                help="limit the size of value representations")
+        add_arg("--repr-max-depth", type=non_negative, metavar="N",
+                help="limit the depth of nested values in representations")
+        add_arg("--repr-max-items", type=non_negative, metavar="N",
+                help="limit the number of container items in representations")
+        add_arg("--deferred-repr", action="store_true",
+                help="represent mutable values by type and identity, and "
+                     "render immutable values when provenance is stored")
+        add_arg("--value-summaries", action="store_true",
+                help="summarize arrays, data frames, and bytes by shape and "
+                     "content digest instead of using their complete repr")
+        add_arg("--no-definition-cache", action="store_true",
+                help="always transform the script and modules instead of "
+                     "reusing the cached definition of unchanged files")
+        add_arg("--no-fingerprint-cache", action="store_true",
+                help="hash accessed files in every trial instead of reusing "
+                     "the hashes of files with unchanged path, inode, size, "
+                     "and mtime")
+        add_arg("--strict-fingerprints", action="store_true",
+                help="verify the reused hashes of unchanged files by hashing "
+                     "them again")
+        add_arg("--capture-workers", type=non_negative, default=0,
+                metavar="N",
+                help="number of threads that capture file contents after "
+                     "activations. Use 0 to capture them synchronously "
+                     "(default: 0)")
+        add_arg("--capture-policy", type=str, metavar="FILE",
+                help="JSON file with the capture policy of accessed files "
+                     "(default: .noworkflow/capture_policy.json, if it "
+                     "exists). The following options extend it")
+        add_arg("--capture-include", action="append", metavar="GLOB",
+                help="only capture the content of files that match GLOB")
+        add_arg("--capture-exclude", action="append", metavar="GLOB",
+                help="do not capture the content of files that match GLOB")
+        add_arg("--capture-max-size", type=size, metavar="SIZE",
+                help="only record the hash of files larger than SIZE")
+        add_arg("--capture-hash-only", action="append", metavar="EXT",
+                help="only record the hash of files with extension EXT")
+        add_arg("--capture-sample-dirs", type=non_negative, metavar="N",
+                help="sample the contents stored from directories with more "
+                     "than N entries")
+        add_arg("--capture-sample-every", type=non_negative, metavar="N",
+                help="store one in every N files of sampled directories. "
+                     "Only record the hash of the others")
+        add_arg("--event-log", action="store_true",
+                help="append provenance to a trial event log instead of "
+                     "the database. Use 'now ingest' to load it later")
+        add_arg("--columnar-store", action="store_true",
+                help="keep evaluations and dependencies in typed arrays "
+                     "during the collection to reduce memory usage")
         # ToDo: capture only activations
         add_arg("-cg", "--coarse-granularity", action="store_true",
                 help="capture only activation-level provenance "
@@ -145,7 +231,16 @@ class Run(Command):
                 help="add a message to the commit of the trial")
         add_arg("--content-engine", type=str,
                 help="set the content database engine")
-                                
+        add_arg("--content-hash", choices=sorted(ALGORITHMS),
+                help="set the hash algorithm of new contents of plain and "
+                     "chunked content databases. Non-cryptographic hashes "
+                     "are faster. Hashes are tagged by the algorithm, except "
+                     "for sha1 (default: the algorithm of the database)")
+        add_arg("--bulk", action="store_true",
+                help="use the bulk storage profile of the database and store "
+                     "the trial with secondary indexes dropped, rebuilding "
+                     "them afterwards. Faster for large trials")
+
 
         # Internal
         add_cmd("--create_last", action="store_true", help=argparse.SUPPRESS)
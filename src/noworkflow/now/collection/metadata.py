@@ -16,14 +16,18 @@ from datetime import datetime
 from future.utils import viewitems
 
 from ..persistence import persistence_config, get_serializer, content
+from ..persistence.config import PROVENANCE_DIRNAME
+from ..persistence.event_log import EventLog, event_log_path
 from ..persistence.lightweight import ObjectStore, SharedObjectStore
+from ..persistence.lightweight.columnar import columnar_evaluations
+from ..persistence.lightweight.columnar import columnar_dependencies
 from ..persistence.lightweight import ModuleLW
 from ..persistence.lightweight import EnvironmentAttrLW, ArgumentLW
 from ..persistence.lightweight import CodeComponentLW, CodeBlockLW
 from ..persistence.lightweight import CompositionLW
 from ..persistence.lightweight import EvaluationLW, ActivationLW, DependencyLW
 from ..persistence.lightweight import MemberLW, FileAccessLW, StageTagsLW
-from ..persistence.lightweight import ExceptionLW
+from ..persistence.lightweight import ExceptionLW, LoopSummaryLW
 
 
 from ..utils import io
@@ -31,6 +35,8 @@ from ..utils.cross_version import perf_counter
 
 from .prov_definition.definition import Definition
 from .prov_execution.execution import Execution
+from .prov_execution.capture import CapturePolicy, CAPTURE_POLICY_FILE
+from .prov_execution.capture import CAPTURE_POLICY_ARGUMENT
 from .prov_deployment.deployment import Deployment
 
 
@@ -65,6 +71,7 @@ class Metascript(object):
         self.members_store = ObjectStore(MemberLW)
         self.file_accesses_store = ObjectStore(FileAccessLW)
         self.stage_tags_store = ObjectStore(StageTagsLW)
+        self.loop_summaries_store = ObjectStore(LoopSummaryLW)
 
         self.exceptions_store = ObjectStore(ExceptionLW)
         # Trial id read from Database : int
@@ -114,6 +121,32 @@ class Metascript(object):
         self.save_frequency = None
         # Save after closing X activations : int
         self.call_storage_frequency = 0
+        # Loop iterations with full provenance : LoopSampling
+        self.loop_sampling = None
+        # Maximum size of value representations (None = unlimited) : int
+        self.repr_max_chars = None
+        # Maximum depth of value representations (None = unlimited) : int
+        self.repr_max_depth = None
+        # Maximum items of containers in representations : int
+        self.repr_max_items = None
+        # Render immutable representations at store time : bool
+        self.deferred_repr = False
+        # Summarize arrays, data frames, and bytes by content digests : bool
+        self.summarize_values = False
+        # Reuse transformed code objects of unchanged files : bool
+        self.definition_cache = True
+        # Reuse content hashes of unchanged files across trials : bool
+        self.fingerprint_cache = True
+        # Verify reused content hashes by hashing the files again : bool
+        self.strict_fingerprints = False
+        # Hash algorithm of new contents. None keeps the algorithm of the
+        #   content database : str
+        self.content_hash = None
+        # Threads that capture file contents after activations : int
+        self.capture_workers = 0
+        # Capture policy of file contents. None stores all of them
+        #   : CapturePolicy
+        self.capture_policy = None
 
         # Used by jupyter to indicate that it should not transform cell : bool
         self.jupyter_original = False
@@ -122,6 +155,15 @@ class Metascript(object):
         self.message = ""
         # Content engine : str
         self.content_engine = None
+        # Store provenance in an event log for later ingestion : bool
+        self.use_event_log = False
+        # Event log sink : EventLog
+        self.event_log = None
+        # Keep evaluations and dependencies in typed columns : bool
+        self.columnar_store = False
+        # Use the bulk storage profile and store the trial in ingest mode
+        #   : bool
+        self.bulk_store = False
 
 
         # Trial time
@@ -217,6 +259,27 @@ class Metascript(object):
             context="main",
             message=None,
             content_engine=None,
+            event_log=False,
+            columnar_store=False,
+            bulk=False,
+            loop_sampling=None,
+            repr_max_chars=None,
+            repr_max_depth=None,
+            repr_max_items=None,
+            deferred_repr=False,
+            value_summaries=False,
+            no_definition_cache=False,
+            no_fingerprint_cache=False,
+            strict_fingerprints=False,
+            content_hash=None,
+            capture_workers=0,
+            capture_policy=None,
+            capture_include=None,
+            capture_exclude=None,
+            capture_max_size=None,
+            capture_hash_only=None,
+            capture_sample_dirs=None,
+            capture_sample_every=None,
         )
         self._read_args(args)
         self.path = os.getcwd()
@@ -236,8 +299,32 @@ class Metascript(object):
         self.depth = args.depth
         self.save_frequency = args.save_frequency
         self.call_storage_frequency = args.call_storage_frequency
+        self.loop_sampling = args.loop_sampling
+        self.repr_max_chars = args.repr_max_chars
+        self.repr_max_depth = args.repr_max_depth
+        self.repr_max_items = args.repr_max_items
+        self.deferred_repr = args.deferred_repr
+        self.summarize_values = args.value_summaries
+        self.definition_cache = not args.no_definition_cache
+        self.capture_workers = args.capture_workers
+        self.capture_policy = self.read_capture_policy(args)
         self.message = args.message
+        self.use_event_log = args.event_log
+        self.columnar_store = args.columnar_store
+        if self.columnar_store:
+            self.evaluations_store = columnar_evaluations()
+            self.dependencies_store = columnar_dependencies()
         self.content_engine = persistence_config.content_engine = args.content_engine
+        self.fingerprint_cache = persistence_config.fingerprint_cache = (
+            not args.no_fingerprint_cache
+        )
+        self.strict_fingerprints = persistence_config.strict_fingerprints = (
+            args.strict_fingerprints
+        )
+        self.content_hash = persistence_config.content_hash = args.content_hash
+        self.bulk_store = args.bulk
+        if self.bulk_store:
+            persistence_config.storage_profile = "bulk"
         io.print_msg("setting up local provenance store")
         persistence_config.connect(self.dir)
         return self
@@ -252,12 +339,64 @@ class Metascript(object):
         self.content_engine = persistence_config.content_engine = args.content_engine
         return self
 
+    def logged_stores(self):
+        """Return stores that can use the event log as sink"""
+        return [
+            self.environment_attrs_store, self.modules_store,
+            self.code_components_store, self.code_blocks_store,
+            self.compositions_store, self.evaluations_store,
+            self.activations_store, self.dependencies_store,
+            self.members_store, self.file_accesses_store,
+            self.stage_tags_store, self.loop_summaries_store,
+        ]
+
+    def open_event_log(self):
+        """Redirect provenance storage to the trial event log"""
+        self.event_log = EventLog(event_log_path(
+            persistence_config.provenance_path, self.trial_id
+        )).open()
+        for store in self.logged_stores():
+            store.set_event_log(self.event_log)
+        return self.event_log
+
+    def close_event_log(self):
+        """Close the trial event log and restore database storage"""
+        if self.event_log is not None:
+            for store in self.logged_stores():
+                store.set_event_log(None)
+            self.event_log.close()
+            self.event_log = None
+
+    def read_capture_policy(self, args):
+        """Read capture policy file and arguments
+        Return None if the policy stores all files"""
+        filename = args.capture_policy
+        default = os.path.join(self.dir, PROVENANCE_DIRNAME, CAPTURE_POLICY_FILE)
+        if filename is None and os.path.isfile(default):
+            filename = default
+        if filename is not None:
+            policy = CapturePolicy.load(filename, base_path=self.dir)
+        else:
+            policy = CapturePolicy(base_path=self.dir)
+        policy.update(
+            args.capture_include, args.capture_exclude, args.capture_max_size,
+            args.capture_hash_only, args.capture_sample_dirs,
+            args.capture_sample_every
+        )
+        return None if policy.is_default() else policy
+
     def create_arguments(self, args):
         """Create arguments"""
         for arg in vars(args):
             value = getattr(args, arg)
             if arg not in ("func", ):
                 self.arguments_store.add(self.trial_id, arg, repr(value))
+        if self.capture_policy is not None:
+            # Resolved policy. Used by 'now restore' to explain missing content
+            self.arguments_store.add(
+                self.trial_id, CAPTURE_POLICY_ARGUMENT,
+                self.capture_policy.dumps()
+            )
 
     def create_last(self):
         """Create file indicating last trial id"""
@@ -0,0 +1,120 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Persistent cache of transformed code objects and definition provenance"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import marshal
+import os
+import sys
+
+from os.path import join, isdir
+
+from ...persistence.content import safeopen
+from ...utils.functions import version
+
+
+DEFINITION_CACHE_DIR = "definition_cache"
+
+
+def _attributes(obj):
+    """Return __init__ arguments of lightweight object, except id/trial_id"""
+    return tuple(getattr(obj, attr) for attr in obj.attributes[2:])
+
+
+class DefinitionCache(object):
+    """Cache rewritten code objects, like __pycache__
+
+    Each file has a single entry, which is valid while its key matches.
+    The key considers the source, the transformer options, and the code
+    block id, since the ids of the following code components are embedded
+    in the transformed code. An entry holds the marshalled code object and the
+    code components, code blocks, and compositions created by RewriteAST.
+    """
+
+    def __init__(self, metascript, provenance_path):
+        self.metascript = metascript
+        self.directory = join(provenance_path, DEFINITION_CACHE_DIR)
+        # The cache is created during the execution. Do not record this read
+        with safeopen.use_safe_open():
+            self.version = version()
+
+    def key(self, type_, source, filename, mode, block_id):
+        """Return cache key of a source"""
+        # pylint: disable=too-many-arguments
+        metascript = self.metascript
+        if not isinstance(source, bytes):
+            source = source.encode("utf-8")
+        digest = hashlib.sha1(source).hexdigest()
+        return (
+            self.version, sys.version, digest, type_, filename, mode,
+            metascript.dir, metascript.coarse_granularity,
+            metascript.capture_func_component, block_id,
+        )
+
+    def path(self, key):
+        """Return entry path of a (type, file) key"""
+        name = hashlib.sha1(
+            "{}:{}".format(key[3], key[4]).encode("utf-8")
+        ).hexdigest()
+        return join(self.directory, name)
+
+    def load(self, key, block_id):
+        """Replay entry definition provenance and return its code object
+        Return None if there is no valid entry"""
+        try:
+            with safeopen.std_open(self.path(key), "rb") as entry:
+                data = marshal.load(entry)
+        except (IOError, OSError, EOFError, ValueError, TypeError):
+            return None
+        if data[0] != key:
+            return None
+        _, code, components, blocks, compositions, docstring = data
+        metascript = self.metascript
+        trial_id = metascript.trial_id
+        for args in components:
+            metascript.code_components_store.add(trial_id, *args)
+        for id_, args in blocks:
+            metascript.code_blocks_store.add(id_, trial_id, *args)
+        for args in compositions:
+            metascript.compositions_store.add(trial_id, *args)
+        metascript.code_blocks_store[block_id].docstring = docstring
+        return marshal.loads(code)
+
+    def save(self, key, block_id, composition_id, code, visitor):
+        """Save code object and definition provenance created by visitor"""
+        # pylint: disable=too-many-arguments
+        metascript = self.metascript
+        components_store = metascript.code_components_store
+        blocks_store = metascript.code_blocks_store
+        compositions_store = metascript.compositions_store
+        components = [
+            _attributes(components_store[id_])
+            for id_ in range(block_id + 1, components_store.id + 1)
+        ]
+        blocks = [
+            (id_, (blocks_store[id_].code, False,
+                   blocks_store[id_].docstring, name))
+            for id_, name in visitor.code_block_names
+        ]
+        compositions = [
+            _attributes(compositions_store[id_])
+            for id_ in range(composition_id + 1, compositions_store.id + 1)
+        ]
+        data = (
+            key, marshal.dumps(code), components, blocks, compositions,
+            blocks_store[block_id].docstring
+        )
+        path = self.path(key)
+        try:
+            if not isdir(self.directory):
+                os.makedirs(self.directory)
+            with safeopen.std_open(path + ".tmp", "wb") as entry:
+                marshal.dump(data, entry)
+            os.replace(path + ".tmp", path)
+        except (IOError, OSError, ValueError):
+            # Unmarshallable values or unwritable directory: skip cache
+            pass
@@ -14,13 +14,14 @@ import traceback
 
 import pyposast
 
-from ...persistence import content
+from ...persistence import content, persistence_config
 
 from ...utils.io import print_msg
 from ...utils.metaprofiler import meta_profiler
 from ...utils.cross_version import cross_compile, PY3
 
 from .ast_helpers import debug_tree
+from .cache import DefinitionCache
 from .transformer_stmt import RewriteAST
 
 
@@ -29,6 +30,7 @@ class Definition(object):
 
     def __init__(self, metascript):
         self.first = True
+        self.cache = None
         self.metascript = weakref.proxy(metascript)
         if PY3:
             from ..prov_deployment.py3module import finder
@@ -86,10 +88,8 @@ class Definition(object):
         return code, id_
 
 
-    @meta_profiler("definition")
-    def parse(self, type_, source, filename, mode):
-        """Parse source and return tree, code_block_id, transformed"""
-        transformed = False
+    def prepare(self, type_, source, filename):
+        """Create code block. Return source, code_block_id, and tree"""
         ast_or_no_source = isinstance(source, ast.AST) or source is None
         tree = source if ast_or_no_source else None
         source, id_ = self.create_code_block(
@@ -97,6 +97,13 @@ class Definition(object):
             type_,
             False, ast_or_no_source
         )
+        return source, id_, tree
+
+    def transform(self, type_, source, filename, mode, id_, tree=None):
+        """Transform source. Return tree, transformed, visitor"""
+        # pylint: disable=too-many-arguments
+        transformed = False
+        visitor = None
         cell = filename if type_ == "cell" else None
 
         try:
@@ -119,19 +126,52 @@ class Definition(object):
         if tree is None:
             tree = ast.parse(source, filename, mode)
 
+        return tree, transformed, visitor
+
+    @meta_profiler("definition")
+    def parse(self, type_, source, filename, mode):
+        """Parse source and return tree, code_block_id, transformed"""
+        source, id_, tree = self.prepare(type_, source, filename)
+        tree, transformed, _ = self.transform(
+            type_, source, filename, mode, id_, tree
+        )
         return tree, id_, transformed
 
+    def definition_cache(self):
+        """Return definition cache or None if it is disabled"""
+        if self.cache is None and self.metascript.definition_cache:
+            provenance_path = persistence_config.provenance_path
+            if provenance_path and not persistence_config.should_mock:
+                self.cache = DefinitionCache(self.metascript, provenance_path)
+        return self.cache
+
+    @meta_profiler("definition")
     def collect(self, source, filename, mode, compiler=cross_compile, **kwargs):
-        """Compile source and return code, code_block_id, transformed"""
-        tree, id_, transformed = self.parse(
-            "script" if self.first else "module",
-            source, filename, mode
-        )
+        """Compile source and return code, code_block_id, transformed
+        Use the definition cache for sources compiled by cross_compile"""
+        type_ = "script" if self.first else "module"
         self.first = False
-        return compiler(
+        source, id_, tree = self.prepare(type_, source, filename)
+        cache = None
+        if tree is None and compiler is cross_compile and not kwargs:
+            cache = self.definition_cache()
+        if cache is not None:
+            key = cache.key(type_, source, filename, mode, id_)
+            code = cache.load(key, id_)
+            if code is not None:
+                return code, id_, True
+            composition_id = self.metascript.compositions_store.id
+
+        tree, transformed, visitor = self.transform(
+            type_, source, filename, mode, id_, tree
+        )
+        code = compiler(
             tree, filename, mode,
             **kwargs
-        ), id_, transformed
+        )
+        if cache is not None and transformed:
+            cache.save(key, id_, composition_id, code, visitor)
+        return code, id_, transformed
 
     def compile(self, source, filename, mode, **kwargs):
         """Compile source and return code, code_block_id"""
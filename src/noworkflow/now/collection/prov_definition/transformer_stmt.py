@@ -15,7 +15,7 @@ import pyposast
 from .ast_helpers import ReplaceContextWithLoad, ast_copy, temporary
 from .ast_helpers import select_future_imports
 
-from .ast_elements import maybe, context, raise_, now_attribute
+from .ast_elements import maybe, context
 from .ast_elements import L, S, none, call, param, true_false, true, false
 from .ast_elements import noworkflow, double_noworkflow
 from .ast_elements import activation, function_def, class_def, try_def
@@ -55,6 +55,8 @@ class RewriteAST(ast.NodeTransformer):
         self.current_exc_handler = 0
         self.cell = cell
         self.composition_edge = None
+        # Code blocks created by the visitor: [(id, filename)]
+        self.code_block_names = []
 
     # data
 
@@ -99,14 +101,16 @@ class RewriteAST(ast.NodeTransformer):
         Return component id
         """
         id_ = self.create_code_component(node, type_, "w")
+        name = '.'.join(self.nested) + "." + node.name
         self.code_blocks.add(
             id_,
             self.trial_id,
             pyposast.extract_code(self.lcode, node),
             False,
             ast.get_docstring(node) if has_doc else "",
-            '.'.join(self.nested) + "." + node.name
+            name
         )
+        self.code_block_names.append((id_, name))
         return id_
 
     def create_composition(self, part, whole, typ, pos=None, extra=None):
@@ -979,80 +983,50 @@ class RewriteAST(ast.NodeTransformer):
                 ...2
             else:
                 ...3
-        Into: # Replaces If to avoid creating unnecessary nested blocks
+        Into:
             try:
-                raise (
-                    <now>.condition_exceptions[0]()
-                    if <now>.condition(<act>, <exc>)(<act>, |x|)
-                    else <now>.condition_exceptions[1]()
-                    if <now>.condition(<act>, <exc>)(<act>, |x|)
-                    else <now>.condition_exceptions[2]()
-                )
-            except <now>.condition_exceptions[0]:
-                ...1
-            except <now>.condition_exceptions[1]:
-                ...2
-            except <now>.condition_exceptions[2]:
-                ...3
+                if <now>.condition(<act>, <exc>)(<act>, |x|):
+                    ...1
+                elif <now>.elif_condition(<act>, <exc>)(<act>, |y|):
+                    ...2
+                else:
+                    ...3
             finally:
-                <now>.remove_condition(__now_activation__)
+                <now>.remove_condition(<act>)
+        The elif conditions are joined to the if condition. Thus, the whole
+        statement removes a single condition
         """
         # pylint: disable=invalid-name
-        handlers = []
-        def access_if(ifnod, exc_id):
-            """Create ifexp considering elif"""
+        def access_if(ifnod, method):
+            """Create if considering elif"""
             if_id = self.create_ast_component(ifnod, Component.IF)
             self.create_composition(if_id, *self.composition_edge)
-            subscript = ast.Subscript(
-                now_attribute('condition_exceptions'),
-                ast.Index(ast_num(exc_id)), L()
-            )
-            else_subscript = ast.Subscript(
-                now_attribute('condition_exceptions'),
-                ast.Index(ast_num(exc_id + 1)), L()
-            )
-            handlers.append(ast_copy(ast.ExceptHandler(
-                subscript, None,
-                self.process_body(ifnod.body, if_id)
-            ), ifnod))
-            if_result = call(subscript, [])
-
-            else_block = None
-            if not ifnod.orelse:
-                else_block = [ast.Pass()]
-            elif len(ifnod.orelse) == 1 and isinstance(ifnod.orelse[0], ast.If):
+            new_node = copy(ifnod)
+            new_node.body = self.process_body(ifnod.body, if_id)
+            if len(ifnod.orelse) == 1 and isinstance(ifnod.orelse[0], ast.If):
                 self.composition_edge = (if_id, Component.M_ORELSE, 0)
-                else_result = access_if(ifnod.orelse[0], exc_id + 1)
+                new_node.orelse = [access_if(ifnod.orelse[0], 'elif_condition')]
             else:
-                else_block = self.process_body(
+                new_node.orelse = self.process_body(
                     ifnod.orelse, if_id, attr=Component.M_ORELSE
                 )
 
-            if else_block is not None:
-                handlers.append(ast_copy(ast.ExceptHandler(
-                    else_subscript, None, else_block
-                ), ifnod))
-                else_result = call(else_subscript, [])
-
             self.composition_edge = (if_id, Component.S_TEST)
-            return ast_copy(ast.IfExp(
-                double_noworkflow(
-                    'condition',
-                    [
-                        activation(),
-                        ast_num(self.current_exc_handler)
-                    ], [
-                        activation(),
-                        self.capture(ifnod.test, mode=Dependency.CONDITION)
-                    ]
-                ),
-                if_result,
-                else_result
+            new_node.test = ast_copy(double_noworkflow(
+                method,
+                [
+                    activation(),
+                    ast_num(self.current_exc_handler)
+                ], [
+                    activation(),
+                    self.capture(ifnod.test, mode=Dependency.CONDITION)
+                ]
             ), ifnod)
+            return new_node
 
         return ast_copy(try_def([
-            ast_copy(raise_(access_if(node, 0)), node)
-        ], handlers, [], [
+            access_if(node, 'condition')
+        ], [], [], [
             ast_copy(ast.Expr(noworkflow(
                 'remove_condition', [activation()]
             )), node)
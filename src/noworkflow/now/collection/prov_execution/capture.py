@@ -0,0 +1,228 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Asynchronous capture of file contents after activations"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import json
+import os
+import threading
+import zlib
+
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+
+from ...persistence.content import safeopen
+
+
+# Capture actions
+STORE = "store"  # Store the content in the content database
+HASH = "hash"  # Only record the content hash
+SKIP = "skip"  # Do not record the content
+
+# Default capture policy file in the provenance directory
+CAPTURE_POLICY_FILE = "capture_policy.json"
+# Name of the trial argument that records the resolved capture policy
+CAPTURE_POLICY_ARGUMENT = "resolved_capture_policy"
+
+SIZE_UNITS = {"K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+
+
+def parse_size(value):
+    """Parse size in bytes with optional K, M, G, or T suffix"""
+    if value is None or isinstance(value, int):
+        return value
+    value = value.strip().upper().rstrip("B")
+    if value and value[-1] in SIZE_UNITS:
+        return int(float(value[:-1]) * SIZE_UNITS[value[-1]])
+    return int(value)
+
+
+class ContentCapture(object):
+    """Run content captures in a bounded pool of threads
+
+    Each capture belongs to a file name. The collector waits for the
+    captures of a file before opening it again, and for all of them before
+    storing the trial. Submissions block while there are too many pending
+    captures.
+    """
+
+    def __init__(self, workers, max_pending=None):
+        self.workers = workers
+        self.executor = None
+        self.pending = {}
+        self.error = None
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_pending or 4 * workers)
+
+    def submit(self, name, func, *args):
+        """Run func(*args) in a worker. Associate it to file name"""
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                self.workers, thread_name_prefix="noworkflow-capture"
+            )
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.pending.setdefault(name, set()).add(future)
+        future.add_done_callback(lambda done: self.finish(name, done))
+
+    def finish(self, name, future):
+        """Forget finished capture. Keep its error"""
+        with self.lock:
+            futures = self.pending.get(name)
+            if futures is not None:
+                futures.discard(future)
+                if not futures:
+                    del self.pending[name]
+            if self.error is None and not future.cancelled():
+                self.error = future.exception()
+        self.slots.release()
+
+    def check(self):
+        """Raise capture error"""
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def wait(self, name=None):
+        """Wait for the captures of file name, or for all of them"""
+        with self.lock:
+            if name is None:
+                futures = [
+                    future for futures in self.pending.values()
+                    for future in futures
+                ]
+            else:
+                futures = list(self.pending.get(name, ()))
+        for future in futures:
+            future.exception()
+        self.check()
+
+    def close(self):
+        """Wait for all captures and stop the workers"""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.check()
+
+
+class CapturePolicy(object):
+    """Decide how to capture the content of accessed files
+
+    Files that do not match the include globs or that match the exclude
+    globs are skipped. Files with hash_only extensions or larger than
+    max_size only have their hashes recorded. In directories with more than
+    sample_dir_files entries, only one in every sample_every files is stored,
+    chosen by path digest. The others only have their hashes recorded.
+    """
+
+    def __init__(self, include=None, exclude=None, max_size=None,
+                 hash_only=None, sample_dir_files=None, sample_every=None,
+                 base_path=None):
+        # pylint: disable=too-many-arguments
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_size = parse_size(max_size)
+        self.hash_only = [
+            ext if ext.startswith(".") else "." + ext
+            for ext in (ext.lower() for ext in hash_only or [])
+        ]
+        self.sample_dir_files = sample_dir_files
+        self.sample_every = sample_every or 1
+        self.base_path = os.path.abspath(base_path or os.curdir)
+        self.dir_sizes = {}
+
+    @classmethod
+    def loads(cls, text, base_path=None):
+        """Create policy from JSON"""
+        return cls(base_path=base_path, **json.loads(text))
+
+    @classmethod
+    def load(cls, filename, base_path=None):
+        """Create policy from JSON file"""
+        with safeopen.std_open(filename, "r") as policy_file:
+            return cls.loads(policy_file.read(), base_path=base_path)
+
+    def update(self, include=None, exclude=None, max_size=None,
+               hash_only=None, sample_dir_files=None, sample_every=None):
+        """Extend globs and extensions. Replace other informed options"""
+        # pylint: disable=too-many-arguments
+        other = CapturePolicy(include, exclude, max_size, hash_only)
+        self.include.extend(other.include)
+        self.exclude.extend(other.exclude)
+        self.hash_only.extend(other.hash_only)
+        if max_size is not None:
+            self.max_size = other.max_size
+        if sample_dir_files is not None:
+            self.sample_dir_files = sample_dir_files
+        if sample_every is not None:
+            self.sample_every = sample_every
+        return self
+
+    def dumps(self):
+        """Return JSON of policy"""
+        return json.dumps({
+            "include": self.include,
+            "exclude": self.exclude,
+            "max_size": self.max_size,
+            "hash_only": self.hash_only,
+            "sample_dir_files": self.sample_dir_files,
+            "sample_every": self.sample_every,
+        }, sort_keys=True)
+
+    def is_default(self):
+        """Check if policy stores every file"""
+        return not (
+            self.include or self.exclude or self.hash_only or
+            self.max_size is not None or
+            (self.sample_dir_files is not None and self.sample_every > 1)
+        )
+
+    def relative(self, name):
+        """Return path relative to the base path, if it is inside it"""
+        path = os.path.abspath(name)
+        if path.startswith(self.base_path + os.sep):
+            path = os.path.relpath(path, self.base_path)
+        return path.replace(os.sep, "/")
+
+    def action(self, name, size=None):
+        """Return capture action of file. Ignore max_size and sampling if
+        size is None"""
+        path = self.relative(name)
+        if self.include and not any(fnmatch(path, g) for g in self.include):
+            return SKIP
+        if any(fnmatch(path, glob) for glob in self.exclude):
+            return SKIP
+        if os.path.splitext(path)[1].lower() in self.hash_only:
+            return HASH
+        if size is None:
+            return STORE
+        if self.max_size is not None and size > self.max_size:
+            return HASH
+        if self.sample_dir_files is not None and self.sample_every > 1:
+            directory = os.path.dirname(os.path.abspath(name))
+            if self.dir_size(directory) > self.sample_dir_files:
+                digest = zlib.crc32(path.encode("utf-8"))
+                if digest % self.sample_every:
+                    return HASH
+        return STORE
+
+    def dir_size(self, directory):
+        """Return number of entries in directory. Cache it"""
+        try:
+            return self.dir_sizes[directory]
+        except KeyError:
+            pass
+        try:
+            size = len(os.listdir(directory))
+        except OSError:
+            size = 0
+        self.dir_sizes[directory] = size
+        return size
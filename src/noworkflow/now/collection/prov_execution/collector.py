@@ -15,11 +15,13 @@ from collections import OrderedDict
 from copy import copy
 from datetime import datetime, timedelta
 from functools import wraps
+from operator import length_hint
 from types import GeneratorType
 
 from future.utils import viewvalues, viewkeys, viewitems, exec_
 
-from ...persistence import content
+from ...persistence import content, persistence_config, relational
+from ...persistence.lightweight import BulkWriter, StoreFlusher
 from ...persistence.models import Trial
 from ...utils.cross_version import IMMUTABLE, isiterable, PY3
 from ...utils.cross_version import cross_print, PY38
@@ -27,10 +29,23 @@ from ...utils.cross_version import cross_print, PY38
 from .structures import AssignAccess, Assign, Generator, FutureActivation
 from .structures import DependencyAware, Dependency, Parameter
 from .structures import MemberDependencyAware, CollectionDependencyAware
-from .structures import ConditionExceptions, WithContext
+from .structures import WithContext, LoopSampling
+from .representation import BoundedRepr, object_repr, identity_token
+from .representation import summarized_repr, is_deferrable
+from .summarizers import summarize
+from .capture import ContentCapture, HASH, SKIP
 
 NOW_UNSET = "<now_unset>"
 
+# os.open flags that may change the file content
+WRITE_FLAGS = os.O_WRONLY | os.O_RDWR | os.O_APPEND | os.O_CREAT | os.O_TRUNC
+
+
+def file_fingerprint(name):
+    """Return (inode, size, mtime_ns) of file"""
+    stat = os.stat(name)
+    return (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
 OPEN_MODES = {
     # All
     "O_RDONLY": "r",
@@ -82,20 +97,22 @@ class Collector(object):
 
         self.trial_id = -1  # It should be updated
 
-        self.code_components = self.metascript.code_components_store
-        self.evaluations = self.metascript.evaluations_store
-        self.activations = self.metascript.activations_store
-        self.dependencies = self.metascript.dependencies_store
-        self.members = self.metascript.members_store
-        self.file_accesses = self.metascript.file_accesses_store
-        self.stage_tags = self.metascript.stage_tags_store
-
-        self.exceptions = self.metascript.exceptions_store
-        # Partial save
+        self.bind_stores()
+        # Partial save. See configure_storage
         self.partial_save_frequency = None
-        if metascript.save_frequency:  # milliseconds
-            self.partial_save_frequency = metascript.save_frequency / 1000.0
+        self.call_storage_frequency = 0
+        self.calls_since_save = 0
         self.last_partial_save = self.get_time()
+        self.flusher = None
+        # Pool of file content captures : ContentCapture
+        self.content_capture = None
+        # Capture policy of file contents : CapturePolicy
+        self.capture_policy = None
+        # Value representation. See configure_repr
+        self.value_repr = object_repr
+        self.deferred_repr = False
+        self.summarize_values = False
+        self.pending_reprs = []
 
         self.first_activation = self.activations.dry_add(
             self.evaluations.dry_add(self.trial_id, -1, -1, None, None),
@@ -113,7 +130,6 @@ class Collector(object):
         self.Ellipsis = Ellipsis  # pylint: disable=invalid-name
         self.old_next = next
 
-        self.condition_exceptions = ConditionExceptions()
 
         # attribute<->self dependency
         self.current_attr = None
@@ -126,18 +142,104 @@ class Collector(object):
         self.ipcell = 0
         self.iphistory = {}
 
+    def bind_stores(self):
+        """Use metascript object stores"""
+        self.code_components = self.metascript.code_components_store
+        self.evaluations = self.metascript.evaluations_store
+        self.activations = self.metascript.activations_store
+        self.dependencies = self.metascript.dependencies_store
+        self.members = self.metascript.members_store
+        self.file_accesses = self.metascript.file_accesses_store
+        self.stage_tags = self.metascript.stage_tags_store
+        self.loop_summaries = self.metascript.loop_summaries_store
+
+        self.exceptions = self.metascript.exceptions_store
+
+    def storage_stores(self):
+        """Return object stores saved by the collector"""
+        return [
+            self.code_components, self.evaluations, self.activations,
+            self.dependencies, self.members, self.file_accesses,
+            self.stage_tags, self.loop_summaries,
+        ]
+
+    def configure_storage(self):
+        """Configure partial storage according to metascript frequencies
+        Partial saves use a background flusher when writing to the database
+        """
+        metascript = self.metascript
+        # Arguments may replace the default object stores
+        self.bind_stores()
+        self.partial_save_frequency = None
+        if metascript.save_frequency:  # milliseconds
+            self.partial_save_frequency = metascript.save_frequency / 1000.0
+        self.call_storage_frequency = metascript.call_storage_frequency or 0
+        self.calls_since_save = 0
+        self.last_partial_save = self.get_time()
+        use_flusher = (
+            (self.partial_save_frequency or self.call_storage_frequency) and
+            metascript.event_log is None and
+            not persistence_config.should_mock
+        )
+        if use_flusher and self.flusher is None:
+            self.flusher = StoreFlusher(self.storage_stores())
+            self.flusher.start()
+        self.capture_policy = metascript.capture_policy
+        self.content_capture = None
+        if metascript.capture_workers:
+            self.content_capture = ContentCapture(metascript.capture_workers)
+
+    def configure_repr(self):
+        """Configure value representation according to metascript limits"""
+        metascript = self.metascript
+        limits = (
+            metascript.repr_max_chars, metascript.repr_max_depth,
+            metascript.repr_max_items
+        )
+        base_repr = object_repr
+        if metascript.summarize_values:
+            base_repr = summarized_repr
+        self.value_repr = base_repr
+        if any(limits):
+            self.value_repr = BoundedRepr(*limits, base_repr=base_repr).repr
+        self.summarize_values = metascript.summarize_values
+        self.deferred_repr = metascript.deferred_repr
+
+    def partial_store(self):
+        """Store complete objects during the execution"""
+        if self.flusher is not None:
+            self.render_reprs()
+            self.flusher.flush()
+            self.calls_since_save = 0
+            self.last_partial_save = self.get_time()
+        else:
+            self.store(partial=True)
+
     def get_value(self, value):
-        #ipdb.set_trace()
         """Get value representation from value"""
-        repr_fn = repr
-        if type(value) is not type:
-            try:
-                the_repr = object.__getattribute__(value, '__repr__')
-                original_def = getattr(the_repr, 'original_def')
-                repr_fn = original_def
-            except AttributeError:
-                pass
-        return repr_fn(value)
+        return self.value_repr(value)
+
+    def set_repr(self, evaluation, value):
+        """Set evaluation representation
+        In deferred mode, immutable values are rendered by render_reprs and
+        other values are represented by their summary or by their type and
+        identity"""
+        if self.deferred_repr and type(value) is not type:
+            if is_deferrable(value):
+                evaluation.repr = None
+                self.pending_reprs.append((evaluation, value))
+            else:
+                summary = self.summarize_values and summarize(value)
+                evaluation.repr = summary or identity_token(value)
+            return
+        evaluation.repr = self.get_value(value)
+
+    def render_reprs(self):
+        """Render deferred representations in batch"""
+        pending, self.pending_reprs = self.pending_reprs, []
+        get_value = self.get_value
+        for evaluation, value in pending:
+            evaluation.repr = get_value(value)
 
     def as_is(self, value):
         """Return value without any processing"""
@@ -162,10 +264,14 @@ class Collector(object):
             file_access = self.file_accesses.add_object(
                 self.trial_id, name, self.get_time()
             )
+            if self.content_capture is not None:
+                # Previous accesses must capture the content before changes
+                self.content_capture.wait(file_access.name)
             if os.path.exists(name):
-                # Read previous content if file exists
-                with content.std_open(name, "rb") as fil:
-                    file_access.content_hash_before = content.put(fil.read(), name)
+                # Hash previous content if file exists
+                file_access.content_hash_before = self.content_hash(
+                    activation, name
+                )
             file_access.activation_id = activation.id
             # Update with the informed keyword arguments (mode / buffering)
             file_access.update(kwargs)
@@ -183,12 +289,73 @@ class Collector(object):
                             mode += value
 
                 file_access.mode = mode
+            if osopen:
+                writable = args and args[0] & WRITE_FLAGS
+            else:
+                writable = any(flag in str(file_access.mode) for flag in "wax+")
+            if writable:
+                hashes = self.content_hashes(activation)
+                hashes[os.fsdecode(name)] = None
             activation.file_accesses.append(file_access)
     
             return old_open(name, *args, **kwargs)
 
         return open
 
+    def content_hashes(self, activation):
+        """Return content hashes shared by file accesses of activation
+        File accesses usually belong to the activation of the open call.
+        Thus, the hashes are shared by all the calls in its parent"""
+        # pylint: disable=no-self-use
+        return (activation.parent or activation).content_hashes
+
+    def reused_hash(self, activation, name, fingerprint):
+        """Return hash of file that is unchanged in the activation or None"""
+        cached = self.content_hashes(activation).get(os.fsdecode(name))
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        return None
+
+    def content_hash(self, activation, name, fingerprint=None):
+        """Put file content into the content database and return its hash
+        Follow the capture policy. Reuse the hash of files that are unchanged
+        in the activation"""
+        name = os.fsdecode(name)
+        hashes = self.content_hashes(activation)
+        if fingerprint is None:
+            fingerprint = file_fingerprint(name)
+        action = None
+        if self.capture_policy is not None:
+            action = self.capture_policy.action(name, fingerprint[1])
+            if action == SKIP:
+                return None
+        cached = hashes.get(name, False)
+        if cached and cached[0] == fingerprint:
+            return cached[1]
+        if action == HASH:
+            content_hash = content.hash_file(name)
+        else:
+            content_hash = content.put_file(name)
+        if cached is not None:
+            hashes[name] = (fingerprint, content_hash)
+        return content_hash
+
+    def capture_content(self, activation, name, fingerprint, file_accesses):
+        """Set the content hash after the activation of file accesses
+        It runs in a ContentCapture worker. Files that changed since the
+        activation closed do not have the content after the activation:
+        their hash is None"""
+        content_hash = None
+        try:
+            if not fingerprint or file_fingerprint(name) == fingerprint:
+                content_hash = self.content_hash(
+                    activation, name, fingerprint)
+        except OSError:
+            pass
+        for file_access in file_accesses:
+            file_access.content_hash_after = content_hash
+            file_access.done = True
+
     def augaccess(self, activation, access):
         """Repeat access depa.
         Propagate this dependency"""
@@ -271,6 +438,7 @@ class Collector(object):
                 addr = "[{}]".format(nvindex)
                 value = vcontainer[vindex]
                 if not activation.active:
+                    activation.dependencies.pop()
                     return value
                 if value_dep is not None:
                     collection = value_dep.evaluation
@@ -280,6 +448,7 @@ class Collector(object):
                 addr = ".{}".format(vindex)
                 value = getattr(vcontainer, vindex)
                 if not activation.active:
+                    activation.dependencies.pop()
                     return value
                 if value_dep is not None:
                     self.full_member_lookup(
@@ -381,7 +550,7 @@ class Collector(object):
         now = self.get_time()
         if (self.partial_save_frequency and
                 (now - self.last_partial_save > self.partial_save_frequency)):
-            self.store(partial=True)
+            self.partial_store()
 
         return now
 
@@ -397,6 +566,7 @@ class Collector(object):
             exc_handler=float('inf'), # do not delete
         ))
         activation.parent = act
+        activation.last_activation = self.last_activation
         self.last_activation = activation
         return activation
 
@@ -421,15 +591,32 @@ class Collector(object):
         """Close activation. Set checkpoint and value"""
         evaluation = activation.evaluation
         evaluation.checkpoint = self.time()
-        evaluation.repr = self.get_value(value)
+        self.set_repr(evaluation, value)
         evaluation.set_reference(reference)
-        self.add_type(evaluation, value)
+        if evaluation.id != -1:
+            # Dry activations are not stored. Do not create members for them
+            self.add_type(evaluation, value)
         self.last_activation = activation.last_activation
+        file_accesses = OrderedDict()
         for file_access in activation.file_accesses:
-            if os.path.exists(file_access.name):
-                with content.std_open(file_access.name, "rb") as fil:
-                    file_access.content_hash_after = content.put(fil.read(), file_access.name)
-            file_access.done = True
+            file_accesses.setdefault(file_access.name, []).append(file_access)
+        for name, accesses in viewitems(file_accesses):
+            try:
+                fingerprint = file_fingerprint(name)
+            except OSError:
+                fingerprint = None
+            if (self.content_capture is None or fingerprint is None or
+                    self.reused_hash(activation, name, fingerprint)):
+                self.capture_content(activation, name, fingerprint, accesses)
+            else:
+                self.content_capture.submit(
+                    name, self.capture_content,
+                    activation, name, fingerprint, accesses
+                )
+        if self.call_storage_frequency:
+            self.calls_since_save += 1
+            if self.calls_since_save >= self.call_storage_frequency:
+                self.partial_store()
 
     def start_script(self, module_name, code_component_id, iscell):
         """Start script collection. Create new activation"""
@@ -574,7 +761,7 @@ class Collector(object):
         if activation.iscell:
             evaluation = activation.evaluation
             reference = self.find_reference_dependency(value, depa)
-            evaluation.repr = self.get_value(value)
+            self.set_repr(evaluation, value)
             evaluation.set_reference(reference)
             self.make_dependencies(activation, evaluation, depa)
             if 'Out' not in activation.context:
@@ -1386,7 +1573,7 @@ class Collector(object):
                     bound_dependency.mode = "init"
                     depa.add(bound_dependency)
                     evaluation = activation.evaluation
-                    evaluation.repr = self.get_value(value)
+                    self.set_repr(evaluation, value)
                     self.make_dependencies(activation, evaluation, depa)
                     bound_dependency.mode = old_mode
                     
@@ -1670,7 +1857,7 @@ class Collector(object):
         dependency_aware = activation.dependencies.pop()
         evaluation = activation.evaluation
         reference = self.find_reference_dependency(value, dependency_aware)
-        evaluation.repr = self.get_value(value)
+        self.set_repr(evaluation, value)
         evaluation.set_reference(reference)
         self.make_dependencies(activation, evaluation, dependency_aware)
         return value
@@ -1686,6 +1873,8 @@ class Collector(object):
     def _loop(self, activation, value):
         """Capture loop after. Return generator"""
         dependency = activation.dependencies.pop()
+        if self.metascript.loop_sampling and activation.active:
+            return self._sampled_loop_generator(activation, value, dependency)
         return self._loop_generator(activation, value, dependency)
 
     def enumerate_generator(self, activation, value, code_id, exc_handler):
@@ -1727,30 +1916,88 @@ class Collector(object):
         )
 
         for index, element, depa in it_:
-            clone_depa = dependency.clone(mode="dependency")
-            if len(dependency.dependencies) == 1 and activation.active:
-                dep = dependency.dependencies[0]
-                self.create_dependencies_id(
-                    activation.id, dep.evaluation.id, depa
-                )
-                bind = False
-                if len(depa.dependencies) == 1:
-                    gen_dep = depa.dependencies[0]
-                    bind = gen_dep.value == element
-                clone_depa, found = self.sub_dependency(
-                    dep, value, index, clone_depa
-                )
-                depa = depa.clone(mode="assign")
-                if found is not None:
-                    clone_depa.extra_dependencies = dependency.dependencies
-                clone_depa.extra_dependencies += depa.dependencies
-                if bind:
-                    clone_depa.swap()
-            assign = Assign(self.time(), element, clone_depa)
-            assign.index = index
-            activation.assignments.append(assign)
+            self.loop_iteration(
+                activation, value, dependency, index, element, depa
+            )
             yield element
 
+    def _sampled_loop_generator(self, activation, value, dependency):
+        """Loop generator that collects only the sampled iterations
+        Elided iterations run with an inactive activation.
+        Create a loop summary if it elides iterations"""
+        # pylint: disable=too-many-locals
+        sampling = self.metascript.loop_sampling
+        if not isinstance(sampling, LoopSampling):
+            sampling = LoopSampling(*sampling)
+        try:
+            length = length_hint(value, -1)
+        except Exception:                                                        # pylint: disable=broad-except
+            length = -1
+        it_ = self.enumerate_generator(
+            activation, value, dependency.code_id, dependency.exc_handler
+        )
+        start = self.time()
+        iterations = elided = 0
+        elided_duration = 0.0
+        elided_start = None
+        try:
+            for index, element, depa in it_:
+                iterations += 1
+                checkpoint = self.time()
+                if elided_start is not None:
+                    elided_duration += checkpoint - elided_start
+                    elided_start = None
+                if sampling.keep(index, length):
+                    activation.active = True
+                    self.loop_iteration(
+                        activation, value, dependency, index, element, depa
+                    )
+                else:
+                    activation.active = False
+                    elided += 1
+                    elided_start = checkpoint
+                    assign = Assign(checkpoint, element, dependency)
+                    assign.index = index
+                    activation.assignments.append(assign)
+                yield element
+        finally:
+            activation.active = True
+            end = self.time()
+            if elided_start is not None:
+                elided_duration += end - elided_start
+            if elided:
+                self.loop_summaries.add(
+                    self.trial_id, activation.id, dependency.code_id,
+                    iterations, elided, start, end, elided_duration
+                )
+
+    def loop_iteration(self, activation, value, dependency, index, element,
+                       depa):
+        """Create assign for loop iteration"""
+        # pylint: disable=too-many-arguments
+        clone_depa = dependency.clone(mode="dependency")
+        if len(dependency.dependencies) == 1 and activation.active:
+            dep = dependency.dependencies[0]
+            self.create_dependencies_id(
+                activation.id, dep.evaluation.id, depa
+            )
+            bind = False
+            if len(depa.dependencies) == 1:
+                gen_dep = depa.dependencies[0]
+                bind = gen_dep.value == element
+            clone_depa, found = self.sub_dependency(
+                dep, value, index, clone_depa
+            )
+            depa = depa.clone(mode="assign")
+            if found is not None:
+                clone_depa.extra_dependencies = dependency.dependencies
+            clone_depa.extra_dependencies += depa.dependencies
+            if bind:
+                clone_depa.swap()
+        assign = Assign(self.time(), element, clone_depa)
+        assign.index = index
+        activation.assignments.append(assign)
+
     def condition(self, activation, exc_handler):
         """Capture condition before"""
         activation.dependencies.append(DependencyAware(
@@ -1768,6 +2015,20 @@ class Collector(object):
 
         return value
 
+    def elif_condition(self, activation, exc_handler):
+        """Capture elif condition before"""
+        self.condition(activation, exc_handler)
+        return self._elif_condition
+
+    def _elif_condition(self, activation, value):
+        """Capture elif condition after. Join it to the previous condition"""
+        self._condition(activation, value)
+        dependency = activation.conditions.pop()
+        activation.conditions[-1] = DependencyAware.join([
+            activation.conditions[-1], dependency
+        ])
+        return value
+
     def rcondition(self, activation, exc_handler):
         """Capture rcondition before. Remove conditions if false"""
         self.condition(activation, exc_handler)
@@ -1902,10 +2163,12 @@ class Collector(object):
         if value in self.shared_types:
             return self.shared_types[value]
         trial_id = self.trial_id
+        # Type names are never truncated by the value representation limits
+        name = repr(value)
         tevaluation = self.evaluations.add_object(
             trial_id, self.code_components.add(
-                trial_id, self.get_value(value), 'type', 'w', -1, -1, -1, -1, -1
-            ), -1, self.time(), self.get_value(value)
+                trial_id, name, 'type', 'w', -1, -1, -1, -1, -1
+            ), -1, self.time(), name
         )
         self.shared_types[value] = tevaluation
         if value is type:
@@ -1954,8 +2217,9 @@ class Collector(object):
         if checkpoint is None:
             checkpoint = self.time()
         evaluation = self.evaluations.add_object(
-            self.trial_id, code_id, activation_id, checkpoint, self.get_value(value)
+            self.trial_id, code_id, activation_id, checkpoint, None
         )
+        self.set_repr(evaluation, value)
         evaluation.set_reference(reference)
         self.add_type(evaluation, value)
         return evaluation
@@ -1964,17 +2228,29 @@ class Collector(object):
         """Store execution provenance"""
         metascript = self.metascript
         tid = metascript.trial_id
+        self.render_reprs()
+        if not partial and self.content_capture is not None:
+            self.content_capture.close()
 
-        metascript.code_components_store.do_store(partial)
-        metascript.evaluations_store.do_store(partial)
-        metascript.activations_store.do_store(partial)
-        metascript.dependencies_store.do_store(partial)
-        metascript.members_store.do_store(partial)
-        metascript.file_accesses_store.do_store(partial)
-        metascript.stage_tags_store.do_store(partial)
+        if self.flusher is not None:
+            if partial:
+                self.flusher.wait()
+            else:
+                flusher, self.flusher = self.flusher, None
+                flusher.stop()
+
+        if metascript.event_log is not None:
+            for store in self.storage_stores():
+                store.do_store(partial)
+        else:
+            bulk = metascript.bulk_store and not partial
+            with relational.ingest_mode(bulk), BulkWriter() as writer:
+                for store in self.storage_stores():
+                    store.do_store(partial, writer)
 
         now = self.get_time()
         if not partial:
             Trial.fast_update(tid, metascript.main_id, datetime.now(), status)
 
+        self.calls_since_save = 0
         self.last_partial_save = now
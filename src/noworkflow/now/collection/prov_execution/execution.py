@@ -39,6 +39,8 @@ class Execution(object):
     def configure(self):
         """Configure execution provenance collection"""
         self.collector.trial_id = self.metascript.trial_id
+        self.collector.configure_storage()
+        self.collector.configure_repr()
         builtin = self.metascript.namespace["__builtins__"]
 
 
@@ -0,0 +1,149 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Value representations"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import reprlib
+import sys
+
+from collections import deque
+from itertools import islice
+
+from ...utils.cross_version import IMMUTABLE
+
+from .summarizers import summarize
+
+
+def object_repr(value):
+    """Return repr of value
+    Use the original __repr__ of functions rewritten by noWorkflow"""
+    repr_fn = repr
+    if type(value) is not type:
+        try:
+            the_repr = object.__getattribute__(value, '__repr__')
+            repr_fn = getattr(the_repr, 'original_def')
+        except AttributeError:
+            pass
+    return repr_fn(value)
+
+
+def summarized_repr(value):
+    """Return value summary if its type has a summarizer. Otherwise, repr"""
+    summary = summarize(value)
+    if summary is None:
+        return object_repr(value)
+    return summary
+
+
+def identity_token(value):
+    """Return cheap representation with type and identity"""
+    return "<{} object at {:#x}>".format(type(value).__name__, id(value))
+
+
+def is_deferrable(value):
+    """Check if the repr of value can be rendered later"""
+    return isinstance(value, IMMUTABLE)
+
+
+class BoundedRepr(reprlib.Repr):
+    """Representation limited by size, depth and number of items
+
+    Limits are enforced while the representation is built: containers stop
+    iterating once the budget of characters or items is exhausted. Objects
+    with custom reprs can only be truncated after their repr is built.
+    """
+
+    def __init__(self, max_chars=None, max_depth=None, max_items=None,
+                 base_repr=object_repr):
+        super(BoundedRepr, self).__init__()
+        self.base_repr = base_repr
+        self.max_chars = max_chars or sys.maxsize
+        self.remaining = self.max_chars
+        self.maxlevel = max_depth or sys.maxsize
+        items = max_items or sys.maxsize
+        self.maxtuple = self.maxlist = self.maxarray = items
+        self.maxdict = self.maxset = self.maxfrozenset = self.maxdeque = items
+        self.maxstring = self.maxlong = self.maxother = self.max_chars
+        self.dispatch = {
+            tuple: self.repr_tuple,
+            list: self.repr_list,
+            dict: self.repr_dict,
+            set: self.repr_set,
+            frozenset: self.repr_frozenset,
+            deque: self.repr_deque,
+            str: self.repr_str,
+            int: self.repr_int,
+        }
+
+    def repr(self, x):
+        self.remaining = self.max_chars
+        result = self.repr1(x, self.maxlevel)
+        if len(result) > self.max_chars:
+            result = result[:max(self.max_chars - 3, 0)] + "..."
+        return result
+
+    def repr1(self, x, level):
+        # Dispatch only exact builtin types. Subclasses may define __repr__
+        method = self.dispatch.get(type(x))
+        if method is not None:
+            return method(x, level)
+        return self.repr_instance(x, level)
+
+    def _consume(self, piece):
+        """Consume budget of characters. Return piece"""
+        self.remaining -= len(piece) + 2
+        return piece
+
+    def _repr_iterable(self, x, level, left, right, maxiter, trail=''):
+        # pylint: disable=too-many-arguments
+        if not x:
+            return left + right
+        if level <= 0:
+            return left + "..." + right
+        pieces = []
+        for elem in islice(x, maxiter):
+            if self.remaining <= 0:
+                break
+            pieces.append(self._consume(self.repr1(elem, level - 1)))
+        if len(pieces) < len(x):
+            pieces.append("...")
+        elif len(pieces) == 1 and trail:
+            right = trail + right
+        return "{}{}{}".format(left, ", ".join(pieces), right)
+
+    def repr_set(self, x, level):
+        if not x:
+            return "set()"
+        return self._repr_iterable(x, level, "{", "}", self.maxset)
+
+    def repr_frozenset(self, x, level):
+        if not x:
+            return "frozenset()"
+        return self._repr_iterable(
+            x, level, "frozenset({", "})", self.maxfrozenset
+        )
+
+    def repr_dict(self, x, level):
+        if not x:
+            return "{}"
+        if level <= 0:
+            return "{...}"
+        pieces = []
+        for key, value in islice(x.items(), self.maxdict):
+            if self.remaining <= 0:
+                break
+            pieces.append(self._consume("{}: {}".format(
+                self.repr1(key, level - 1), self.repr1(value, level - 1)
+            )))
+        if len(pieces) < len(x):
+            pieces.append("...")
+        return "{%s}" % (", ".join(pieces),)
+
+    def repr_instance(self, x, level):
+        result = self.base_repr(x)
+        if len(result) > self.maxother:
+            result = result[:max(self.maxother - 3, 0)] + "..."
+        return result
@@ -59,19 +59,32 @@ class Assign(namedtuple("Assign", "checkpoint value dependency")):
             self.generators[obj_id] = generator
 
 
-class ConditionExceptions(object):
-    """Exception factory for handling ifs transformed into tries"""
-    # pylint: disable=too-few-public-methods
-    def __init__(self):
-        self.exceptions = {}
-
-    def __getitem__(self, item):
-        if item not in self.exceptions:
-            class ConditionException(Exception):
-                """If body Exception"""
-                pass
-            self.exceptions[item] = ConditionException
-        return self.exceptions[item]
+class LoopSampling(namedtuple("LoopSampling", "first every last")):
+    """Loop iterations that should be collected with full provenance"""
+
+    @classmethod
+    def parse(cls, text):
+        """Parse sampling from 'first=K,every=N,last=M'
+        Missing parts default to 0"""
+        values = {"first": 0, "every": 0, "last": 0}
+        for part in text.split(","):
+            key, sep, value = part.partition("=")
+            key = key.strip()
+            if not sep or key not in values:
+                raise ValueError("invalid loop sampling part: {}".format(part))
+            values[key] = int(value)
+            if values[key] < 0:
+                raise ValueError("negative loop sampling: {}".format(part))
+        return cls(**values)
+
+    def keep(self, index, length):
+        """Check if iteration index should be collected
+        The last iterations are only known when the loop has a length"""
+        return (
+            index < self.first or
+            (self.every and index % self.every == 0) or
+            (length >= 0 and index >= length - self.last)
+        )
 
 
 class DependencyAware(object):
@@ -0,0 +1,124 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Type-specific value summarizers
+
+Summaries replace the repr of values that are expensive to represent.
+They only depend on the value content, so equal values have equal
+summaries across trials.
+Summarizers are registered by qualified type name. Thus, optional
+libraries (numpy, pandas) are never imported by noWorkflow.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+
+
+SUMMARIZERS = {}
+# Summarizer of each visited type. None indicates that it has no summarizer
+_TYPE_CACHE = {}
+
+# Hash at most this number of bytes/elements of a value
+SAMPLE_SIZE = 1 << 20
+# Bytes smaller than this are represented by repr
+SMALL_BYTES = 64
+# Summaries list at most this number of data frame columns
+SUMMARY_COLUMNS = 20
+
+
+def type_name(cls):
+    """Return qualified type name"""
+    return "{}.{}".format(
+        cls.__module__, getattr(cls, "__qualname__", cls.__name__)
+    )
+
+
+def register_summarizer(*names):
+    """Register summarizer function for qualified type names"""
+    def decorator(func):
+        """Register func"""
+        for name in names:
+            SUMMARIZERS[name] = func
+        _TYPE_CACHE.clear()
+        return func
+    return decorator
+
+
+def find_summarizer(cls):
+    """Return summarizer of type or of its first registered base type"""
+    try:
+        return _TYPE_CACHE[cls]
+    except KeyError:
+        pass
+    summarizer = None
+    for base in getattr(cls, "__mro__", (cls,)):
+        summarizer = SUMMARIZERS.get(type_name(base))
+        if summarizer is not None:
+            break
+    _TYPE_CACHE[cls] = summarizer
+    return summarizer
+
+
+def summarize(value):
+    """Return value summary or None if value has no summarizer"""
+    summarizer = find_summarizer(type(value))
+    if summarizer is None:
+        return None
+    return summarizer(value)
+
+
+def digest(data):
+    """Return short content digest"""
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+
+@register_summarizer("builtins.bytes", "builtins.bytearray")
+def summarize_bytes(value):
+    """Summarize bytes by length and digest"""
+    if len(value) < SMALL_BYTES:
+        return repr(value)
+    return "<{} len={} digest={}>".format(
+        type(value).__name__, len(value), digest(bytes(value))
+    )
+
+
+@register_summarizer("numpy.ndarray")
+def summarize_ndarray(value):
+    """Summarize numpy array by shape, dtype and sampled digest"""
+    sample = value
+    limit = SAMPLE_SIZE // max(value.itemsize, 1)
+    if value.size > limit:
+        # flatiter slices copy only the sampled elements
+        sample = value.flat[::value.size // limit]
+    if value.dtype.hasobject:
+        data = repr(sample.tolist()).encode("utf-8")
+    else:
+        data = sample.tobytes()
+    return "<ndarray shape={} dtype={} digest={}>".format(
+        value.shape, value.dtype, digest(data)
+    )
+
+
+@register_summarizer("pandas.core.frame.DataFrame", "pandas.DataFrame")
+def summarize_dataframe(value):
+    """Summarize pandas DataFrame by shape, columns and column digests"""
+    from pandas.util import hash_pandas_object
+    digests = []
+    for index in range(value.shape[1]):
+        column = value.iloc[:, index]
+        try:
+            data = hash_pandas_object(column, index=False).values.tobytes()
+        except TypeError:
+            data = repr(column.tolist()).encode("utf-8")
+        digests.append(digest(data))
+    columns = list(value.columns)
+    if len(columns) > SUMMARY_COLUMNS:
+        # The last digest covers the columns that are not listed
+        rest = digest("".join(digests[SUMMARY_COLUMNS:]).encode("ascii"))
+        columns = columns[:SUMMARY_COLUMNS] + ["..."]
+        digests = digests[:SUMMARY_COLUMNS] + [rest]
+    return "<DataFrame shape={} columns={} digests={}>".format(
+        value.shape, columns, digests
+    )
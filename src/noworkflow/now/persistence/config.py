@@ -26,6 +26,10 @@ class PersistenceConfig(object):
         self.should_mock = False
         self.content_dir = None
         self.content_engine = None # Force a content engine
+        self.fingerprint_cache = True  # Reuse hashes of unchanged files
+        self.strict_fingerprints = False  # Verify reused hashes
+        self.content_hash = None  # Hash algorithm of new contents
+        self.storage_profile = "default"  # SQLite pragmas of the database
 
         if path:
             self.path = path
@@ -3,10 +3,109 @@ import codecs
 import os
 import builtins
 import hashlib
+import shutil
+import tempfile
+import time
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from . import safeopen
 
+# Contents are read in chunks of this size. Peak memory does not depend on
+# the content size
+CHUNK_SIZE = 1 << 16
+# Contents stored less than this before a sweep may belong to running
+# trials that did not store their provenance yet. Do not remove them
+SWEEP_GRACE_SECONDS = 3600
+
+
+@contextmanager
+def open_content(content):
+    """Open bytes, file path, or binary stream content for reading
+    Yield a seekable binary stream and the number of bytes to read from it"""
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(content), len(content)
+        return
+    if isinstance(content, (str, os.PathLike)):
+        with safeopen.std_open(content, "rb") as stream:
+            yield stream, os.fstat(stream.fileno()).st_size
+        return
+    try:
+        start = content.tell()
+        size = content.seek(0, io.SEEK_END) - start
+        content.seek(start)
+    except (AttributeError, OSError):
+        # Not seekable: spool it
+        with safeopen.use_safe_open(), \
+                tempfile.SpooledTemporaryFile(CHUNK_SIZE) as spool:
+            shutil.copyfileobj(content, spool, CHUNK_SIZE)
+            size = spool.tell()
+            spool.seek(0)
+            yield spool, size
+        return
+    yield content, size
+
+
+def iter_chunks(stream, size):
+    """Read up to size bytes from stream in chunks"""
+    while size > 0:
+        chunk = stream.read(min(CHUNK_SIZE, size))
+        if not chunk:
+            break
+        size -= len(chunk)
+        yield chunk
+
+
+def read_content(content):
+    """Return bytes of bytes, file path, or binary stream content"""
+    if isinstance(content, bytes):
+        return content
+    with open_content(content) as (stream, size):
+        return b"".join(iter_chunks(stream, size))
+
+
+def _remove(filename):
+    """Remove file, if it exists"""
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def touch(filename):
+    """Refresh modification time of stored content, so sweeps keep it
+    during the grace period. Return False if it does not exist"""
+    try:
+        os.utime(filename)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def sweep_files(filenames, dry_run=False, workers=None,
+                grace=SWEEP_GRACE_SECONDS):
+    """Remove files of a {filename: content_hash} dict in parallel threads
+    Skip files modified less than grace seconds ago.
+    Return removed hashes and their size in bytes"""
+    limit = time.time() - grace
+    removed, size, targets = [], 0, []
+    for filename, content_hash in filenames.items():
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            continue
+        if stat.st_mtime > limit:
+            continue
+        removed.append(content_hash)
+        size += stat.st_size
+        targets.append(filename)
+    if not dry_run and targets:
+        with ThreadPoolExecutor(workers) as executor:
+            for _ in executor.map(_remove, targets):
+                pass
+    return removed, size
+
+
 class ContentDatabaseEngine(object):
     def __init__(self, config):
         self.content_path = None
@@ -25,15 +124,21 @@ class ContentDatabaseEngine(object):
 
         def put(content=None, filename="generic"):
             """Mock put"""
+            content = read_content(content)
             hash_code = hashlib.sha1(content).hexdigest()
             self.temp[hash_code] = content
             return hash_code
 
+        def hash_(content):
+            """Mock hash"""
+            return hashlib.sha1(read_content(content)).hexdigest()
+
         def get(content_hash):
             """Mock get"""
             return self.temp[content_hash]
 
         self.put = put
+        self.hash = hash_
         self.get = get
 
     def connect(self, config):
@@ -45,9 +150,25 @@ class ContentDatabaseEngine(object):
         raise NotImplementedError("Implement in subclass")
 
     def put(self, content, filename="generic"):  # pylint: disable=method-hidden
-        """Put file into database"""
+        """Put file into database
+        Content may be bytes, a file path, or a binary stream"""
+        raise NotImplementedError("Implement in subclass")
+
+    def put_batch(self, batch):
+        """Perform do_put operations of a batch of put_attr attributes
+        This is used in the threading wrapper"""
+        for attrs in batch:
+            self.do_put(*attrs)
+
+    def hash(self, content):  # pylint: disable=method-hidden
+        """Return content hash without storing it
+        Content may be bytes, a file path, or a binary stream"""
         raise NotImplementedError("Implement in subclass")
 
+    def reuse(self, content_hash, filename="generic"):
+        """Register stored content as put by filename"""
+        pass  # do nothing by default
+
     def get(self, content_hash):  # pylint: disable=method-hidden
         """Get file from database"""
         raise NotImplementedError("Implement in subclass")
@@ -60,6 +181,12 @@ class ContentDatabaseEngine(object):
         """Collect garbage from database"""
         raise NotImplementedError("Implement in subclass")
 
+    def sweep(self, live, dry_run=False, workers=None,
+              grace=SWEEP_GRACE_SECONDS):
+        """Remove contents whose hashes are not in the live set
+        Return removed hashes and their size in bytes"""
+        raise NotImplementedError("Implement in subclass")
+
     def commit_content(self, message):
         """Commit content"""
         raise NotImplementedError("Implement in subclass")
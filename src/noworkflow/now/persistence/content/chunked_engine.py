@@ -0,0 +1,213 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content database engine that deduplicates content-defined chunks"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import os
+import re
+import uuid
+
+from collections import deque
+from os.path import join
+
+from .base import open_content, sweep_files, touch, _remove
+from .base import SWEEP_GRACE_SECONDS
+from .hashes import DEFAULT_ALGORITHM
+from .hashes import new_hash, tag, digest, content_filename
+from .hashes import find_prefix, list_hashes
+from .index import ContentIndex, CONTENT_INDEX_FILE, append_hashes
+from .plain_engine import PlainEngine
+from . import safeopen
+
+
+CHUNKED_DATABASE_DIR = "content.chunked"
+CHUNKS_DIR = "chunks"
+MANIFESTS_DIR = "manifests"
+
+# Chunk boundaries are chosen after MIN_CHUNK bytes, where the hash of the
+# last WINDOW bytes is zero. Chunks larger than MAX_CHUNK are split. With
+# 16-bit window hashes, chunks have about MIN_CHUNK + 64 KiB bytes
+MIN_CHUNK = 1 << 16
+MAX_CHUNK = 1 << 20
+WINDOW = 8
+# Tabulation hash: one random translation table per output byte and offset
+WINDOW_TABLES = [
+    [hashlib.shake_128("noworkflow chunk {} {}".format(byte, offset)
+                       .encode("ascii")).digest(256)
+     for offset in range(WINDOW)]
+    for byte in range(2)
+]
+
+ZERO = re.compile(b"\x00")
+
+
+def boundaries(data):
+    """Return end positions of data windows with zero hash
+    Hashes are computed for all positions at once with bytes.translate and
+    integer operations"""
+    size = len(data)
+    result = 0
+    for tables in WINDOW_TABLES:
+        window_hash = 0
+        for offset, table in enumerate(tables):
+            window_hash ^= int.from_bytes(
+                data.translate(table), "little") << (8 * offset)
+        result |= window_hash
+    hashes = result.to_bytes(size + WINDOW, "little")
+    return [
+        match.end() for match in ZERO.finditer(hashes, WINDOW - 1, size)
+    ]
+
+
+def iter_cdc_chunks(stream, size):
+    """Split up to size bytes of stream into content-defined chunks
+    Insertions and removals only change the chunks around them"""
+    buffer = bytearray()
+    start = 0  # Position of buffer in stream
+    scanned = 0  # Bytes with computed boundaries
+    context = b""  # Last bytes of the previous block
+    candidates = deque()
+    while True:
+        while len(buffer) < MAX_CHUNK and size > 0:
+            block = stream.read(min(MAX_CHUNK, size))
+            if not block:
+                size = 0
+                break
+            size -= len(block)
+            data = context + block
+            base = scanned - len(context)
+            candidates.extend(
+                base + position for position in boundaries(data)
+                if position > len(context)
+            )
+            context = data[-(WINDOW - 1):]
+            scanned += len(block)
+            buffer += block
+        if not buffer:
+            return
+        while candidates and candidates[0] - start < MIN_CHUNK:
+            candidates.popleft()
+        if candidates and candidates[0] - start <= MAX_CHUNK:
+            cut = candidates.popleft() - start
+        else:
+            cut = min(MAX_CHUNK, len(buffer))
+        chunk = bytes(buffer[:cut])
+        del buffer[:cut]
+        start += cut
+        yield chunk
+
+
+def write_file(filename, data):
+    """Write data to filename atomically, if it does not exist
+    Return True if it was written"""
+    if touch(filename):
+        return False
+    directory = os.path.dirname(filename)
+    os.makedirs(directory, exist_ok=True)
+    temp_filename = join(directory, "tmp_" + uuid.uuid4().hex)
+    try:
+        with safeopen.std_open(temp_filename, "wb") as temp_file:
+            temp_file.write(data)
+        os.replace(temp_filename, filename)
+    except BaseException:
+        _remove(temp_filename)
+        raise
+    return True
+
+
+class ChunkedEngine(PlainEngine):
+    """Store contents as manifests of deduplicated content-defined chunks
+
+    The manifest of a content lists the hashes and sizes of its chunks. It
+    is stored by the hash of the whole content, so hashes are the same of
+    the plain engine. Versions of a file that differ by a few changes share
+    most of their chunks.
+    """
+
+    def set_path(self, config):
+        """Set content path"""
+        self.content_path = join(config.provenance_path, CHUNKED_DATABASE_DIR)
+        self.index = ContentIndex(join(self.content_path, CONTENT_INDEX_FILE))
+
+    @staticmethod
+    def do_put(content_path, content, algorithm=DEFAULT_ALGORITHM):
+        """Store chunks and manifest of content"""
+        content_hash = new_hash(algorithm)
+        manifest = []
+        with open_content(content) as (stream, size):
+            for chunk in iter_cdc_chunks(stream, size):
+                content_hash.update(chunk)
+                chunk_hash = digest(chunk, algorithm)
+                write_file(content_filename(
+                    join(content_path, CHUNKS_DIR), chunk_hash), chunk)
+                manifest.append("{} {}\n".format(chunk_hash, len(chunk)))
+        content_hash = tag(algorithm, content_hash.hexdigest())
+        if write_file(content_filename(join(content_path, MANIFESTS_DIR),
+                                       content_hash),
+                      "".join(manifest).encode("ascii")):
+            append_hashes(join(content_path, CONTENT_INDEX_FILE),
+                          [content_hash])
+        return content_hash
+
+    def get(self, content_hash):  # pylint: disable=method-hidden
+        """Reassemble content from its chunks"""
+        manifest_filename = content_filename(
+            join(self.content_path, MANIFESTS_DIR), content_hash)
+        with safeopen.std_open(manifest_filename, "r") as manifest:
+            chunk_hashes = [line.split()[0] for line in manifest if line]
+        result = []
+        for chunk_hash in chunk_hashes:
+            with safeopen.std_open(content_filename(
+                    join(self.content_path, CHUNKS_DIR), chunk_hash),
+                                   "rb") as chunk:
+                result.append(chunk.read())
+        return b"".join(result)
+
+    def find_subhash(self, content_hash):
+        """Get hash that starts by content_hash"""
+        return (
+            self.index.find_prefix(content_hash) or
+            find_prefix(join(self.content_path, MANIFESTS_DIR), content_hash)
+        )
+
+    def stored_hashes(self):
+        """Return hashes of all contents by listing the manifests"""
+        return list_hashes(join(self.content_path, MANIFESTS_DIR))
+
+    def sweep(self, live, dry_run=False, workers=None,
+              grace=SWEEP_GRACE_SECONDS):
+        """Remove manifests whose hashes are not in the live set, and chunks
+        that are not in the remaining manifests
+        Return removed hashes and their size in bytes"""
+        manifests = join(self.content_path, MANIFESTS_DIR)
+        chunks = join(self.content_path, CHUNKS_DIR)
+        all_hashes = self.listAll()
+        removed, size = sweep_files({
+            content_filename(manifests, content_hash): content_hash
+            for content_hash in all_hashes
+            if content_hash not in live
+        }, dry_run, workers, grace)
+        if not dry_run:
+            self.index.remove(removed)
+        removed_set = set(removed)
+        live_chunks = set()
+        for content_hash in all_hashes:
+            if content_hash in removed_set:
+                continue
+            try:
+                with safeopen.std_open(content_filename(
+                        manifests, content_hash), "r") as manifest:
+                    live_chunks.update(
+                        line.split()[0] for line in manifest if line.strip())
+            except FileNotFoundError:
+                continue
+        _, chunks_size = sweep_files({
+            content_filename(chunks, chunk_hash): chunk_hash
+            for chunk_hash in list_hashes(chunks)
+            if chunk_hash not in live_chunks
+        }, dry_run, workers, grace)
+        return removed, size + chunks_size
@@ -11,7 +11,7 @@ from dulwich.objects import Commit
 from dulwich.objects import parse_timezone
 from dulwich.objectspec import scan_for_short_id
 
-from .gitbase import GitContentDatabaseEngine
+from .gitbase import GitContentDatabaseEngine, write_loose_blob
 from .parallel import create_distributed, create_pool, create_threading, NullLock
 from . import safeopen
 
@@ -37,6 +37,11 @@ class DulwichEngine(GitContentDatabaseEngine):
     def do_put(content_path, object_hashes, lock, content, filename):
         """Perform put operation. This is used in the distributed wrapper"""
         with safeopen.use_safe_open():
+            if not isinstance(content, bytes):
+                with lock:
+                    content_hash = write_loose_blob(content_path, content)
+                result = object_hashes[filename] = content_hash
+                return result
             object_store = Repo(content_path).object_store
             blob = Blob.from_string(content)
             with lock:
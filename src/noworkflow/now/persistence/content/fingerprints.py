@@ -0,0 +1,122 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Persistent cache of file content hashes by stat fingerprint"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import json
+import os
+import time
+
+from . import safeopen
+
+
+FINGERPRINTS_DIR = "fingerprints"
+
+# Files modified less than this before hashing may change again without
+# changing their mtime. Do not cache them
+RACY_NS = 2 * 10 ** 9
+
+
+class FingerprintCache(object):
+    """Map (path, inode, size, mtime_ns) to the content hash of a file
+    and to whether the content is stored
+
+    Entries are appended to a log as JSON lines, so concurrent trials do not
+    lose each other's entries. The last entry of a path wins. The log is
+    compacted when it has more replaced entries than valid ones.
+    """
+
+    def __init__(self, path, strict=False):
+        self.path = path
+        self.strict = strict
+        self.entries = None
+        self.lines = 0
+
+    def load(self):
+        """Load log entries"""
+        self.entries = {}
+        self.lines = 0
+        try:
+            with safeopen.std_open(self.path, "r") as log:
+                for line in log:
+                    try:
+                        path, inode, size, mtime, content_hash, stored = (
+                            json.loads(line)
+                        )
+                    except ValueError:
+                        # Incomplete line of an interrupted append
+                        continue
+                    self.entries[path] = (
+                        inode, size, mtime, content_hash, stored
+                    )
+                    self.lines += 1
+        except (IOError, OSError):
+            return
+        if self.lines > 2 * len(self.entries) + 1000:
+            self.compact()
+
+    def compact(self):
+        """Rewrite log without replaced entries"""
+        try:
+            with safeopen.std_open(self.path + ".tmp", "w") as log:
+                for path, entry in self.entries.items():
+                    log.write(json.dumps([path] + list(entry)) + "\n")
+            os.replace(self.path + ".tmp", self.path)
+            self.lines = len(self.entries)
+        except (IOError, OSError):
+            pass
+
+    def get(self, path, stat, stored=False):
+        """Return cached hash of file or None if it may have changed
+        If stored is True, also return None if the content is not stored"""
+        if self.entries is None:
+            self.load()
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        inode, size, mtime, content_hash, is_stored = entry
+        if (inode, size, mtime) != (stat.st_ino, stat.st_size,
+                                    stat.st_mtime_ns):
+            return None
+        if stored and not is_stored:
+            return None
+        return content_hash
+
+    def set(self, path, stat, content_hash, stored=True):
+        """Cache hash of file with stat"""
+        if self.entries is None:
+            self.load()
+        if time.time() * 10 ** 9 - stat.st_mtime_ns < RACY_NS:
+            return
+        path = os.path.abspath(path)
+        entry = (
+            stat.st_ino, stat.st_size, stat.st_mtime_ns, content_hash, stored
+        )
+        self.entries[path] = entry
+        try:
+            directory = os.path.dirname(self.path)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            with safeopen.std_open(self.path, "a") as log:
+                log.write(json.dumps([path] + list(entry)) + "\n")
+            self.lines += 1
+        except (IOError, OSError):
+            pass
+
+    def forget(self, content_hashes):
+        """Mark entries of removed contents as not stored
+        Their hashes are still valid for files that did not change"""
+        if self.entries is None:
+            self.load()
+        content_hashes = set(content_hashes)
+        changed = False
+        for path, entry in self.entries.items():
+            inode, size, mtime, content_hash, stored = entry
+            if stored and content_hash in content_hashes:
+                self.entries[path] = (inode, size, mtime, content_hash, False)
+                changed = True
+        if changed:
+            self.compact()
@@ -1,5 +1,8 @@
 import subprocess
 import os
+import shutil
+
+from .base import CHUNK_SIZE
 
 def execute(cmd, default=None, **kwargs):
     p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, **kwargs)
@@ -32,6 +35,10 @@ def hash_object(content, git_path):
     p = subprocess.Popen(
         cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, 
         stdin=subprocess.PIPE, cwd=git_path)
+    if not isinstance(content, bytes):
+        # Stream content to git
+        shutil.copyfileobj(content, p.stdin, CHUNK_SIZE)
+        content = None
     out = p.communicate(content)[0]
     returncode = p.wait()
     if returncode != 0:
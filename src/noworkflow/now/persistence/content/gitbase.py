@@ -1,16 +1,65 @@
 import os
 import hashlib
+import threading
+import uuid
+import zlib
 
 from collections import Counter
 
 from ...utils.cross_version import bytes_string
 from . import git_system
-from .base import ContentDatabaseEngine
+from . import safeopen
+from .base import ContentDatabaseEngine, open_content, iter_chunks, _remove
 
 
 GIT_DATABASE_DIR = 'content.git'
 
 
+def blob_hash(stream, size):
+    """Return git blob hash of size bytes of stream"""
+    content_hash = hashlib.sha1(
+        bytes_string('blob {}'.format(size)) + b'\0'
+    )
+    for chunk in iter_chunks(stream, size):
+        content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def write_loose_blob(content_path, content):
+    """Write content as a loose object of a bare repository in chunks
+    Hash and compress it in a single read. Return the blob hash"""
+    objects_path = os.path.join(content_path, "objects")
+    with open_content(content) as (stream, size):
+        header = bytes_string('blob {}'.format(size)) + b'\0'
+        temp_filename = os.path.join(objects_path, "tmp_" + uuid.uuid4().hex)
+        content_hash = hashlib.sha1(header)
+        compressor = zlib.compressobj()
+        written = 0
+        try:
+            with safeopen.std_open(temp_filename, "wb") as object_file:
+                object_file.write(compressor.compress(header))
+                for chunk in iter_chunks(stream, size):
+                    content_hash.update(chunk)
+                    object_file.write(compressor.compress(chunk))
+                    written += len(chunk)
+                object_file.write(compressor.flush())
+            if written != size:
+                # The header has the size of the content before reading it
+                raise IOError("content changed while reading it")
+            content_hash = content_hash.hexdigest()
+            object_filename = os.path.join(
+                objects_path, content_hash[:2], content_hash[2:])
+            if os.path.isfile(object_filename):
+                _remove(temp_filename)
+                return content_hash
+            os.makedirs(os.path.dirname(object_filename), exist_ok=True)
+            os.replace(temp_filename, object_filename)
+        except BaseException:
+            _remove(temp_filename)
+            raise
+    return content_hash
+
+
 class GitContentDatabaseEngine(ContentDatabaseEngine):
     def __init__(self, config):
         super(GitContentDatabaseEngine, self).__init__(config)
@@ -19,22 +68,43 @@ class GitContentDatabaseEngine(ContentDatabaseEngine):
         self._commit_ref = 'refs/heads/master'
         self._initial_message = "Initial Commit"
         self.name_counter = Counter()
+        self.name_lock = threading.Lock()  # Puts may run in worker threads
         self.base_path = None
         self.user_path = os.path.expanduser("~")
         self._max_filename_size = 4096
-        self.object_hashes = {}
+        self.object_hashes = {}  # Contents to commit
+        # Entries of the trees of the last commit by directory:
+        # {dirname: {basename: (is_tree, hash)}}
+        self.tree_entries = None
+        self.root_tree = None  # Root tree of the last commit
+        self.incremental_trees = True  # Write only changed trees
 
     def set_path(self, config):
         """Set content path"""
         self.content_path = os.path.join(config.provenance_path, GIT_DATABASE_DIR)
         self.base_path = os.path.abspath(config.base_path)
 
+    def hash(self, content):  # pylint: disable=method-hidden
+        """Return blob hash without storing it"""
+        with open_content(content) as (stream, size):
+            return blob_hash(stream, size)
+
+    def reuse(self, content_hash, filename="generic"):
+        """Add stored content to the next commit"""
+        self.object_hashes[self._inc_name(filename)] = content_hash
+
     def gc(self, aggressive=False):
         git_system.garbage_collection(self.content_path, aggressive)
 
     def commit_content(self, message):
         """Commit the current files of content database"""
         self.close()
+        if not self.incremental_trees:
+            return self.create_commit_object(message, self.build_trees())
+        return self.create_commit_object(message, self.update_trees())
+
+    def build_trees(self):
+        """Build all trees of the current files. Return root tree"""
         trees = {'': self.new_tree('')}
 
         for key, value in self.object_hashes.items():
@@ -50,13 +120,49 @@ class GitContentDatabaseEngine(ContentDatabaseEngine):
             if basename != '':
                 self.insert_tree(trees[dirname], basename, value)
 
-        return self.create_commit_object(message, tree_hashes[''])
+        return tree_hashes['']
+
+    def update_trees(self):
+        """Update the trees of the last commit with the files put since it
+        Write only the trees of changed directories. Return root tree"""
+        changes, self.object_hashes = self.object_hashes, {}
+        dirty = set()
+        if self.tree_entries is None:
+            self.tree_entries = {'': {}}
+            dirty.add('')
+        for key, value in changes.items():
+            dirname, basename = os.path.split(key)
+            self.tree_entries.setdefault(dirname, {})[basename] = (False, value)
+            while dirname not in dirty:
+                dirty.add(dirname)
+                if dirname == '':
+                    break
+                parent, basename = os.path.split(dirname)
+                self.tree_entries.setdefault(parent, {}).setdefault(
+                    basename, (True, None))
+                dirname = parent
+
+        for tree in sorted(dirty, key=len, reverse=True):
+            new_tree = self.new_tree(tree)
+            for basename, (is_tree, value) in self.tree_entries[tree].items():
+                if is_tree:
+                    self.insert_tree(new_tree, basename, value)
+                else:
+                    self.insert_blob(new_tree, basename, value)
+            value = self.write_tree(new_tree)
+            if tree == '':
+                self.root_tree = value
+            else:
+                dirname, basename = os.path.split(tree)
+                self.tree_entries[dirname][basename] = (True, value)
+        return self.root_tree
 
     def _increment(self, filename):
         """Increment filename to avoid collisions"""
         filename = filename.strip()
-        self.name_counter[filename] += 1
-        count = self.name_counter[filename] 
+        with self.name_lock:
+            self.name_counter[filename] += 1
+            count = self.name_counter[filename]
         if count == 1:
             return filename
         return "{} - v{}".format(filename, count)
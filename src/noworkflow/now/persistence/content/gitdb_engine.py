@@ -5,11 +5,10 @@
 """GitDb content database engine"""
 import hashlib
 
-from io import BytesIO
-
 from gitdb import LooseObjectDB, IStream
 
 from ...utils.cross_version import StringIO
+from .base import open_content
 from .pygit_engine import PyGitEngine
 
 # ToDo: implement other methods using GitDB to not depend on PyGitEngine
@@ -20,9 +19,16 @@ class GitDBPyGitEngine(PyGitEngine):
     def do_put(content_path, object_hashes, content, filename):
         """Perform put operation. This is used in the distributed wrapper"""
         ldb = LooseObjectDB("/{}/objects/".format(content_path))
-        istream = IStream("blob", len(content), BytesIO(content))
-        ldb.store(istream)
+        with open_content(content) as (stream, size):
+            istream = IStream("blob", size, stream)
+            ldb.store(istream)
         content_hash = istream.hexsha
         filename_hash = hashlib.sha1(filename.encode('utf-8')).hexdigest()
         result = object_hashes[filename_hash] = str(content_hash.decode('utf-8'))
         return result
+
+    def reuse(self, content_hash, filename="generic"):
+        """Add stored content to the next commit"""
+        filename_hash = hashlib.sha1(
+            self._inc_name(filename).encode('utf-8')).hexdigest()
+        self.object_hashes[filename_hash] = content_hash
@@ -0,0 +1,162 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content hash algorithms and tagged hashes
+
+SHA-1 hashes are plain hexdigests, as in previous versions. Hashes of other
+algorithms are tagged by the algorithm name: "blake2b-<hexdigest>". Stores
+may mix both formats. Contents of tagged hashes are stored in a directory
+named by the algorithm.
+"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import os
+import string
+
+from os.path import join, isdir
+
+
+DEFAULT_ALGORITHM = "sha1"
+HASH_ALGORITHM_FILE = "hash_algorithm"
+HEXDIGITS = frozenset(string.hexdigits.lower())
+
+
+def _blake2b():
+    """Return BLAKE2b hash with 160-bit digests"""
+    return hashlib.blake2b(digest_size=20)
+
+
+def _blake3():
+    """Return BLAKE3 hash. Requires blake3"""
+    import blake3
+    return blake3.blake3()
+
+
+def _xxh64():
+    """Return xxHash64 hash. Requires xxhash"""
+    import xxhash
+    return xxhash.xxh64()
+
+
+def _xxh128():
+    """Return xxHash128 hash. Requires xxhash"""
+    import xxhash
+    return xxhash.xxh128()
+
+
+ALGORITHMS = {
+    "sha1": hashlib.sha1,
+    "blake2b": _blake2b,
+    "blake3": _blake3,
+    "xxh64": _xxh64,
+    "xxh128": _xxh128,
+}
+
+PACKAGES = {
+    "blake3": "blake3",
+    "xxh64": "xxhash",
+    "xxh128": "xxhash",
+}
+
+
+def new_hash(algorithm=DEFAULT_ALGORITHM):
+    """Return new hash object of algorithm"""
+    try:
+        constructor = ALGORITHMS[algorithm]
+    except KeyError:
+        raise ValueError("unknown content hash algorithm {!r}. Use one of: {}"
+                         .format(algorithm, ", ".join(sorted(ALGORITHMS))))
+    try:
+        return constructor()
+    except ImportError:
+        raise ValueError("content hash algorithm {} requires the {} package"
+                         .format(algorithm, PACKAGES[algorithm]))
+
+
+def tag(algorithm, hexdigest):
+    """Return content hash of hexdigest computed by algorithm"""
+    if algorithm == DEFAULT_ALGORITHM:
+        return hexdigest
+    return "{}-{}".format(algorithm, hexdigest)
+
+
+def split(content_hash):
+    """Return algorithm and hexdigest of content hash"""
+    algorithm, sep, hexdigest = content_hash.rpartition("-")
+    return (algorithm if sep else DEFAULT_ALGORITHM), hexdigest
+
+
+def digest(content, algorithm=DEFAULT_ALGORITHM):
+    """Return content hash of bytes"""
+    content_hash = new_hash(algorithm)
+    content_hash.update(content)
+    return tag(algorithm, content_hash.hexdigest())
+
+
+def content_filename(directory, content_hash):
+    """Return filename of content_hash in directory"""
+    algorithm, hexdigest = split(content_hash)
+    if algorithm != DEFAULT_ALGORITHM:
+        directory = join(directory, algorithm)
+    return join(directory, hexdigest[:2], hexdigest[2:])
+
+
+def is_hexdigest(name):
+    """Check if name is a lowercase hexdigest"""
+    return bool(name) and HEXDIGITS.issuperset(name)
+
+
+def list_hashes(directory):
+    """Return content hashes stored in directory, in both formats"""
+    if not isdir(directory):
+        return []
+    result = []
+    for name in sorted(os.listdir(directory)):
+        path = join(directory, name)
+        if name in ALGORITHMS and isdir(path):
+            result.extend(tag(name, hexdigest)
+                          for hexdigest in _list_hexdigests(path))
+        elif len(name) == 2 and is_hexdigest(name) and isdir(path):
+            result.extend(name + filename
+                          for filename in sorted(os.listdir(path))
+                          if is_hexdigest(filename))
+    return result
+
+
+def _list_hexdigests(directory):
+    """Return hexdigests stored in directory of an algorithm"""
+    return [
+        dirname + filename
+        for dirname in sorted(os.listdir(directory))
+        if len(dirname) == 2 and is_hexdigest(dirname)
+        for filename in sorted(os.listdir(join(directory, dirname)))
+        if is_hexdigest(filename)
+    ]
+
+
+def find_prefix(directory, prefix):
+    """Return first content hash stored in directory that starts by prefix
+    Untagged prefixes match hashes of all algorithms, SHA-1 first"""
+    algorithm, hexdigest = split(prefix.lower())
+    if not is_hexdigest(hexdigest):
+        return None
+    if algorithm == DEFAULT_ALGORITHM and "-" not in prefix:
+        algorithms = [DEFAULT_ALGORITHM] + sorted(
+            name for name in ALGORITHMS if name != DEFAULT_ALGORITHM
+        )
+    else:
+        algorithms = [algorithm]
+    for name in algorithms:
+        base = directory
+        if name != DEFAULT_ALGORITHM:
+            base = join(directory, name)
+        content_dir = join(base, hexdigest[:2])
+        if len(hexdigest) < 2 or not isdir(content_dir):
+            continue
+        for filename in sorted(os.listdir(content_dir)):
+            if filename.startswith(hexdigest[2:]) and is_hexdigest(filename):
+                return tag(name, hexdigest[:2] + filename)
+    return None
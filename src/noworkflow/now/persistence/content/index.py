@@ -0,0 +1,183 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Persistent sorted index of stored content hashes"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import uuid
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from os.path import isfile
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from .hashes import ALGORITHMS, DEFAULT_ALGORITHM, split, tag
+from . import safeopen
+
+
+CONTENT_INDEX_FILE = "index"
+REMOVED = "-"
+
+
+@contextmanager
+def locked(path, exclusive=False):
+    """Lock the index log in path. Appends share the lock and rewrites
+    are exclusive, so rewrites do not lose concurrent appends.
+    Logs are not locked on systems without fcntl"""
+    if fcntl is None:
+        yield
+        return
+    with safeopen.std_open(path + ".lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield
+
+
+def append_hashes(path, content_hashes, removed=False):
+    """Append added or removed hashes to the index log in path
+    Do nothing if the index does not exist. It is rebuilt on connect"""
+    if not content_hashes or not isfile(path):
+        return
+    prefix = REMOVED if removed else ""
+    lines = "".join(
+        prefix + content_hash + "\n" for content_hash in content_hashes
+    )
+    with locked(path), safeopen.std_open(path, "a") as log:
+        log.write(lines)
+
+
+class ContentIndex(object):
+    """Sorted set of the content hashes of an engine
+
+    Puts and sweeps append added and removed hashes to a log, so concurrent
+    processes do not lose each other's entries. Reads only parse the lines
+    appended since the previous read. Removals rewrite the log in sorted
+    order when it has more replaced entries than valid ones.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.hashes = set()
+        self.sorted = None  # Sorted list of hashes, built on demand
+        self.position = 0  # Log position of the next read
+        self.inode = None  # Log inode of the previous read
+        self.lines = 0
+
+    def exists(self):
+        """Check if the index log exists"""
+        return isfile(self.path)
+
+    def rebuild(self, content_hashes):
+        """Replace index by content_hashes"""
+        self.hashes = set(content_hashes)
+        with locked(self.path, exclusive=True):
+            self._rewrite()
+
+    def refresh(self):
+        """Read entries appended since the last read"""
+        try:
+            with safeopen.std_open(self.path, "rb") as log:
+                inode = os.fstat(log.fileno()).st_ino
+                if inode != self.inode:
+                    # Rewritten by another process
+                    self.hashes = set()
+                    self.position = self.lines = 0
+                    self.inode = inode
+                log.seek(self.position)
+                data = log.read()
+        except (IOError, OSError):
+            return
+        # Ignore incomplete line of a running append
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return
+        self.position += end
+        for line in data[:end].decode("ascii").splitlines():
+            if not line:
+                continue
+            self.lines += 1
+            if line.startswith(REMOVED):
+                self.hashes.discard(line[1:])
+            else:
+                self.hashes.add(line)
+        self.sorted = None
+
+    def compact(self):
+        """Rewrite log with sorted valid entries
+        Entries appended by other processes before the rewrite are kept"""
+        with locked(self.path, exclusive=True):
+            self.refresh()
+            self._rewrite()
+
+    def _rewrite(self):
+        """Replace log by the sorted hashes. Call it with the log locked"""
+        self.sorted = sorted(self.hashes)
+        temp_path = self.path + ".tmp_" + uuid.uuid4().hex
+        try:
+            with safeopen.std_open(temp_path, "wb") as log:
+                log.write("".join(
+                    content_hash + "\n" for content_hash in self.sorted
+                ).encode("ascii"))
+                position = log.tell()
+                inode = os.fstat(log.fileno()).st_ino
+            os.replace(temp_path, self.path)
+            self.position, self.inode = position, inode
+            self.lines = len(self.sorted)
+        except (IOError, OSError):
+            pass
+
+    def sorted_hashes(self):
+        """Return sorted list of hashes"""
+        self.refresh()
+        if self.sorted is None:
+            self.sorted = sorted(self.hashes)
+        return self.sorted
+
+    def __iter__(self):
+        return iter(self.sorted_hashes())
+
+    def __len__(self):
+        return len(self.sorted_hashes())
+
+    def __contains__(self, content_hash):
+        self.refresh()
+        return content_hash in self.hashes
+
+    def add(self, content_hashes):
+        """Add hashes to the index"""
+        append_hashes(self.path, content_hashes)
+
+    def remove(self, content_hashes):
+        """Remove hashes from the index"""
+        append_hashes(self.path, content_hashes, removed=True)
+        self.refresh()
+        if self.lines > 2 * len(self.hashes) + 1000:
+            self.compact()
+
+    def find_prefix(self, prefix):
+        """Return first hash that starts by prefix
+        Untagged prefixes match hashes of all algorithms, SHA-1 first"""
+        hashes = self.sorted_hashes()
+        algorithm, hexdigest = split(prefix.lower())
+        if "-" in prefix:
+            candidates = [tag(algorithm, hexdigest)]
+        else:
+            candidates = [hexdigest] + [
+                tag(name, hexdigest) for name in sorted(ALGORITHMS)
+                if name != DEFAULT_ALGORITHM
+            ]
+        for candidate in candidates:
+            position = bisect_left(hashes, candidate)
+            while (position < len(hashes) and
+                   hashes[position].startswith(candidate)):
+                found = hashes[position]
+                if "-" in candidate or "-" not in found:
+                    return found
+                position += 1
+        return None
@@ -0,0 +1,507 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content database engine that appends contents to pack files"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import uuid
+
+from bisect import bisect_left
+from os.path import join, isdir, isfile
+
+from .base import ContentDatabaseEngine, open_content, iter_chunks
+from .base import touch, _remove, SWEEP_GRACE_SECONDS
+from . import safeopen
+
+
+PACK_DATABASE_DIR = "content.pack"
+
+# Packs are closed when they reach this size
+PACK_SIZE_LIMIT = 1 << 30
+
+# Packs without index that were not modified for this long belong to
+# interrupted executions. Compaction indexes them
+ABANDONED_PACK_SECONDS = 60 * 60
+
+# Pack record: content size, content, binary SHA-1 of content
+RECORD_SIZE = struct.Struct(">Q")
+HASH_SIZE = 20
+
+# Index: header and entries sorted by binary SHA-1
+INDEX_MAGIC = b"NWPI"
+INDEX_HEADER = struct.Struct(">4sIQ")  # magic, version, count
+INDEX_ENTRY = struct.Struct(">20sQQ")  # hash, content offset, content size
+INDEX_VERSION = 1
+
+
+def index_name(pack_name):
+    """Return index file of pack"""
+    return pack_name[:-len(".pack")] + ".idx"
+
+
+def scan_pack(pack_name):
+    """Return {binary hash: (offset, size)} of complete records in pack"""
+    entries = {}
+    with safeopen.std_open(pack_name, "rb") as pack:
+        end = os.fstat(pack.fileno()).st_size
+        position = 0
+        while position + RECORD_SIZE.size <= end:
+            size, = RECORD_SIZE.unpack(pack.read(RECORD_SIZE.size))
+            offset = position + RECORD_SIZE.size
+            position = offset + size + HASH_SIZE
+            if position > end:
+                # Incomplete record of an interrupted put
+                break
+            pack.seek(offset + size)
+            entries[pack.read(HASH_SIZE)] = (offset, size)
+    return entries
+
+
+def write_index(filename, entries):
+    """Write sorted index of {binary hash: (offset, size)} entries"""
+    temp_filename = filename + ".tmp" + uuid.uuid4().hex
+    with safeopen.std_open(temp_filename, "wb") as index:
+        index.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(entries)))
+        for key in sorted(entries):
+            index.write(INDEX_ENTRY.pack(key, *entries[key]))
+    os.replace(temp_filename, filename)
+
+
+class PackIndex(object):
+    """Memory-mapped sorted index of a pack
+
+    Lookups use binary search over the mapped entries. Only the touched
+    pages are read from disk.
+    """
+
+    def __init__(self, pack_name):
+        self.pack_name = pack_name
+        self.index = self.pack = None
+        self.count = 0
+        with safeopen.std_open(index_name(pack_name), "rb") as index:
+            if os.fstat(index.fileno()).st_size >= INDEX_HEADER.size:
+                self.index = mmap.mmap(
+                    index.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.index is not None:
+            magic, version, self.count = INDEX_HEADER.unpack_from(
+                self.index, 0)
+            if magic != INDEX_MAGIC or version != INDEX_VERSION:
+                raise ValueError("Invalid pack index {}".format(
+                    index_name(pack_name)))
+        with safeopen.std_open(pack_name, "rb") as pack:
+            if os.fstat(pack.fileno()).st_size:
+                self.pack = mmap.mmap(
+                    pack.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, position):
+        start = INDEX_HEADER.size + position * INDEX_ENTRY.size
+        return self.index[start:start + HASH_SIZE]
+
+    def entry(self, position):
+        """Return (hash, offset, size) of entry"""
+        return INDEX_ENTRY.unpack_from(
+            self.index, INDEX_HEADER.size + position * INDEX_ENTRY.size)
+
+    def find(self, key):
+        """Return (offset, size) of binary hash or None"""
+        position = bisect_left(self, key)
+        if position < self.count:
+            found, offset, size = self.entry(position)
+            if found == key:
+                return offset, size
+        return None
+
+    def find_prefix(self, prefix):
+        """Return first hex hash that starts with hex prefix or None"""
+        position = bisect_left(self, bytes.fromhex(prefix.ljust(40, "0")))
+        if position < self.count:
+            found = self[position].hex()
+            if found.startswith(prefix):
+                return found
+        return None
+
+    def read(self, offset, size):
+        """Read content from pack"""
+        return self.pack[offset:offset + size]
+
+    def items(self):
+        """Iterate on (hash, offset, size) entries"""
+        for position in range(self.count):
+            yield self.entry(position)
+
+    def close(self):
+        """Unmap files"""
+        for mapped in (self.index, self.pack):
+            if mapped is not None:
+                mapped.close()
+        self.index = self.pack = None
+
+
+class OpenPack(object):
+    """Pack without index. Its entries are kept in memory"""
+
+    def __init__(self, pack_name, entries=None):
+        self.pack_name = pack_name
+        self.entries = {} if entries is None else entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def find(self, key):
+        """Return (offset, size) of binary hash or None"""
+        return self.entries.get(key)
+
+    def find_prefix(self, prefix):
+        """Return first hex hash that starts with hex prefix or None"""
+        found = sorted(
+            key.hex() for key in self.entries if key.hex().startswith(prefix))
+        return found[0] if found else None
+
+    def read(self, offset, size):
+        """Read content from pack"""
+        with safeopen.std_open(self.pack_name, "rb") as pack:
+            pack.seek(offset)
+            return pack.read(size)
+
+    def items(self):
+        """Iterate on (hash, offset, size) entries"""
+        for key, (offset, size) in self.entries.items():
+            yield key, offset, size
+
+    def close(self):
+        """Do nothing. Files are opened on reads"""
+        pass
+
+
+class PackEngine(ContentDatabaseEngine):
+    """Store contents in append-only pack files with sorted indexes
+
+    Each execution appends new contents to its own pack, and writes the pack
+    index when it commits or closes. Packs without index belong to running
+    or interrupted executions, and are scanned on the first lookup.
+    Compaction merges the packs and drops duplicated or unreachable contents.
+    """
+
+    def __init__(self, config):
+        super(PackEngine, self).__init__(config)
+        self.packs = None
+        self.writing = None  # OpenPack being written by this engine
+        self.writing_file = None
+        self.lock = threading.RLock()
+        self.compaction = None
+
+    def connect(self, config):
+        """Create content directory"""
+        if not config.should_mock and not isdir(self.content_path):
+            os.makedirs(self.content_path)
+
+    def set_path(self, config):
+        """Set content path"""
+        self.content_path = join(config.provenance_path, PACK_DATABASE_DIR)
+
+    def pack_names(self):
+        """Return sorted pack files"""
+        if not isdir(self.content_path):
+            return []
+        return sorted(
+            join(self.content_path, name)
+            for name in os.listdir(self.content_path)
+            if name.startswith("pack-") and name.endswith(".pack")
+        )
+
+    def load(self):
+        """Map indexes and scan packs without index"""
+        packs = []
+        for pack_name in self.pack_names():
+            if self.writing is not None and pack_name == self.writing.pack_name:
+                packs.append(self.writing)
+                continue
+            try:
+                if isfile(index_name(pack_name)):
+                    packs.append(PackIndex(pack_name))
+                else:
+                    packs.append(OpenPack(pack_name, scan_pack(pack_name)))
+            except (IOError, OSError):
+                # Removed by a concurrent compaction
+                continue
+        self.unload()
+        self.packs = packs
+
+    def unload(self):
+        """Unmap indexes"""
+        for pack in self.packs or []:
+            pack.close()
+        self.packs = None
+
+    def locate(self, key, refresh=True):
+        """Return (pack, offset, size) of binary hash or None
+        Reload the packs once if the hash is not found"""
+        with self.lock:
+            if self.packs is None:
+                self.load()
+                refresh = False
+            for pack in self.packs:
+                found = pack.find(key)
+                if found is not None:
+                    return (pack,) + found
+            if refresh:
+                self.load()
+                return self.locate(key, refresh=False)
+        return None
+
+    def hash(self, content):  # pylint: disable=method-hidden
+        """Return content hash without storing it"""
+        with open_content(content) as (stream, size):
+            content_hash = hashlib.sha1()
+            for chunk in iter_chunks(stream, size):
+                content_hash.update(chunk)
+            return content_hash.hexdigest()
+
+    def put(self, content, filename="generic"):  # pylint: disable=method-hidden
+        """Append content to the pack of this engine, if it is new"""
+        if isinstance(content, bytes):
+            # Contents in memory are hashed first, to skip writing duplicates
+            key = hashlib.sha1(content).digest()
+            if self.stored(key):
+                return key.hex()
+        # Append and hash in a single read. Drop the record of duplicates
+        with open_content(content) as (stream, size), self.lock:
+            pack = self.writing_pack()
+            position = self.writing_file.tell()
+            try:
+                content_hash = hashlib.sha1()
+                self.writing_file.write(RECORD_SIZE.pack(size))
+                written = 0
+                for chunk in iter_chunks(stream, size):
+                    content_hash.update(chunk)
+                    self.writing_file.write(chunk)
+                    written += len(chunk)
+                key = content_hash.digest()
+                if self.stored(key):
+                    self.drop_record(position)
+                    return key.hex()
+            except BaseException:
+                self.drop_record(position)
+                raise
+            if written != size:
+                # The file was truncated while reading
+                self.writing_file.seek(position)
+                self.writing_file.write(RECORD_SIZE.pack(written))
+                self.writing_file.seek(0, os.SEEK_END)
+                size = written
+            self.writing_file.write(key)
+            self.writing_file.flush()
+            pack.entries.setdefault(key, (position + RECORD_SIZE.size, size))
+            if self.writing_file.tell() >= PACK_SIZE_LIMIT:
+                self.finish_pack()
+            return key.hex()
+
+    def stored(self, key):
+        """Check if binary hash is stored
+        Refresh the grace period of the pack that stores it"""
+        with self.lock:
+            found = self.locate(key, refresh=False)
+            if found is None:
+                return False
+            if found[0] is not self.writing:
+                touch(found[0].pack_name)
+            return True
+
+    def drop_record(self, position):
+        """Remove incomplete record at position of the writing pack"""
+        self.writing_file.seek(position)
+        self.writing_file.truncate()
+
+    def writing_pack(self):
+        """Return pack of this engine. Create it if it does not exist"""
+        if self.writing is None:
+            if self.packs is None:
+                self.load()
+            if not isdir(self.content_path):
+                os.makedirs(self.content_path)
+            pack_name = join(self.content_path, "pack-{}-{}.pack".format(
+                int(time.time()), uuid.uuid4().hex))
+            self.writing_file = safeopen.std_open(pack_name, "wb")
+            self.writing = OpenPack(pack_name)
+            self.packs.append(self.writing)
+        return self.writing
+
+    def finish_pack(self):
+        """Close pack of this engine and write its index"""
+        with self.lock:
+            if self.writing is None:
+                return
+            self.writing_file.close()
+            if self.writing.entries:
+                write_index(index_name(self.writing.pack_name),
+                            self.writing.entries)
+            else:
+                # All contents put by this engine were duplicates
+                _remove(self.writing.pack_name)
+            self.writing = self.writing_file = None
+            self.unload()
+
+    def get(self, content_hash):  # pylint: disable=method-hidden
+        """Get content from the content database"""
+        with self.lock:
+            found = self.locate(bytes.fromhex(content_hash))
+            if found is None:
+                raise KeyError(content_hash)
+            if found[0] is self.writing:
+                self.writing_file.flush()
+            return bytes(found[0].read(*found[1:]))
+
+    def find_subhash(self, content_hash):
+        """Get hash that starts by content_hash"""
+        try:
+            int(content_hash, 16)
+        except ValueError:
+            return None
+        with self.lock:
+            if self.packs is None:
+                self.load()
+            found = [
+                pack.find_prefix(content_hash.lower()) for pack in self.packs
+            ]
+        found = sorted(key for key in found if key is not None)
+        return found[0] if found else None
+
+    def listAll(self):  # pylint: disable=invalid-name
+        """Return hashes of all contents"""
+        with self.lock:
+            if self.packs is None:
+                self.load()
+            return sorted({
+                key.hex() for pack in self.packs for key, _, _ in pack.items()
+            })
+
+    def gc(self, aggressive=False, keep=None):
+        """Compact packs in a background thread
+        If keep is informed, drop the contents that are not in it"""
+        self.finish_pack()
+        self.wait_compaction()
+        self.compaction = threading.Thread(
+            target=self.compact, args=(keep,),
+            name="noworkflow-pack-compaction")
+        self.compaction.start()
+
+    def wait_compaction(self):
+        """Wait for background compaction"""
+        if self.compaction is not None:
+            self.compaction.join()
+            self.compaction = None
+
+    def compactable_packs(self):
+        """Return indexed and abandoned packs"""
+        packs = []
+        for pack_name in self.pack_names():
+            if isfile(index_name(pack_name)):
+                packs.append(PackIndex(pack_name))
+            elif (time.time() - os.stat(pack_name).st_mtime >
+                  ABANDONED_PACK_SECONDS):
+                packs.append(OpenPack(pack_name, scan_pack(pack_name)))
+        return packs
+
+    def sweep(self, live, dry_run=False, workers=None,
+              grace=SWEEP_GRACE_SECONDS):
+        """Compact packs without the contents that are not in the live set
+        Packs of running executions and contents of packs modified less than
+        grace seconds ago are kept. Return removed hashes and the size in
+        bytes of their records and of duplicated records"""
+        # pylint: disable=unused-argument
+        self.finish_pack()
+        self.wait_compaction()
+        removed, size, seen = [], 0, set()
+        keep, limit = set(live), time.time() - grace
+        packs = self.compactable_packs()
+        try:
+            for pack in packs:
+                if os.stat(pack.pack_name).st_mtime > limit:
+                    keep.update(key.hex() for key, _, _ in pack.items())
+            for pack in packs:
+                for key, _, content_size in pack.items():
+                    record_size = RECORD_SIZE.size + content_size + HASH_SIZE
+                    if key in seen:
+                        size += record_size
+                        continue
+                    seen.add(key)
+                    if key.hex() not in keep:
+                        removed.append(key.hex())
+                        size += record_size
+        finally:
+            for pack in packs:
+                pack.close()
+        if not dry_run and packs and not self.compact(keep):
+            return [], 0
+        return removed, size
+
+    def compact(self, keep=None):
+        """Merge indexed and abandoned packs into a single pack
+        Return False if another compaction is running"""
+        lock_name = join(self.content_path, "compact.lock")
+        try:
+            os.close(os.open(lock_name, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except (IOError, OSError):
+            try:
+                lock_time = os.stat(lock_name).st_mtime
+            except (IOError, OSError):
+                return False
+            if time.time() - lock_time < ABANDONED_PACK_SECONDS:
+                return False
+        try:
+            old_packs = self.compactable_packs()
+            if not old_packs:
+                return True
+            pack_name = join(self.content_path, "pack-{}-{}.pack".format(
+                int(time.time()), uuid.uuid4().hex))
+            entries = {}
+            with safeopen.std_open(pack_name + ".tmp", "wb") as new_pack:
+                for pack in old_packs:
+                    for key, offset, size in pack.items():
+                        if key in entries:
+                            continue
+                        if keep is not None and key.hex() not in keep:
+                            continue
+                        new_pack.write(RECORD_SIZE.pack(size))
+                        entries[key] = (new_pack.tell(), size)
+                        new_pack.write(pack.read(offset, size))
+                        new_pack.write(key)
+            # The merged pack is as recent as its newest pack for sweeps
+            modified = max(
+                os.stat(pack.pack_name).st_mtime for pack in old_packs)
+            os.utime(pack_name + ".tmp", (modified, modified))
+            # The index marks the pack as complete
+            os.replace(pack_name + ".tmp", pack_name)
+            write_index(index_name(pack_name), entries)
+            for pack in old_packs:
+                pack.close()
+                if isfile(index_name(pack.pack_name)):
+                    os.remove(index_name(pack.pack_name))
+                os.remove(pack.pack_name)
+            return True
+        finally:
+            os.remove(lock_name)
+            with self.lock:
+                self.unload()
+
+    def commit_content(self, message):
+        """Write the index of the pack of this engine"""
+        self.finish_pack()
+
+    def close(self):
+        """Write pack index and wait for compaction"""
+        self.finish_pack()
+        self.wait_compaction()
+        with self.lock:
+            self.unload()
@@ -4,8 +4,111 @@
 # Please, consult the license terms in the LICENSE file.
 """Content database engine parallel generics"""
 
-def create_distributed(cls, name=None):
-    from multiprocessing import Process, JoinableQueue, cpu_count, Manager, Lock
+class SharedBatch(object):
+    """Batch of bytes contents that are sent to worker processes through a
+    shared memory segment instead of being pickled"""
+
+    def __init__(self):
+        self.contents = []
+        self.size = 0
+
+    def __len__(self):
+        return len(self.contents)
+
+    def add(self, content, filename):
+        """Add content to batch"""
+        self.contents.append((content, filename))
+        self.size += len(content)
+
+    def pack(self):
+        """Copy contents to a new shared memory segment
+        Return segment name and (offset, size, filename) entries"""
+        from multiprocessing.shared_memory import SharedMemory
+        segment = SharedMemory(create=True, size=max(self.size, 1))
+        entries = []
+        offset = 0
+        for content, filename in self.contents:
+            segment.buf[offset:offset + len(content)] = content
+            entries.append((offset, len(content), filename))
+            offset += len(content)
+        name = segment.name
+        segment.close()
+        self.contents = []
+        self.size = 0
+        return name, entries
+
+
+def put_segment(engine, name, entries):
+    """Put contents of a shared memory segment and remove it"""
+    from multiprocessing.shared_memory import SharedMemory
+    segment = SharedMemory(name=name)
+    try:
+        engine.put_batch([
+            engine.put_attr(bytes(segment.buf[offset:offset + size]), filename)
+            for offset, size, filename in entries
+        ])
+    finally:
+        segment.close()
+        segment.unlink()
+
+
+def create_shared_batches(cls, batch_size, batch_bytes):
+    """Create base of parallel engines that hash contents in the parent
+    process and send them to workers in batches"""
+    from multiprocessing import resource_tracker
+
+    class SharedBatches(cls):
+
+        def __init__(self, config):
+            super(SharedBatches, self).__init__(config)
+            self.batch = SharedBatch()
+            self.processes_started = False
+
+        def put(self, content, filename="generic"):  # pylint: disable=method-hidden
+            """Put content in the content database"""
+            if not isinstance(content, bytes):
+                # Workers would read files and streams after they change
+                return cls.put(self, content, filename)
+            if not self.processes_started:
+                # Workers must share the tracker of shared memory segments
+                resource_tracker.ensure_running()
+                self.start_processes()
+            content_hash = self._get_hash_from_content(content)
+            # Workers do not report hashes back
+            self.reuse(content_hash, filename)
+            self.batch.add(content, filename)
+            if len(self.batch) >= batch_size or self.batch.size >= batch_bytes:
+                self.send_batch(*self.batch.pack())
+            return content_hash
+
+        def commit_content(self, message):
+            """Wait for pending contents before commiting"""
+            self.close()
+            return cls.commit_content(self, message)
+
+        def flush(self):
+            """Send incomplete batch"""
+            if self.batch:
+                self.send_batch(*self.batch.pack())
+
+        def start_processes(self):
+            """Start processes"""
+            raise NotImplementedError("Implement in subclass")
+
+        def send_batch(self, name, entries):
+            """Send shared memory segment to workers"""
+            raise NotImplementedError("Implement in subclass")
+
+    return SharedBatches
+
+
+def create_distributed(cls, name=None, batch_size=256, batch_bytes=8 << 20,
+                       max_batches=None):
+    """Create engine that sends batches of bytes contents to a queue of
+    worker processes. Puts block while there are too many pending batches"""
+    # pylint: disable=too-many-arguments
+    from multiprocessing import Process, JoinableQueue, Queue, cpu_count
+    from multiprocessing import BoundedSemaphore, RLock
     from . import safeopen
     class Worker(Process):
 
@@ -24,27 +127,31 @@ def create_distributed(cls, name=None):
                     self.task_queue.task_done()
                     break
 
-                self.engine.do_put(*queue_content)
+                try:
+                    put_segment(self.engine, *queue_content)
+                except Exception as exc:  # pylint: disable=broad-except
+                    self.engine.errors.put(exc)
+                self.engine.slots.release()
                 self.task_queue.task_done()
 
 
-    class Distributed(cls):
+    class Distributed(create_shared_batches(cls, batch_size, batch_bytes)):
 
         def __init__(self, config):
             super(Distributed, self).__init__(config)
             self.tasks = None
             self.consumers = []
             self.num_consumers = None
-            self.processes_started = False
-            self.manager = Manager()
-            self.object_hashes = self.manager.dict()
-            self.lock = self.manager.RLock()
+            self.slots = None
+            self.errors = None
+            self.lock = RLock()
 
         def start_processes(self):
             """Start processes"""
             self.tasks = JoinableQueue()
-            self.object_hashes = self.manager.dict()
+            self.errors = Queue()
             self.num_consumers = cpu_count()
+            self.slots = BoundedSemaphore(max_batches or 2 * self.num_consumers)
             self.processes_started = True
             self.consumers = []
             with safeopen.use_safe_open():
@@ -53,99 +160,220 @@ def create_distributed(cls, name=None):
                     self.consumers.append(consumer)
                     consumer.start()
 
-        def put(self, content, filename="generic"):  # pylint: disable=method-hidden
-            """Put content in the content database"""
-            if not self.processes_started:
-                self.start_processes()
-
-            self.tasks.put(self.put_attr(content, filename))
-            content_hash = self._get_hash_from_content(content)
-            return content_hash
+        def send_batch(self, name, entries):
+            """Send shared memory segment to workers"""
+            self.slots.acquire()
+            self.tasks.put((name, entries))
 
         def close(self):
             """Join and close processes"""
             if self.processes_started:
+                self.flush()
                 # Add a poison pill for each consumer
                 for _ in range(self.num_consumers):
                     self.tasks.put(None)
 
                 # Wait for all of the tasks to finish
                 self.tasks.join()
+                for consumer in self.consumers:
+                    consumer.join()
                 self.processes_started = False
+                if not self.errors.empty():
+                    raise self.errors.get()
         
     Distributed.__name__ = name or ("Distributed" + cls.__name__)
     return Distributed
 
 
-def create_pool(cls, name=None):
-    from multiprocessing import cpu_count, Manager, Pool, Lock
+WORKER_ENGINE = None  # Engine of pool worker processes
+
+
+def set_worker_engine(engine):
+    """Set engine of pool worker process"""
+    global WORKER_ENGINE  # pylint: disable=global-statement
+    WORKER_ENGINE = engine
+
+
+def put_worker_segment(name, entries):
+    """Put contents of a shared memory segment in a pool worker process"""
+    put_segment(WORKER_ENGINE, name, entries)
+
+
+def create_pool(cls, name=None, batch_size=256, batch_bytes=8 << 20,
+                max_batches=None):
+    """Create engine that sends batches of bytes contents to a pool of
+    worker processes. Puts block while there are too many pending batches"""
+    # pylint: disable=too-many-arguments
+    import threading
+    from multiprocessing import cpu_count, Pool, RLock
     from . import safeopen
 
-    class ProcessingPool(cls):
+    class ProcessingPool(create_shared_batches(cls, batch_size, batch_bytes)):
 
         def __init__(self, config):
             super(ProcessingPool, self).__init__(config)
             self.pool = None
-            self.manager = Manager()
-            self.object_hashes = self.manager.dict()
-            self.processes_started = False
-            self.lock = self.manager.RLock()
+            self.slots = None
+            self.error = None
+            self.lock = RLock()
 
         def start_processes(self):
             """Start processes"""
             with safeopen.use_safe_open():
-                self.object_hashes = self.manager.dict()
-                self.pool = Pool(cpu_count())
+                self.slots = threading.BoundedSemaphore(
+                    max_batches or 2 * cpu_count())
+                self.pool = Pool(cpu_count(), initializer=set_worker_engine,
+                                 initargs=(self,))
                 self.processes_started = True
 
-        def put(self, content, filename="generic"):  # pylint: disable=method-hidden
-            """Put content in the content database"""
-            if not self.processes_started:
-                self.start_processes()
+        def send_batch(self, name, entries):
+            """Send shared memory segment to workers"""
+            self.slots.acquire()
+            self.pool.apply_async(
+                put_worker_segment, (name, entries),
+                callback=self.release, error_callback=self.release)
 
-            self.pool.apply_async(self.do_put, self.put_attr(content, filename))
-            content_hash = self._get_hash_from_content(content)
-            return content_hash
+        def release(self, result):
+            """Release slot of finished batch. Keep its error"""
+            if isinstance(result, Exception) and self.error is None:
+                self.error = result
+            self.slots.release()
 
         def close(self):
             """Join and close processes"""
             if self.processes_started:
+                self.flush()
                 self.pool.close()
                 self.pool.join()
                 self.processes_started = False
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
         
     ProcessingPool.__name__ = name or ("Pool" + cls.__name__)
     return ProcessingPool
 
 
-def create_threading(cls, name=None):
+def create_threading(cls, name=None, workers=None, max_pending=None,
+                     batch_size=64, batch_bytes=1 << 20):
+    """Create engine that puts bytes contents in a bounded pool of threads
+
+    Puts block while the pending contents exceed max_pending bytes. Workers
+    put queued contents in batches of up to batch_size contents or
+    batch_bytes bytes. Worker errors are raised by the next put or close.
+    """
+    # pylint: disable=too-many-arguments
+    import atexit
+    import os
+    import queue
     import threading
-    import sys
+    from . import safeopen
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    max_pending = max_pending or 64 * batch_bytes
+
+    class Worker(threading.Thread):
+
+        def __init__(self, engine):
+            with safeopen.use_safe_open():
+                threading.Thread.__init__(
+                    self, name="noworkflow-content", daemon=True)
+                self.engine = engine
+
+        def run(self):
+            engine = self.engine
+            while True:
+                queue_content = engine.tasks.get()
+                if queue_content is None:
+                    # Poison pill means shutdown
+                    break
+                batch = [queue_content]
+                size = queue_content[1]
+                while len(batch) < batch_size and size < batch_bytes:
+                    try:
+                        queue_content = engine.tasks.get_nowait()
+                    except queue.Empty:
+                        break
+                    if queue_content is None:
+                        # Put the poison pill back for after the batch
+                        engine.tasks.put(None)
+                        break
+                    batch.append(queue_content)
+                    size += queue_content[1]
+                try:
+                    engine.put_batch([attrs for attrs, _ in batch])
+                except Exception as exc:  # pylint: disable=broad-except
+                    engine.error = engine.error or exc
+                engine.release(size)
+
     class Threading(cls):
 
         def __init__(self, config):
             super(Threading, self).__init__(config)
-            self.persistence_threads = []
+            self.tasks = None
+            self.threads = []
+            self.error = None
+            self.pending = 0  # Bytes of queued contents
             self.lock = threading.Lock()
+            self.pending_condition = threading.Condition()
+
+        def start_threads(self):
+            """Start pool of threads"""
+            self.tasks = queue.Queue()
+            self.threads = [Worker(self) for _ in range(workers)]
+            for thread in self.threads:
+                thread.start()
+            atexit.register(self.close)
 
         def put(self, content, filename="generic"):  # pylint: disable=method-hidden
             """Put content in the content database"""
-            t = threading.Thread(target=self.do_put, args=self.put_attr(content, filename))
-            self.persistence_threads.append(t)
-            t.start()
+            if not isinstance(content, bytes):
+                # Workers would read files and streams after they change
+                return cls.put(self, content, filename)
+            self.check()
+            with self.pending_condition:
+                if not self.threads:
+                    self.start_threads()
+                # Backpressure: wait for workers to consume pending contents
+                while self.pending and self.pending + len(content) > max_pending:
+                    self.pending_condition.wait()
+                self.pending += len(content)
+            self.tasks.put((self.put_attr(content, filename), len(content)))
             content_hash = self._get_hash_from_content(content)
             return content_hash
 
+        def release(self, size):
+            """Release pending bytes of consumed contents"""
+            with self.pending_condition:
+                self.pending -= size
+                self.pending_condition.notify_all()
+
+        def check(self):
+            """Raise worker error"""
+            if self.error is not None:
+                error, self.error = self.error, None
+                raise error
+
+        def commit_content(self, message):
+            """Wait for pending contents before commiting"""
+            self.close()
+            return cls.commit_content(self, message)
+
         def close(self):
             """Join and close threads"""
-            for t in self.persistence_threads:
-                t.join()
-            
-            self.persistence_threads = []
+            with self.pending_condition:
+                threads, self.threads = self.threads, []
+            if threads:
+                atexit.unregister(self.close)
+                for _ in threads:
+                    self.tasks.put(None)
+                for thread in threads:
+                    thread.join()
+            cls.close(self)
+            self.check()
 
     Threading.__name__ = name or ("Threading" + cls.__name__)
     return Threading
-        
+
 
 class NullLock(object):
 
@@ -1,8 +1,13 @@
-import hashlib
 import os
+import uuid
 from os.path import join, isdir, isfile
 
-from .base import ContentDatabaseEngine
+from .base import ContentDatabaseEngine, open_content, iter_chunks
+from .base import sweep_files, touch, _remove, SWEEP_GRACE_SECONDS
+from .hashes import DEFAULT_ALGORITHM, HASH_ALGORITHM_FILE
+from .hashes import new_hash, tag, digest, content_filename
+from .hashes import find_prefix, list_hashes
+from .index import ContentIndex, CONTENT_INDEX_FILE, append_hashes
 from .parallel import create_distributed, create_pool, create_threading
 from . import safeopen
 
@@ -12,32 +17,83 @@ STANDARD_DATABASE_DIR = 'content'
 class PlainEngine(ContentDatabaseEngine):
     def __init__(self, config):
         super(PlainEngine, self).__init__(config)
+        self.algorithm = DEFAULT_ALGORITHM  # Hash algorithm of new contents
 
     def connect(self, config):
         """Create content directory"""
         if not config.should_mock and not isdir(self.content_path):
             os.makedirs(self.content_path)
+        if not config.should_mock and not self.index.exists():
+            self.index.rebuild(self.stored_hashes())
+        self.algorithm = self.hash_algorithm(config)
+
+    def hash_algorithm(self, config):
+        """Return hash algorithm of new contents
+        The algorithm set by config is kept for the next connections"""
+        algorithm_filename = join(self.content_path, HASH_ALGORITHM_FILE)
+        algorithm = getattr(config, "content_hash", None)
+        if algorithm is not None:
+            new_hash(algorithm)  # Check if it is available
+            if not config.should_mock:
+                with safeopen.std_open(algorithm_filename, "w") as hash_file:
+                    hash_file.write(algorithm)
+            return algorithm
+        if isfile(algorithm_filename):
+            with safeopen.std_open(algorithm_filename, "r") as hash_file:
+                return hash_file.read().strip() or DEFAULT_ALGORITHM
+        return DEFAULT_ALGORITHM
 
     def set_path(self, config):
         """Set content path"""
         self.content_path = os.path.join(config.provenance_path, STANDARD_DATABASE_DIR)
+        self.index = ContentIndex(join(self.content_path, CONTENT_INDEX_FILE))
 
     @staticmethod
-    def do_put(content_path, content):
+    def do_put(content_path, content, algorithm=DEFAULT_ALGORITHM):
         """Perform put operation. This is used in the distributed wrapper"""
-        content_hash = hashlib.sha1(content).hexdigest()
-        content_dirname = join(content_path, content_hash[:2])
-        if not isdir(content_dirname):
-            os.makedirs(content_dirname)
-        content_filename = join(content_dirname, content_hash[2:])
-        if not isfile(content_filename):
-            with safeopen.std_open(content_filename, "wb") as content_file:
-                content_file.write(content)
+        if isinstance(content, bytes):
+            # Contents in memory are hashed first, to skip writing duplicates
+            content_hash = digest(content, algorithm)
+            if touch(content_filename(content_path, content_hash)):
+                return content_hash
+        # Copy and hash in a single read. Remove the copy of duplicates
+        with open_content(content) as (stream, size):
+            temp_filename = join(content_path, "tmp_" + uuid.uuid4().hex)
+            os.makedirs(content_path, exist_ok=True)
+            content_hash = new_hash(algorithm)
+            try:
+                with safeopen.std_open(temp_filename, "wb") as content_file:
+                    for chunk in iter_chunks(stream, size):
+                        content_hash.update(chunk)
+                        content_file.write(chunk)
+                content_hash = tag(algorithm, content_hash.hexdigest())
+                filename = content_filename(content_path, content_hash)
+                if touch(filename):
+                    _remove(temp_filename)
+                    return content_hash
+                os.makedirs(os.path.dirname(filename), exist_ok=True)
+                os.replace(temp_filename, filename)
+            except BaseException:
+                _remove(temp_filename)
+                raise
+        append_hashes(join(content_path, CONTENT_INDEX_FILE), [content_hash])
         return content_hash
 
+    def hash(self, content):  # pylint: disable=method-hidden
+        """Return content hash without storing it"""
+        with open_content(content) as (stream, size):
+            content_hash = new_hash(self.algorithm)
+            for chunk in iter_chunks(stream, size):
+                content_hash.update(chunk)
+            return tag(self.algorithm, content_hash.hexdigest())
+
+    def _get_hash_from_content(self, content):
+        """Calculate hash from content"""
+        return digest(content, self.algorithm)
+
     def put_attr(self, content, filename):
         """Return attributes for the do_put operation"""
-        return (self.content_path, content)
+        return (self.content_path, content, self.algorithm)
 
     def put(self, content, filename):  # pylint: disable=method-hidden
         """Put content in the content database"""
@@ -45,29 +101,43 @@ class PlainEngine(ContentDatabaseEngine):
 
     def get(self, content_hash):  # pylint: disable=method-hidden
         """Get content from the content database"""
-        content_filename = join(self.content_path,
-                                content_hash[:2],
-                                content_hash[2:])
-        with self.std_open(content_filename, "rb") as content_file:
+        filename = content_filename(self.content_path, content_hash)
+        with self.std_open(filename, "rb") as content_file:
             return content_file.read()
 
     def find_subhash(self, content_hash):
         """Get hash that starts by content_hash"""
-        content_dirname = content_hash[:2]
-        content_filename = content_hash[2:]
-        content_dir = join(self.content_path, content_dirname)
-        if not isdir(content_dir):
-            return None
-        for _, _, filenames in os.walk(content_dir):
-            for name in filenames:
-                if name.startswith(content_filename):
-                    return content_dirname + name
-        return None
-
-    def gc(self, content_hash):
-        """Do nothing for plain storage"""
+        return (
+            self.index.find_prefix(content_hash) or
+            # Stored by a process that did not update the index
+            find_prefix(self.content_path, content_hash)
+        )
+
+    def listAll(self):  # pylint: disable=invalid-name
+        """Return sorted hashes of all contents"""
+        return list(self.index)
+
+    def stored_hashes(self):
+        """Return hashes of all contents by listing the content directory"""
+        return list_hashes(self.content_path)
+
+    def gc(self, aggressive=False):
+        """Do nothing for plain storage. Use sweep to remove contents"""
         pass
 
+    def sweep(self, live, dry_run=False, workers=None,
+              grace=SWEEP_GRACE_SECONDS):
+        """Remove contents whose hashes are not in the live set
+        Return removed hashes and their size in bytes"""
+        removed, size = sweep_files({
+            content_filename(self.content_path, content_hash): content_hash
+            for content_hash in self.listAll()
+            if content_hash not in live
+        }, dry_run, workers, grace)
+        if not dry_run:
+            self.index.remove(removed)
+        return removed, size
+
     def commit_content(self, message):
         """Do nothing for plain storage"""
         pass
@@ -3,6 +3,7 @@ import os
 from os.path import isdir
 from . import git_system
 from . import safeopen
+from .base import open_content
 from .gitbase import GitContentDatabaseEngine
 
 
@@ -11,6 +12,8 @@ class PureGitEngine(GitContentDatabaseEngine):
 
     def __init__(self, config):
         super(PureGitEngine, self).__init__(config)
+        # The index is rebuilt from all files in each commit
+        self.incremental_trees = False
 
     def connect(self, config):
         """Create content directory"""
@@ -22,7 +25,8 @@ class PureGitEngine(GitContentDatabaseEngine):
     def do_put(content_path, object_hashes, content, filename):
         """Perform put operation. This is used in the distributed wrapper"""
         with safeopen.use_safe_open():
-            content_hash = git_system.hash_object(content, content_path)
+            with open_content(content) as (stream, _):
+                content_hash = git_system.hash_object(stream, content_path)
             result = object_hashes[filename] = content_hash
             return result
 
@@ -5,6 +5,7 @@
 """PyGit content database engine"""
 import hashlib
 import os
+import threading
 
 from os.path import isdir
 from collections import defaultdict
@@ -14,10 +15,31 @@ from pygit2 import Repository
 from pygit2 import GIT_FILEMODE_BLOB, GIT_FILEMODE_TREE
 from pygit2 import Signature
 
+try:
+    from pygit2 import GIT_OBJECT_BLOB
+except ImportError:
+    from pygit2 import GIT_OBJ_BLOB as GIT_OBJECT_BLOB
+
+from .base import open_content
 from .gitbase import GitContentDatabaseEngine
 from .parallel import create_distributed, create_pool, create_threading
 
 
+HANDLES = threading.local()  # Repository handles of each thread
+
+
+def repository(content_path):
+    """Return cached repository handle of the current process and thread
+    Handles are not shared by threads, and are reopened after forks"""
+    handles = getattr(HANDLES, "repositories", None)
+    if handles is None or handles[0] != os.getpid():
+        handles = HANDLES.repositories = (os.getpid(), {})
+    repo = handles[1].get(content_path)
+    if repo is None:
+        repo = handles[1][content_path] = Repository(content_path)
+    return repo
+
+
 class PyGitEngine(GitContentDatabaseEngine):
     def __init__(self, config):
         super(PyGitEngine, self).__init__(config)
@@ -27,18 +49,49 @@ class PyGitEngine(GitContentDatabaseEngine):
         """Create content directory"""
         if not config.should_mock and not isdir(self.content_path):
             init_repository(self.content_path, bare=True)
-            self.repo = Repository(self.content_path)
+            self.repo = repository(self.content_path)
             self.create_initial_commit()
         else:
-            self.repo = Repository(self.content_path)
+            self.repo = repository(self.content_path)
         
     @staticmethod
     def do_put(content_path, object_hashes, content, filename):
         """Perform put operation. This is used in the distributed wrapper"""
-        content_hash = Repository(content_path).create_blob(content)
+        repo = repository(content_path)
+        if isinstance(content, bytes):
+            content_hash = repo.create_blob(content)
+        else:
+            with open_content(content) as (stream, _):
+                content_hash = repo.create_blob_fromiobase(stream)
         result = object_hashes[filename] = str(content_hash)
         return result
 
+    @staticmethod
+    def do_put_many(content_path, object_hashes, contents):
+        """Perform put operations of (content, filename) pairs
+        Bytes contents are written through a single object database"""
+        repo = repository(content_path)
+        odb = repo.odb
+        result = []
+        for content, filename in contents:
+            if isinstance(content, bytes):
+                content_hash = odb.write(GIT_OBJECT_BLOB, content)
+            else:
+                with open_content(content) as (stream, _):
+                    content_hash = repo.create_blob_fromiobase(stream)
+            result.append(str(content_hash))
+            object_hashes[filename] = result[-1]
+        return result
+
+    def put_batch(self, batch):
+        """Perform do_put operations of a batch of put_attr attributes
+        The attributes of a batch share the content path and hashes"""
+        if batch:
+            content_path, object_hashes = batch[0][:2]
+            self.do_put_many(content_path, object_hashes, [
+                (content, filename) for _, _, content, filename in batch
+            ])
+
     def put_attr(self, content, filename):
         """Return attributes for the do_put operation"""
         filename = self._inc_name(filename)
@@ -10,6 +10,9 @@ import importlib
 import os
 from os.path import join, isdir
 from .content.plain_engine import STANDARD_DATABASE_DIR
+from .content.pack_engine import PACK_DATABASE_DIR
+from .content.chunked_engine import CHUNKED_DATABASE_DIR
+from .content.fingerprints import FingerprintCache, FINGERPRINTS_DIR
 from ..utils.io import print_msg
 from .content import safeopen
 
@@ -20,13 +23,16 @@ class ContentDatabase(object):
         self.content_path = None  # Base path for storing content of files
         persistence_config.add(self)
         self.content_database_engine = None
+        self.fingerprints = None  # Content hashes of unchanged files
 
         self.content_engines = {
             "plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "sequential_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "distributed_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
             "pool_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
-            "threading_plain": "noworkflow.now.persistence.content.plain_engine.PlainEngine",
+            "threading_plain": "noworkflow.now.persistence.content.plain_engine.ThreadingPlainEngine",
+            "pack": "noworkflow.now.persistence.content.pack_engine.PackEngine",
+            "chunked": "noworkflow.now.persistence.content.chunked_engine.ChunkedEngine",
             "pygit": "noworkflow.now.persistence.content.pygit_engine.DistributedPyGitEngine",
             "sequential_pygit": "noworkflow.now.persistence.content.pygit_engine.PyGitEngine",
             "distributed_pygit": "noworkflow.now.persistence.content.pygit_engine.DistributedPyGitEngine",
@@ -47,6 +53,12 @@ class ContentDatabase(object):
         elif isdir(join(config.provenance_path, STANDARD_DATABASE_DIR)):
             # Use plain directory
             engine = "plain"
+        elif isdir(join(config.provenance_path, PACK_DATABASE_DIR)):
+            # Use pack files
+            engine = "pack"
+        elif isdir(join(config.provenance_path, CHUNKED_DATABASE_DIR)):
+            # Use deduplicated chunks
+            engine = "chunked"
         else:
             # Use git
             try:
@@ -82,8 +94,55 @@ class ContentDatabase(object):
         if self.content_database_engine is None:
             self.define_engine(config)
         self.content_database_engine.connect(config)
+        self.fingerprints = None
+        if config.fingerprint_cache and not config.should_mock:
+            self.fingerprints = FingerprintCache(join(
+                config.provenance_path, FINGERPRINTS_DIR,
+                os.path.basename(self.content_database_engine.content_path)
+            ), config.strict_fingerprints)
+
+    def mock(self, config):
+        if self.content_database_engine is None:
+            self.define_engine(config)
+        self.content_database_engine.mock(config)
+        self.fingerprints = None
+
+    def put_file(self, path, filename=None):
+        """Put file into the content database and return its hash
+        Skip reading files that did not change since they were stored"""
+        filename = filename or path
+        fingerprints = self.fingerprints
+        if fingerprints is None:
+            return self.put(path, filename)
+        stat = os.stat(path)
+        content_hash = fingerprints.get(path, stat, stored=True)
+        if content_hash is not None and not fingerprints.strict:
+            self.reuse(content_hash, filename)
+            return content_hash
+        new_hash = self.put(path, filename)
+        if new_hash != content_hash:
+            fingerprints.set(path, stat, new_hash)
+        return new_hash
+
+    def hash_file(self, path):
+        """Return hash of file without storing it"""
+        fingerprints = self.fingerprints
+        if fingerprints is None:
+            return self.hash(path)
+        stat = os.stat(path)
+        content_hash = fingerprints.get(path, stat)
+        if content_hash is None or fingerprints.strict:
+            new_hash = self.hash(path)
+            if new_hash != content_hash:
+                fingerprints.set(path, stat, new_hash, stored=False)
+            content_hash = new_hash
+        return content_hash
     
     def listAll(self):
+        """Return hashes of all contents"""
+        engine = self.content_database_engine
+        if hasattr(engine, "listAll"):
+            return engine.listAll()
         files = []
         for r,d, f in os.walk(self.__getattr__("content_path")):
             for file in f:
@@ -0,0 +1,150 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Append-only binary event log used as collection-time sink"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import marshal
+import os
+import struct
+
+from os.path import join, isdir, isfile
+
+from .content import safeopen
+
+
+EVENT_LOG_DIR = "logs"
+EVENT_LOG_EXT = ".nwlog"
+MAGIC = b"NOWLOG1\n"
+
+# Record header: record kind (0 = table declaration, >0 = table code)
+# and payload size
+HEADER = struct.Struct("<HI")
+DECLARATION = 0
+
+
+def event_log_path(provenance_path, trial_id):
+    """Return the event log path of a trial"""
+    return join(provenance_path, EVENT_LOG_DIR, str(trial_id) + EVENT_LOG_EXT)
+
+
+def pending_logs(provenance_path):
+    """Return trial ids that have event logs waiting for ingestion"""
+    directory = join(provenance_path, EVENT_LOG_DIR)
+    if not isdir(directory):
+        return []
+    return sorted(
+        name[:-len(EVENT_LOG_EXT)] for name in os.listdir(directory)
+        if name.endswith(EVENT_LOG_EXT)
+    )
+
+
+def _plain(value):
+    """Convert values that marshal does not support"""
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    return str(value)
+
+
+class EventLog(object):
+    """Per-trial append-only log of lightweight object rows
+
+    Each record is framed by a fixed header (kind, size) followed by a
+    marshalled tuple. Tables are declared once in the log, before their
+    first row, with their model name and column names.
+    A truncated trailing record (e.g., after a crash) is ignored by read.
+    """
+
+    def __init__(self, path, buffering=1 << 20):
+        self.path = path
+        self.buffering = buffering
+        self.codes = {}
+        self.file = None
+
+    def open(self):
+        """Open log for appending. Create it if it does not exist"""
+        directory = os.path.dirname(self.path)
+        if not isdir(directory):
+            os.makedirs(directory)
+        exists = isfile(self.path)
+        if exists:
+            for code, model, _ in self.declarations():
+                self.codes[model] = code
+        self.file = safeopen.std_open(self.path, "ab", self.buffering)
+        if not exists:
+            self.file.write(MAGIC)
+        return self
+
+    def _declare(self, cls):
+        """Write table declaration and return its code"""
+        model = cls.model.__modelname__
+        code = self.codes.get(model)
+        if code is None:
+            code = self.codes[model] = len(self.codes) + 1
+            self._write(DECLARATION, (code, model, cls.columns()))
+        return code
+
+    def _write(self, kind, record):
+        """Write framed record"""
+        try:
+            payload = marshal.dumps(record)
+        except ValueError:
+            payload = marshal.dumps(tuple(_plain(value) for value in record))
+        self.file.write(HEADER.pack(kind, len(payload)))
+        self.file.write(payload)
+
+    def write(self, obj):
+        """Append lightweight object row"""
+        self._write(self._declare(type(obj)), obj.row())
+
+    def write_rows(self, cls, rows):
+        """Append rows of lightweight class"""
+        code = self._declare(cls)
+        for row in rows:
+            self._write(code, row)
+
+    def flush(self):
+        """Flush buffered records to disk"""
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        """Close log file"""
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def records(self):
+        """Iterate on (kind, record) pairs"""
+        with safeopen.std_open(self.path, "rb") as fil:
+            if fil.read(len(MAGIC)) != MAGIC:
+                raise RuntimeError(
+                    "invalid event log: {}".format(self.path))
+            while True:
+                header = fil.read(HEADER.size)
+                if len(header) < HEADER.size:
+                    return
+                kind, size = HEADER.unpack(header)
+                payload = fil.read(size)
+                if len(payload) < size:
+                    return
+                yield kind, marshal.loads(payload)
+
+    def declarations(self):
+        """Iterate on table declarations (code, model, columns)"""
+        for kind, record in self.records():
+            if kind == DECLARATION:
+                yield record
+
+    def read(self):
+        """Iterate on (model name, columns, row) triples"""
+        tables = {}
+        for kind, record in self.records():
+            if kind == DECLARATION:
+                code, model, columns = record
+                tables[code] = (model, columns)
+            else:
+                model, columns = tables[kind]
+                yield model, columns, record
@@ -7,6 +7,9 @@ from __future__ import (absolute_import, print_function,
                         division)
 
 from .base import ObjectStore, SharedObjectStore
+from .columnar import ColumnarObjectStore
+from .flusher import StoreFlusher
+from .bulk import BulkWriter
 from .activation import ActivationLW
 from .argument import ArgumentLW
 from .code_block import CodeBlockLW
@@ -18,6 +21,7 @@ from .evaluation import EvaluationLW
 from .experiment import ExperimentLW
 from .exception import ExceptionLW
 from .file_access import FileAccessLW
+from .loop_summary import LoopSummaryLW
 from .stage_tags import StageTagsLW
 from .member import MemberLW
 from .module import ModuleLW
@@ -33,6 +37,9 @@ from .stage_tags import StageTagsLW
 __all__ = [
     "ObjectStore",
     "SharedObjectStore",
+    "ColumnarObjectStore",
+    "StoreFlusher",
+    "BulkWriter",
     "ActivationLW",
     "ArgumentLW",
     "CodeBlockLW",
@@ -44,6 +51,7 @@ __all__ = [
     "ExperimentLW",
     "ExceptionLW",
     "FileAccessLW",
+    "LoopSummaryLW",
     "StageTagsLW",
     "MemberLW",
     "ModuleLW",
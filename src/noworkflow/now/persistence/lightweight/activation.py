@@ -46,7 +46,7 @@ class ActivationLW(BaseLW):
     __slots__, attributes = define_attrs(
         ["trial_id", "id", "name", "start_checkpoint", "code_block_trial_id",
          "code_block_id"],
-        ["file_accesses", "stage_tags", "context", "conditions", "permanent_conditions",
+        ["file_accesses", "content_hashes", "stage_tags", "context", "conditions", "permanent_conditions",
          "evaluation", "assignments", "closure", "func",
          "active", "depth", "parent", "generator", "last_activation", 
          "bound_dependency", "func_evaluation", "iscell"]
@@ -83,6 +83,9 @@ class ActivationLW(BaseLW):
 
         # File accesses. Used to get the content after the activation
         self.file_accesses = []
+        # Content hash of files by name: (stat fingerprint, hash).
+        # None indicates that the activation may have changed the file
+        self.content_hashes = {}
         
         # Cells tags. Used to get the content after the activation
         self.stage_tags = []
@@ -6,6 +6,7 @@
 from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
+from operator import attrgetter
 
 from future.utils import viewitems, viewvalues
 
@@ -25,6 +26,18 @@ class ObjectStore(object):
         self.order = []
         self.id = 0                                                              # pylint: disable=invalid-name
         self.count = 0
+        # Event log sink. When set, objects are stored in the log
+        self.event_log = None
+        self.write_through = False
+
+    def set_event_log(self, event_log):
+        """Use event log as storage sink
+        Objects of write-once classes are appended as soon as they are added
+        """
+        self.event_log = event_log
+        self.write_through = (
+            event_log is not None and getattr(self.cls, "write_once", False)
+        )
 
     def __getitem__(self, index):
         return self.store[index]
@@ -36,6 +49,9 @@ class ObjectStore(object):
     def add(self, *args):
         """Add object using its __init__ arguments and return id"""
         self.id += 1
+        if self.write_through:
+            self.event_log.write(self.cls(self.id, *args))
+            return self.id
         self.count += 1
         self.store[self.id] = self.cls(self.id, *args)
         self.order.append(self.id)
@@ -52,6 +68,10 @@ class ObjectStore(object):
     def add_object(self, *args):
         """Add object using its __init__ arguments and return object"""
         self.id += 1
+        if self.write_through:
+            obj = self.cls(self.id, *args)
+            self.event_log.write(obj)
+            return obj
         self.count += 1
         self.store[self.id] = self.cls(self.id, *args)
         self.order.append(self.id)
@@ -120,12 +140,39 @@ class ObjectStore(object):
         if partial:
             self.clear()
 
+    def drain(self):
+        """Remove complete objects from storage and return their rows"""
+        rows = []
+        for obj in self.values():
+            if obj.is_complete():
+                rows.append(obj.row())
+                del self[obj.id]
+        if rows:
+            self.clear()
+        return rows
+
+    def rows(self, partial=False):
+        """Generate row tuples of objects used for storing them"""
+        getter = self.cls.row_getter()
+        for obj in self.generator(partial):
+            yield getter(obj)
+
     def has_items(self):
         """Return true if it has items"""
         return bool(self.count)
 
-    def do_store(self, partial=False):
-        """Store object store into database"""
+    def do_store(self, partial=False, writer=None):
+        """Store object store into database or event log
+        Use the bulk writer of the current transaction, if it is informed"""
+        if self.event_log is not None:
+            if self.has_items():
+                self.event_log.write_rows(self.cls, self.rows(partial))
+            self.event_log.flush()
+            return
+        if writer is not None:
+            if self.has_items():
+                writer.write(self.cls, self.rows(partial))
+            return
         self.cls.model.store(self, partial)
 
 class SharedObjectStore(ObjectStore):
@@ -175,6 +222,53 @@ class BaseLW(object):
     def __iter__(self):
         return iter(self.attributes)                                             # pylint: disable=no-member
 
+    @classmethod
+    def columns(cls):
+        """Return saved attributes that are columns of the model table"""
+        columns = cls.__dict__.get("_columns")
+        if columns is None:
+            table_columns = set(cls.model.__columns__)                           # pylint: disable=no-member
+            columns = tuple(
+                attr for attr in cls.attributes if attr in table_columns         # pylint: disable=no-member
+            )
+            cls._columns = columns
+        return columns
+
+    @classmethod
+    def row_getter(cls):
+        """Return function that reads the row() tuple of an object
+        straight from its slots"""
+        getter = cls.__dict__.get("_row_getter")
+        if getter is None:
+            columns = cls.columns()
+            get = attrgetter(*columns)
+            if len(columns) == 1:
+                get = lambda obj, _get=get: (_get(obj),)
+            nullable = [
+                index for index, column in enumerate(columns)
+                if column in cls.nullable                                        # pylint: disable=no-member
+            ]
+            if not nullable:
+                getter = get
+            else:
+                def getter(obj):
+                    """Read row and replace -1 by None in nullable columns"""
+                    row = get(obj)
+                    for index in nullable:
+                        if row[index] == -1:
+                            row = list(row)
+                            for position in nullable:
+                                if row[position] == -1:
+                                    row[position] = None
+                            return tuple(row)
+                    return row
+            cls._row_getter = getter
+        return getter
+
+    def row(self):
+        """Return saved attributes as a tuple ordered by columns()"""
+        return self.row_getter()(self)
+
     def __getitem__(self, key):
         if key in self.nullable and getattr(self, key) == -1:                     # pylint: disable=no-member
             return None
@@ -0,0 +1,65 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Single-transaction bulk writer of lightweight object rows"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from collections import Counter
+
+from .. import relational
+
+
+class BulkWriter(object):
+    """Insert rows of lightweight classes in a single transaction
+
+    Rows are inserted by executemany on the DB-API cursor of a raw
+    connection, with one INSERT OR REPLACE statement per table. Values of
+    columns with SQLAlchemy bind processors (e.g., timestamps) are converted
+    as SQLAlchemy would convert them. Use it as a context manager: the
+    transaction is committed on exit, or rolled back if an error occurred.
+    """
+
+    statements = {}  # Statement and row converter by lightweight class
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.connection = None
+        self.cursor = None
+        self.counts = Counter()  # Inserted rows by table
+
+    def __enter__(self):
+        engine = self.engine or relational.engine
+        self.connection = engine.raw_connection()
+        self.cursor = self.connection.cursor()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            if exc_type is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        finally:
+            self.cursor.close()
+            self.connection.close()
+            self.cursor = self.connection = None
+
+    def statement(self, cls):
+        """Return table name, INSERT statement, and row converter of class"""
+        result = self.statements.get(cls)
+        if result is None:
+            dialect = (self.engine or relational.engine).dialect
+            sql, convert = cls.model.replace_statement(cls.columns(), dialect)
+            result = self.statements[cls] = (
+                cls.model.__model__.__table__.name, sql, convert)
+        return result
+
+    def write(self, cls, rows):
+        """Insert row tuples ordered by cls.columns()"""
+        table, sql, convert = self.statement(cls)
+        if convert is not None:
+            rows = map(convert, rows)
+        self.cursor.executemany(sql, rows)
+        self.counts[table] += max(self.cursor.rowcount, 0)
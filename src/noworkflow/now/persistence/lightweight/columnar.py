@@ -0,0 +1,525 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Columnar storage for LW objects"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import weakref
+
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from .. import relational
+from .base import ObjectStore
+from .dependency import DependencyLW
+from .evaluation import EvaluationLW
+
+
+INT = "int"  # array of signed 64 bits integers
+FLOAT = "float"  # array of doubles
+STRING = "string"  # index of interned string in a pool
+BOOL = "bool"  # array of signed chars
+REFERENCE = "reference"  # id of another object of the same store
+OBJECT = "object"  # sparse dict. Python objects created on demand
+
+INT_NULL, INT_SIDE = -(1 << 63), -(1 << 63) + 1
+FLOAT_SIDE = float("-inf")
+REF_NULL, REF_SIDE = 0, -(1 << 63)
+STRING_NULL, STRING_SIDE = -1, -2
+BOOL_NULL = -1
+
+# Rows materialized at once when storing
+BATCH = 10000
+# Flushed rows are removed from the columns when they exceed this number
+# and the number of rows that are not flushed
+COMPACT_ROWS = 10000
+
+EVALUATION_COLUMNS = (
+    ("trial_id", STRING),
+    ("id", INT),
+    ("checkpoint", FLOAT),
+    ("code_component_id", INT),
+    ("activation_id", INT),
+    ("repr", STRING),
+    ("member_container_activation_id", INT),
+    ("member_container_id", INT),
+    ("_same", REFERENCE),
+    ("members", OBJECT),
+)
+
+DEPENDENCY_COLUMNS = (
+    ("trial_id", STRING),
+    ("id", INT),
+    ("dependent_activation_id", INT),
+    ("dependent_id", INT),
+    ("dependency_activation_id", INT),
+    ("dependency_id", INT),
+    ("type", STRING),
+    ("reference", BOOL),
+    ("collection_activation_id", INT),
+    ("collection_id", INT),
+    ("key", STRING),
+)
+
+
+class StringPool(object):
+    """Interned strings referenced by index"""
+
+    def __init__(self):
+        self.strings = []
+        self.indexes = {}
+
+    def add(self, value):
+        """Return index of value. Add it if it does not exist"""
+        index = self.indexes.get(value)
+        if index is None:
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def __getitem__(self, index):
+        return self.strings[index]
+
+    def __len__(self):
+        return len(self.strings)
+
+
+def _int_column(name, column, side):
+    """Create property for INT column"""
+    def fget(self):
+        value = column[self._index]
+        if value == INT_NULL:
+            return None
+        if value == INT_SIDE:
+            return side[(name, self._index)]
+        return value
+
+    def fset(self, value):
+        if value is None:
+            column[self._index] = INT_NULL
+            return
+        try:
+            column[self._index] = value
+        except (TypeError, OverflowError):
+            side[(name, self._index)] = value
+            column[self._index] = INT_SIDE
+    return property(fget, fset)
+
+
+def _float_column(name, column, side):
+    """Create property for FLOAT column"""
+    def fget(self):
+        value = column[self._index]
+        if value != value:  # NaN
+            return None
+        if value == FLOAT_SIDE:
+            return side[(name, self._index)]
+        return value
+
+    def fset(self, value):
+        if value is None:
+            column[self._index] = float("nan")
+        elif isinstance(value, (int, float)) and value != FLOAT_SIDE:
+            column[self._index] = value
+        else:
+            side[(name, self._index)] = value
+            column[self._index] = FLOAT_SIDE
+    return property(fget, fset)
+
+
+def _string_column(name, column, side, pool):
+    """Create property for STRING column"""
+    def fget(self):
+        value = column[self._index]
+        if value == STRING_NULL:
+            return None
+        if value == STRING_SIDE:
+            return side[(name, self._index)]
+        return pool[value]
+
+    def fset(self, value):
+        if value is None:
+            column[self._index] = STRING_NULL
+        elif isinstance(value, str):
+            column[self._index] = pool.add(value)
+        else:
+            side[(name, self._index)] = value
+            column[self._index] = STRING_SIDE
+    return property(fget, fset)
+
+
+def _bool_column(name, column):
+    """Create property for BOOL column"""
+    # pylint: disable=unused-argument
+    def fget(self):
+        value = column[self._index]
+        if value == BOOL_NULL:
+            return None
+        return bool(value)
+
+    def fset(self, value):
+        column[self._index] = BOOL_NULL if value is None else bool(value)
+    return property(fget, fset)
+
+
+def _reference_column(name, column, side, store):
+    """Create property for REFERENCE column"""
+    def fget(self):
+        value = column[self._index]
+        if value == REF_NULL:
+            return None
+        if value == REF_SIDE:
+            return side[(name, self._index)]
+        return store[value]
+
+    def fset(self, value):
+        if value is None:
+            column[self._index] = REF_NULL
+        elif type(value) is store.view_cls:                                      # pylint: disable=unidiomatic-typecheck
+            column[self._index] = value.id
+        else:
+            side[(name, self._index)] = value
+            column[self._index] = REF_SIDE
+    return property(fget, fset)
+
+
+def _object_column(name, objects):
+    """Create property for OBJECT column. Create dict on first access"""
+    # pylint: disable=unused-argument
+    def fget(self):
+        value = objects.get(self._index)
+        if value is None:
+            value = objects[self._index] = {}
+        return value
+
+    def fset(self, value):
+        if value == {}:
+            objects.pop(self._index, None)
+        else:
+            objects[self._index] = value
+    return property(fget, fset)
+
+
+class ColumnarObjectStore(ObjectStore):
+    """Temporary storage for LW objects. Keep attributes in typed columns
+
+    Numeric attributes are stored in arrays and strings are interned in a
+    pool. Lightweight views are created only when the collector requests
+    object semantics, and they are cached while referenced to preserve
+    identity. Rows are written straight from the columns.
+
+    Flushed rows are removed from the columns once they outnumber the other
+    rows, unless a live view or a kept row references them. The ids column
+    maps ids to column positions after removals.
+    """
+
+    def __init__(self, cls, columns):
+        # pylint: disable=super-init-not-called
+        self.cls = cls
+        self.id = 0                                                              # pylint: disable=invalid-name
+        self.count = 0
+        self.event_log = None
+        self.write_through = False
+        self.kinds = dict(columns)
+        self.pool = StringPool()
+        self.side = {}
+        self.objects = {}
+        self.columns = {}
+        self.ids = array("q")  # Id of each column position, in order
+        self.flushed = bytearray()
+        self.views = weakref.WeakValueDictionary()
+        namespace = {"__slots__": ("_store", "_index")}
+        for name, kind in columns:
+            namespace[name] = self._create_column(name, kind)
+        self.view_cls = type(str(cls.__name__ + "View"), (cls,), namespace)
+        self.default = tuple(
+            (self.columns[name], self._null(kind))
+            for name, kind in columns if name in self.columns
+        )
+
+    def _create_column(self, name, kind):
+        """Create column storage and return its property"""
+        # pylint: disable=too-many-return-statements
+        if kind == OBJECT:
+            objects = self.objects[name] = {}
+            return _object_column(name, objects)
+        typecode = {
+            INT: "q", FLOAT: "d", STRING: "q", BOOL: "b", REFERENCE: "q",
+        }[kind]
+        column = self.columns[name] = array(typecode)
+        if kind == INT:
+            return _int_column(name, column, self.side)
+        if kind == FLOAT:
+            return _float_column(name, column, self.side)
+        if kind == STRING:
+            return _string_column(name, column, self.side, self.pool)
+        if kind == BOOL:
+            return _bool_column(name, column)
+        return _reference_column(name, column, self.side, self)
+
+    @staticmethod
+    def _null(kind):
+        """Return null value of kind"""
+        return {
+            INT: INT_NULL, FLOAT: float("nan"), STRING: STRING_NULL,
+            BOOL: BOOL_NULL, REFERENCE: REF_NULL,
+        }[kind]
+
+    def _new_view(self, id_, position):
+        """Create view for id"""
+        view = self.view_cls.__new__(self.view_cls)
+        view._store = self                                                       # pylint: disable=protected-access
+        view._index = position                                                   # pylint: disable=protected-access
+        self.views[id_] = view
+        return view
+
+    def _new_row(self, flushed=0):
+        """Append row of nulls for the current id. Return its position"""
+        for column, null in self.default:
+            column.append(null)
+        self.ids.append(self.id)
+        self.flushed.append(flushed)
+        return len(self.flushed) - 1
+
+    def _append(self, args):
+        """Append row using LW __init__ arguments. Return view"""
+        view = self._new_view(self.id, self._new_row())
+        self.cls.__init__(view, self.id, *args)
+        return view
+
+    def _position(self, id_):
+        """Return column position of id. Raise KeyError if it was removed"""
+        ids = self.ids
+        position = bisect_left(ids, id_)
+        if position == len(ids) or ids[position] != id_:
+            raise KeyError(id_)
+        return position
+
+    def __getitem__(self, index):
+        if not 0 < index <= self.id:
+            raise KeyError(index)
+        view = self.views.get(index)
+        if view is None:
+            view = self._new_view(index, self._position(index))
+        return view
+
+    def __delitem__(self, index):
+        position = self._position(index)
+        if not self.flushed[position]:
+            self.flushed[position] = 1
+            self.count -= 1
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def store(self):
+        """Dict of ids and views of stored objects"""
+        return dict(self.items())
+
+    def add(self, *args):
+        """Add object using its __init__ arguments and return id"""
+        return self.add_object(*args).id
+
+    def add_object(self, *args):
+        """Add object using its __init__ arguments and return object"""
+        self.id += 1
+        if self.write_through:
+            obj = self.cls(self.id, *args)
+            self.event_log.write(obj)
+            self._new_row(flushed=1)
+            return obj
+        self.count += 1
+        return self._append(args)
+
+    def add_from_object(self, obje):
+        """Add object to store"""
+        self.id += 1
+        self.count += 1
+        view = self._new_view(self.id, self._new_row())
+        for name in self.kinds:
+            setattr(view, name, getattr(obje, name, None))
+        view.id = self.id
+        return view
+
+    def remove(self, value):
+        """Remove object from storage"""
+        del self[value.id]
+
+    def items(self):
+        """Iterate on both ids and views"""
+        flushed, ids = self.flushed, self.ids
+        for position in range(len(flushed)):
+            if not flushed[position]:
+                yield ids[position], self[ids[position]]
+
+    iteritems = items
+
+    def values(self):
+        """Iterate on views of stored objects"""
+        for _, view in self.items():
+            yield view
+
+    def __iter__(self):
+        return self.values()
+
+    def clear(self):
+        """Release extras of deleted objects. Remove them from the columns
+        when they outnumber the other rows"""
+        flushed, ids = self.flushed, self.ids
+        for objects in self.objects.values():
+            for index in [index for index in objects if flushed[index]]:
+                if ids[index] not in self.views:
+                    del objects[index]
+        if len(flushed) - self.count > max(self.count, COMPACT_ROWS):
+            self.compact()
+
+    def compact(self):
+        """Remove flushed rows from the columns
+        Keep rows of live views and rows referenced by kept rows"""
+        flushed, ids = self.flushed, self.ids
+        keep = bytearray(
+            not flushed[position] or ids[position] in self.views
+            for position in range(len(flushed))
+        )
+        references = [
+            self.columns[name] for name, kind in self.kinds.items()
+            if kind == REFERENCE
+        ]
+        pending = [position for position in range(len(keep)) if keep[position]]
+        while pending:
+            position = pending.pop()
+            for column in references:
+                if column[position] > 0:
+                    target = self._position(column[position])
+                    if not keep[target]:
+                        keep[target] = 1
+                        pending.append(target)
+        kept = [position for position in range(len(keep)) if keep[position]]
+        if len(kept) == len(keep):
+            return
+        moved = {old: new for new, old in enumerate(kept)}
+        # Columns are shared by the view properties. Update them in place
+        for column in list(self.columns.values()) + [ids]:
+            column[:] = array(column.typecode, [column[old] for old in kept])
+        flushed[:] = bytes(flushed[old] for old in kept)
+        side = [
+            ((name, moved[index]), value)
+            for (name, index), value in self.side.items() if index in moved
+        ]
+        self.side.clear()
+        self.side.update(side)
+        for name, objects in self.objects.items():
+            extras = [
+                (moved[index], value) for index, value in objects.items()
+                if index in moved
+            ]
+            objects.clear()
+            objects.update(extras)
+        for view in list(self.views.values()):
+            view._index = moved[view._index]                                     # pylint: disable=protected-access
+
+    def rows(self, partial=False, complete=False):
+        """Generate row tuples straight from the columns
+
+        Arguments:
+        partial -- mark complete rows as flushed
+        complete -- skip incomplete rows
+        """
+        getters = [self._row_getter(name) for name in self.cls.columns()]
+        flushed, ids = self.flushed, self.ids
+        for index in range(len(flushed)):
+            if flushed[index]:
+                continue
+            if partial or complete:
+                if self[ids[index]].is_complete():
+                    if partial:
+                        flushed[index] = 1
+                        self.count -= 1
+                elif complete:
+                    continue
+            yield tuple(getter(index) for getter in getters)
+
+    def _row_getter(self, name):
+        """Return function that reads a saved attribute of a row"""
+        kind = self.kinds[name]
+        column = self.columns[name]
+        pool, side = self.pool, self.side
+        nullable = name in self.cls.nullable
+
+        def get(index):
+            """Read column value"""
+            value = column[index]
+            if kind == FLOAT:
+                if value != value:  # NaN
+                    return None
+                if value == FLOAT_SIDE:
+                    value = side[(name, index)]
+            elif kind == STRING:
+                if value == STRING_NULL:
+                    return None
+                if value == STRING_SIDE:
+                    value = side[(name, index)]
+                else:
+                    value = pool[value]
+            elif kind == BOOL:
+                return None if value == BOOL_NULL else bool(value)
+            else:
+                if value == INT_NULL:
+                    return None
+                if value == INT_SIDE:
+                    value = side[(name, index)]
+            if nullable and value == -1:
+                return None
+            return value
+        return get
+
+    def generator(self, partial=False):
+        """Generator used for storing objects in database"""
+        for view in list(self.values()):
+            if partial and view.is_complete():
+                del self[view.id]
+            yield view
+        if partial:
+            self.clear()
+
+    def drain(self):
+        """Mark complete objects as flushed and return their rows"""
+        rows = list(self.rows(partial=True, complete=True))
+        if rows:
+            self.clear()
+        return rows
+
+    def do_store(self, partial=False, writer=None):
+        """Store rows into database or event log
+        Partial stores write incomplete rows, but keep them in the columns.
+        Use the bulk writer of the current transaction, if it is informed
+        """
+        if self.has_items():
+            rows = self.rows(partial=partial)
+            if self.event_log is not None:
+                self.event_log.write_rows(self.cls, rows)
+            elif writer is not None:
+                writer.write(self.cls, rows)
+            else:
+                with relational.engine.begin() as conn:
+                    for batch in iter(lambda: list(islice(rows, BATCH)), []):
+                        self.cls.model.store_rows(
+                            self.cls.columns(), batch, conn
+                        )
+            self.clear()
+        if self.event_log is not None:
+            self.event_log.flush()
+
+
+def columnar_evaluations():
+    """Create columnar store for evaluations"""
+    return ColumnarObjectStore(EvaluationLW, EVALUATION_COLUMNS)
+
+
+def columnar_dependencies():
+    """Create columnar store for dependencies"""
+    return ColumnarObjectStore(DependencyLW, DEPENDENCY_COLUMNS)
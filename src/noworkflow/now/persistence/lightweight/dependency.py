@@ -21,6 +21,8 @@ class DependencyLW(BaseLW):
     )
     nullable = set()
     model = Dependency
+    # Objects are never changed after creation
+    write_once = True
 
     def __init__(self, id_, trial_id, dependent_activation_id, dependent_id,
                  dependency_activation_id, dependency_id, type_, reference,
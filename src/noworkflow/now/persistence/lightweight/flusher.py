@@ -0,0 +1,75 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Background writer for lightweight object stores"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import threading
+
+from queue import Queue
+
+from .bulk import BulkWriter
+
+
+class StoreFlusher(threading.Thread):
+    """Write-behind flusher. Store complete objects in a dedicated thread
+
+    The collector thread drains complete objects from the object stores
+    and enqueues their rows. The writer thread inserts each batch in a
+    single transaction. The collector only blocks when the queue is full.
+    """
+
+    def __init__(self, stores, max_batches=16, engine=None):
+        super(StoreFlusher, self).__init__(name="noworkflow-flusher")
+        self.daemon = True
+        self.stores = stores
+        self.engine = engine  # Default to the relational engine
+        self.queue = Queue(max_batches)
+        self.error = None
+
+    def flush(self):
+        """Drain complete objects from stores and enqueue their rows
+        Stop draining if the writer failed. The error is raised by wait/stop
+        """
+        if self.error is not None:
+            return
+        batch = []
+        for store in self.stores:
+            rows = store.drain()
+            if rows:
+                batch.append((store.cls, rows))
+        if batch:
+            self.queue.put(batch)
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            try:
+                if batch is None:
+                    return
+                if self.error is None:
+                    with BulkWriter(self.engine) as writer:
+                        for cls, rows in batch:
+                            writer.write(cls, rows)
+            except Exception as exc:                                             # pylint: disable=broad-except
+                self.error = exc
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        """Raise writer error"""
+        if self.error is not None:
+            raise self.error
+
+    def wait(self):
+        """Wait until all enqueued batches are written"""
+        self.queue.join()
+        self.check()
+
+    def stop(self):
+        """Write enqueued batches and stop the writer thread"""
+        self.queue.put(None)
+        self.join()
+        self.check()
@@ -0,0 +1,62 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Lightweight Loop Summary"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from ..models import LoopSummary
+from .base import BaseLW, define_attrs
+
+
+class LoopSummaryLW(BaseLW):
+    """Loop Summary lightweight object"""
+    # pylint: disable=too-many-instance-attributes
+
+    __slots__, attributes = define_attrs(
+        ["trial_id", "id", "activation_id", "code_component_id",
+         "iterations", "elided", "start_checkpoint", "end_checkpoint",
+         "elided_duration"]
+    )
+    nullable = set()
+    model = LoopSummary
+    # Objects are never changed after creation
+    write_once = True
+
+    def __init__(self, id_, trial_id, activation_id, code_component_id,
+                 iterations, elided, start, end, elided_duration):
+        # pylint: disable=too-many-arguments
+        self.trial_id = trial_id
+        self.id = id_                                                            # pylint: disable=invalid-name
+        self.activation_id = activation_id
+        self.code_component_id = code_component_id
+        self.iterations = iterations
+        self.elided = elided
+        self.start_checkpoint = start
+        self.end_checkpoint = end
+        self.elided_duration = elided_duration
+
+    def is_complete(self):                                                       # pylint: disable=no-self-use
+        """Loop summary can always be removed from object store"""
+        return True
+
+    def __repr__(self):
+        return (
+            "LoopSummary(id={0.id}, activation_id={0.activation_id}, "
+            "code_component_id={0.code_component_id}, "
+            "iterations={0.iterations}, elided={0.elided})"
+        ).format(self)
+
+    def __json__(self):
+        return {
+            'trial_id': self.trial_id,
+            'id': self.id,
+            'activation_id': self.activation_id,
+            'code_component_id': self.code_component_id,
+            'iterations': self.iterations,
+            'elided': self.elided,
+            'start_checkpoint': self.start_checkpoint,
+            'end_checkpoint': self.end_checkpoint,
+            'elided_duration': self.elided_duration,
+        }
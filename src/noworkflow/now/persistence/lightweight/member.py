@@ -20,6 +20,8 @@ class MemberLW(BaseLW):
     )
     nullable = {}
     model = Member
+    # Objects are never changed after creation
+    write_once = True
 
     def __init__(self, id_, trial_id, collection_activation_id, collection_id,
                  member_activation_id, member_id, key, checkpoint, type_):
@@ -0,0 +1,108 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Versioned schema migrations of provenance databases"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from ..utils.io import print_msg
+
+
+MIGRATIONS = []  # (version, description, statements), by version
+
+
+def migration(version, description, statements):
+    """Register migration that upgrades the schema to version
+    Statements are SQL strings or functions of the connection. SQL strings
+    are frozen: they must not depend on the current models. All statements
+    must be idempotent, since interrupted migrations run again"""
+    assert not MIGRATIONS or MIGRATIONS[-1][0] < version
+    MIGRATIONS.append((version, description, statements))
+
+
+migration(1, "composite indexes of relationship queries", (
+    # Dependencies and memberships are joined by (trial, activation, id)
+    "CREATE INDEX IF NOT EXISTS dependency_dependent ON dependency "
+    "(trial_id, dependent_activation_id, dependent_id)",
+    "CREATE INDEX IF NOT EXISTS dependency_dependency ON dependency "
+    "(trial_id, dependency_activation_id, dependency_id)",
+    "CREATE INDEX IF NOT EXISTS member_collection ON member "
+    "(trial_id, collection_activation_id, collection_id)",
+    "CREATE INDEX IF NOT EXISTS member_member ON member "
+    "(trial_id, member_activation_id, member_id)",
+    "CREATE INDEX IF NOT EXISTS evaluation_activation ON evaluation "
+    "(trial_id, activation_id)",
+    "CREATE INDEX IF NOT EXISTS evaluation_code_component ON evaluation "
+    "(trial_id, code_component_id)",
+    "CREATE INDEX IF NOT EXISTS evaluation_member_container ON evaluation "
+    "(trial_id, member_container_activation_id, member_container_id)",
+    "CREATE INDEX IF NOT EXISTS activation_code_block ON activation "
+    "(trial_id, code_block_id)",
+    "CREATE INDEX IF NOT EXISTS file_access_activation ON file_access "
+    "(trial_id, activation_id)",
+    "CREATE INDEX IF NOT EXISTS loop_summary_activation ON loop_summary "
+    "(trial_id, activation_id)",
+    "CREATE INDEX IF NOT EXISTS module_code_block ON module "
+    "(trial_id, code_block_id)",
+))
+
+
+def _definition_sets(connection):
+    """Move definition tables of older databases into definition sets"""
+    from .models.trial_definition import convert_definition_tables
+    convert_definition_tables(connection)
+
+
+migration(2, "definition sets shared by trials", (_definition_sets,))
+
+
+def _definition_triggers(connection):
+    """Keep shared sets on conflicting stores and remove unreferenced sets"""
+    from .models.trial_definition import replace_definition_triggers
+    replace_definition_triggers(connection)
+
+
+migration(3, "definition set triggers", (_definition_triggers,))
+migration(4, "copy shared definition sets on writes", (_definition_triggers,))
+
+
+def latest_version():
+    """Return schema version of the current models"""
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def schema_version(connection):
+    """Return schema version of database"""
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def set_schema_version(connection, version):
+    """Set schema version of database"""
+    connection.exec_driver_sql("PRAGMA user_version = {:d}".format(version))
+
+
+def migrate(engine, new_db=False):
+    """Apply pending migrations in place. Return the applied versions
+    New databases are created by the current models at the latest version"""
+    applied = []
+    with engine.begin() as connection:
+        version = schema_version(connection)
+        if new_db:
+            if version < latest_version():
+                set_schema_version(connection, latest_version())
+            return applied
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        print_msg("upgrading provenance database to schema version {}: {}"
+                  .format(number, description))
+        with engine.begin() as connection:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.exec_driver_sql(statement)
+            set_schema_version(connection, number)
+        applied.append(number)
+    return applied
@@ -22,12 +22,14 @@ from .environment_attr import EnvironmentAttr
 from .evaluation import Evaluation
 from .file_access import FileAccess, UniqueFileAccess
 from .stage_tags import StageTags
+from .loop_summary import LoopSummary
 from .graph_cache import GraphCache
 from .head import Head
 from .member import Member
 from .module import Module
 from .tag import Tag
 from .trial import Trial
+from .trial_definition import TrialDefinition
 from .experiment import Experiment
 from .extendedAnnotation import ExtendedAnnotation
 from .group import Group
@@ -40,9 +42,10 @@ from . import relationships
 ORDER = [
     Trial, Head, Tag, GraphCache, Argument, # Trial
     Module, EnvironmentAttr,  # Deployment
-    CodeComponent, CodeBlock, Composition, Experiment,  # Definition
+    CodeComponent, CodeBlock, Composition, TrialDefinition,  # Definition
+    Experiment,
     Evaluation, Activation, Dependency, Member,  # Execution
-    FileAccess, StageTags,  # Execution
+    FileAccess, StageTags, LoopSummary,  # Execution
     Group, MemberOfGroup, User, ExtendedAnnotation,  # additional info
 ]
 
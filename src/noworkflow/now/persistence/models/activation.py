@@ -8,7 +8,7 @@ from __future__ import (absolute_import, print_function,
 
 from datetime import timedelta
 from sqlalchemy import Column, Integer, String, Text, Float, select, join
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologTimestamp
 from ...utils.prolog import PrologAttribute, PrologRepr, PrologNullable
@@ -83,6 +83,7 @@ class Activation(AlchemyProxy):
         ForeignKeyConstraint(["trial_id", "code_block_id"],
                              ["code_block.trial_id", "code_block.id"],
                              ondelete="CASCADE"),
+        Index("activation_code_block", "trial_id", "code_block_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
@@ -259,6 +259,47 @@ class AlchemyProxy(Model):
             )
             if conn is None:
                 _conn.close()
+
+    @classmethod
+    def replace_statement(cls, columns, dialect):
+        """Return INSERT OR REPLACE statement of positional rows ordered by
+        columns, and row converter. The converter applies the SQLAlchemy
+        bind processors (e.g., of timestamps). It is None if there are none
+        """
+        table = cls.__model__.__table__
+        processors = [
+            (index, processor) for index, processor in (
+                (index, table.c[column].type.bind_processor(dialect))
+                for index, column in enumerate(columns)
+            ) if processor is not None
+        ]
+        convert = None
+        if processors:
+            def convert(row):
+                """Apply bind processors to row values"""
+                row = list(row)
+                for index, processor in processors:
+                    row[index] = processor(row[index])
+                return tuple(row)
+        sql = 'INSERT OR REPLACE INTO "{}" ({}) VALUES ({})'.format(
+            table.name, ", ".join('"{}"'.format(name) for name in columns),
+            ", ".join("?" for _ in columns))
+        return sql, convert
+
+    @classmethod
+    def store_rows(cls, columns, rows, conn=None):
+        """Bulk insert rows. Each row is a tuple ordered by columns
+        Rows are passed positionally to executemany"""
+        rows = list(rows)
+        if rows:
+            _conn = conn if conn else relational.engine.connect()
+            sql, convert = cls.replace_statement(columns, _conn.dialect)
+            if convert is not None:
+                rows = [convert(row) for row in rows]
+            _conn.exec_driver_sql(sql, rows)
+            if conn is None:
+                _conn.close()
+
     @classmethod
     def load_by_trials(cls, trial_ids_list, session=None):
         session = session or relational.session
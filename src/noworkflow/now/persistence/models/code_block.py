@@ -62,6 +62,8 @@ class CodeBlock(AlchemyProxy):
         ForeignKeyConstraint(["trial_id", "id"],
                              ["code_component.trial_id",
                               "code_component.id"], ondelete="CASCADE"),
+        # View of definition sets (see trial_definition.py)
+        {"info": {"view": True}},
     )
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
     trial_id = Column(String, index=True)
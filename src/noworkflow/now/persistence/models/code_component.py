@@ -72,6 +72,8 @@ class CodeComponent(AlchemyProxy):
         ForeignKeyConstraint(["trial_id", "container_id"],
                              ["code_block.trial_id", "code_block.id"],
                              ondelete="CASCADE", use_alter=True),
+        # View of definition sets (see trial_definition.py)
+        {"info": {"view": True}},
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
@@ -35,6 +35,8 @@ class Composition(AlchemyProxy):
         ForeignKeyConstraint(["trial_id", "whole_id"],
                              ["code_component.trial_id", "code_component.id"],
                              ondelete="CASCADE"),
+        # View of definition sets (see trial_definition.py)
+        {"info": {"view": True}},
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
@@ -7,7 +7,7 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from sqlalchemy import Column, Integer, String, Text, Boolean
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologAttribute
 from ...utils.prolog import PrologRepr, PrologNullable, PrologBoolean
@@ -78,6 +78,10 @@ class Dependency(AlchemyProxy):
                               "dependency_id"],
                              ["evaluation.trial_id", "evaluation.activation_id",
                               "evaluation.id"], ondelete="CASCADE"),
+        Index("dependency_dependent", "trial_id",
+              "dependent_activation_id", "dependent_id"),
+        Index("dependency_dependency", "trial_id",
+              "dependency_activation_id", "dependency_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
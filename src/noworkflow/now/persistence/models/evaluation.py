@@ -8,7 +8,7 @@ from __future__ import (absolute_import, print_function,
 
 from datetime import timedelta
 from sqlalchemy import Column, Integer, String, Text, Float
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 from sqlalchemy.orm import remote, foreign
 
 
@@ -93,6 +93,10 @@ class Evaluation(AlchemyProxy):
                               "evaluation.member_container_activation_id",
                               "evaluation.member_container_id"],
                              ondelete="CASCADE", use_alter=True),
+        Index("evaluation_activation", "trial_id", "activation_id"),
+        Index("evaluation_code_component", "trial_id", "code_component_id"),
+        Index("evaluation_member_container", "trial_id",
+              "member_container_activation_id", "member_container_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
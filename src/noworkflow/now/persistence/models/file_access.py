@@ -10,7 +10,7 @@ import os
 
 from datetime import timedelta
 from sqlalchemy import Column, Integer, String, Text, Float
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologAttribute
 from ...utils.prolog import PrologRepr, PrologTimestamp, PrologNullable
@@ -59,6 +59,7 @@ class FileAccess(AlchemyProxy):
                              ["activation.trial_id",
                               "activation.id"], ondelete="CASCADE"),
         ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+        Index("file_access_activation", "trial_id", "activation_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
@@ -0,0 +1,96 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Loop Summary Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
+
+from ...utils.prolog import PrologDescription, PrologTrial, PrologAttribute
+
+from .base import AlchemyProxy, proxy_class
+
+
+@proxy_class
+class LoopSummary(AlchemyProxy):
+    """Represent the iterations of a sampled loop without full provenance
+
+
+    Doctest:
+    >>> from noworkflow.tests.helpers.models import erase_db, new_trial
+    >>> from noworkflow.tests.helpers.models import loop_summaries
+    >>> erase_db()
+    >>> trial_id = new_trial()
+    >>> id_ = loop_summaries.add(trial_id, 1, 2, 100, 90, 0.5, 1.5, 0.75)
+    >>> loop_summaries.do_store()
+
+
+    Load LoopSummary object by (trial_id, id):
+    >>> summary = LoopSummary((trial_id, id_))
+    >>> summary  # doctest: +ELLIPSIS
+    loop_summary(..., 1, 2, 1, 100, 90, 0.5, 1.5, 0.75).
+
+    Load LoopSummary trial:
+    >>> summary.trial.id == trial_id
+    True
+    """
+
+    __tablename__ = "loop_summary"
+    __table_args__ = (
+        PrimaryKeyConstraint("trial_id", "id"),
+        ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+        ForeignKeyConstraint(["trial_id", "activation_id"],
+                             ["activation.trial_id",
+                              "activation.id"], ondelete="CASCADE"),
+        ForeignKeyConstraint(["trial_id", "code_component_id"],
+                             ["code_component.trial_id",
+                              "code_component.id"], ondelete="CASCADE"),
+        Index("loop_summary_activation", "trial_id", "activation_id"),
+    )
+    trial_id = Column(String, index=True)
+    id = Column(Integer, index=True)                                             # pylint: disable=invalid-name
+    activation_id = Column(Integer, index=True)
+    code_component_id = Column(Integer, index=True)
+    iterations = Column(Integer)
+    elided = Column(Integer)
+    start_checkpoint = Column(Float)
+    end_checkpoint = Column(Float)
+    elided_duration = Column(Float)
+
+    # Relationship attributes (see relationships.py):
+    #   trial: 1 Trial
+    #   activation: 1 Activation
+
+    prolog_description = PrologDescription("loop_summary", (
+        PrologTrial("trial_id", link="activation.trial_id"),
+        PrologAttribute("activation_id", link="activation.id"),
+        PrologAttribute("code_component_id", link="code_component.id"),
+        PrologAttribute("id"),
+        PrologAttribute("iterations"),
+        PrologAttribute("elided"),
+        PrologAttribute("start_checkpoint"),
+        PrologAttribute("end_checkpoint"),
+        PrologAttribute("elided_duration"),
+    ), description=(
+        "informs that in a given trial (*TrialId*),\n"
+        "a loop of activation *ActivationId* with target\n"
+        "*CodeComponentId* ran *Iterations* iterations\n"
+        "between *StartCheckpoint* and *EndCheckpoint*.\n"
+        "*Elided* iterations, which took *ElidedDuration*,\n"
+        "were not collected due to loop sampling."
+    ))
+
+    def show(self, print_=lambda x, offset=0: print(x)):
+        """Show object
+
+        Keyword arguments:
+        print_ -- custom print function (default=print)
+        """
+        print_((
+            "Loop {0.code_component_id} of activation {0.activation_id}: "
+            "{0.iterations} iterations, {0.elided} elided "
+            "({0.elided_duration:.6f}s)"
+        ).format(self))
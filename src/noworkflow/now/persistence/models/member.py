@@ -7,7 +7,7 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from sqlalchemy import Column, Integer, String, Text, Float
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologAttribute
 from ...utils.prolog import PrologRepr, PrologTimestamp
@@ -76,6 +76,10 @@ class Member(AlchemyProxy):
                               "member_id"],
                              ["evaluation.trial_id", "evaluation.activation_id",
                               "evaluation.id"], ondelete="CASCADE"),
+        Index("member_collection", "trial_id",
+              "collection_activation_id", "collection_id"),
+        Index("member_member", "trial_id",
+              "member_activation_id", "member_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
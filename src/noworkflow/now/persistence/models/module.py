@@ -7,7 +7,7 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 from sqlalchemy import Column, Integer, String, Text, Boolean, select, bindparam
-from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint, Index
 
 from ...utils.prolog import PrologDescription, PrologTrial, PrologRepr
 from ...utils.prolog import PrologAttribute, PrologNullableRepr
@@ -59,6 +59,7 @@ class Module(AlchemyProxy):
         ForeignKeyConstraint(["trial_id", "code_block_id"],
                              ["code_block.trial_id", "code_block.id"],
                              ondelete="CASCADE"),
+        Index("module_code_block", "trial_id", "code_block_id"),
     )
     trial_id = Column(String, index=True)
     id = Column(Integer, index=True)  # pylint: disable=invalid-name
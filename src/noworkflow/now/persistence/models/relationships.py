@@ -20,6 +20,7 @@ from .environment_attr import EnvironmentAttr
 from .evaluation import Evaluation
 from .member import Member
 from .file_access import FileAccess
+from .loop_summary import LoopSummary
 
 from .head import Head
 from .module import Module
@@ -111,6 +112,12 @@ bidirectional_relationship(
     viewonly=True,
 )
 
+# Activation.loop_summaries <-> LoopSummary.activation
+bidirectional_relationship(
+    Activation, "loop_summaries", LoopSummary, "activation", MTO,
+    viewonly=True,
+)
+
 # Activation.dependent_dependencies <-> Dependency.dependent_activation
 bidirectional_relationship(
     Activation, "dependent_dependencies", Dependency, "dependent_activation", MTO,
@@ -253,6 +260,7 @@ bidirectional_relationship(
 # Dependency.trial <-> Trial.dependencies
 bidirectional_relationship(
     Trial, "dependencies", Dependency, "trial", MTO,
+    extra1=dict(order_by=Dependency.m.id),
     viewonly=True,
 )
 
@@ -293,6 +301,7 @@ bidirectional_relationship(
 # Evaluation.trial <-> Trial.evaluations
 bidirectional_relationship(
     Trial, "evaluations", Evaluation, "trial", MTO,
+    extra1=dict(order_by=Evaluation.m.id),
     viewonly=True,
 )
 
@@ -365,6 +374,16 @@ bidirectional_relationship(
 # FileAccess.trial <-> Trial.file_accesses
 bidirectional_relationship(
     Trial, "file_accesses", FileAccess, "trial", MTO,
+    extra1=dict(order_by=FileAccess.m.id),
+    viewonly=True,
+)
+
+## LoopSummary
+
+# LoopSummary.trial <-> Trial.loop_summaries
+bidirectional_relationship(
+    Trial, "loop_summaries", LoopSummary, "trial", MTO,
+    extra1=dict(order_by=LoopSummary.m.id),
     viewonly=True,
 )
 
@@ -381,6 +400,7 @@ add(Head, "trial", relationship(
 # Member.trial <-> Trial.members
 bidirectional_relationship(
     Trial, "members", Member, "trial", MTO,
+    extra1=dict(order_by=Member.m.id),
     viewonly=True,
 )
 
@@ -390,6 +410,7 @@ bidirectional_relationship(
 # Module.trial <-> Trial._modules
 bidirectional_relationship(
     Trial, "_modules", Module, "trial", MTO,
+    extra1=dict(order_by=Module.m.id),
     viewonly=True,
 )
 
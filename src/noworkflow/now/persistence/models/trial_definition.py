@@ -0,0 +1,351 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Trial Definition Model"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+
+from sqlalchemy import Column, String, Table, Index, event, text, select
+from sqlalchemy import PrimaryKeyConstraint, ForeignKeyConstraint
+
+from .. import relational
+
+from .base import AlchemyProxy, proxy_class
+from .code_block import CodeBlock
+from .code_component import CodeComponent
+from .composition import Composition
+
+
+@proxy_class
+class TrialDefinition(AlchemyProxy):
+    """Represent the definition set of a trial
+
+    Code components, code blocks, and compositions are stored in definition
+    sets. The code_component, code_block, and composition tables are views
+    that expand the set of each trial. Trials with identical definitions
+    share a single set.
+
+
+    Doctest:
+    >>> from noworkflow.tests.helpers.models import erase_db, new_trial
+    >>> from noworkflow.now.persistence.models import Trial
+    >>> erase_db()
+    >>> trial_id = new_trial()
+    >>> trial_id2 = new_trial(erase=False)
+
+    New trials use their own set:
+    >>> TrialDefinition(trial_id).set_id == trial_id
+    True
+
+    Trials with identical definitions share a set:
+    >>> TrialDefinition.share(trial_id) == trial_id
+    True
+    >>> TrialDefinition.share(trial_id2) == trial_id
+    True
+    >>> components = list(Trial(trial_id2).code_components)
+    >>> len(components) == len(list(Trial(trial_id).code_components))
+    True
+    """
+
+    __tablename__ = "trial_definition"
+    __table_args__ = (
+        PrimaryKeyConstraint("trial_id"),
+        ForeignKeyConstraint(["trial_id"], ["trial.id"], ondelete="CASCADE"),
+    )
+    trial_id = Column(String, index=True)
+    set_id = Column(String, index=True)
+    digest = Column(String, index=True)
+
+    def __repr__(self):
+        return "trial_definition({0.trial_id}, {0.set_id}).".format(self)
+
+    @classmethod  # query
+    def share(cls, trial_id, conn=None):
+        """Replace the definition set of a trial by an identical existing one
+        Only call it after storing the complete trial definition.
+        Return the resulting set id"""
+        _conn = conn if conn else relational.engine.connect()
+        try:
+            with _conn.begin():
+                return _share(_conn, trial_id)
+        finally:
+            if conn is None:
+                _conn.close()
+
+
+def _set_table(model):
+    """Create table that stores the rows of a view model by definition set"""
+    columns = [Column("set_id", String)] + [
+        Column(column.name, column.type)
+        for column in model.__table__.columns if column.name != "trial_id"
+    ]
+    name = model.__tablename__ + "_set"
+    columns.append(PrimaryKeyConstraint("set_id", "id"))
+    return Table(name, relational.base.metadata, *columns)
+
+
+DEFINITION_SETS = {
+    model: _set_table(model)
+    for model in (CodeComponent, CodeBlock, Composition)
+}
+
+Index("code_component_set_container",
+      DEFINITION_SETS[CodeComponent].c.set_id,
+      DEFINITION_SETS[CodeComponent].c.container_id)
+Index("code_block_set_code_hash", DEFINITION_SETS[CodeBlock].c.code_hash)
+Index("composition_set_part",
+      DEFINITION_SETS[Composition].c.set_id,
+      DEFINITION_SETS[Composition].c.part_id)
+Index("composition_set_whole",
+      DEFINITION_SETS[Composition].c.set_id,
+      DEFINITION_SETS[Composition].c.whole_id)
+
+
+def _share(conn, trial_id):
+    """Share definition set of trial. Return the resulting set id"""
+    definition = TrialDefinition.t
+    set_id = conn.execute(
+        select([definition.c.set_id]).where(definition.c.trial_id == trial_id)
+    ).scalar()
+    if set_id is None:
+        return None
+    digest = hashlib.sha1()
+    for model, table in DEFINITION_SETS.items():
+        digest.update(model.__tablename__.encode("utf-8"))
+        columns = [column for column in table.columns if column.name != "set_id"]
+        for row in conn.execute(
+                select(columns).where(table.c.set_id == set_id)
+                .order_by(table.c.id)):
+            digest.update(repr(tuple(row)).encode("utf-8"))
+    digest = digest.hexdigest()
+    shared = conn.execute(
+        select([definition.c.set_id]).where(
+            (definition.c.digest == digest) & (definition.c.set_id != set_id)
+        ).limit(1)
+    ).scalar()
+    conn.execute(
+        definition.update().where(definition.c.trial_id == trial_id),
+        {"set_id": shared or set_id, "digest": digest}
+    )
+    if shared is None:
+        return set_id
+    in_use = conn.execute(
+        select([definition.c.trial_id]).where(definition.c.set_id == set_id)
+        .limit(1)
+    ).scalar()
+    if in_use is None:
+        for table in DEFINITION_SETS.values():
+            conn.execute(table.delete().where(table.c.set_id == set_id))
+    return shared
+
+
+VIEW = """
+CREATE VIEW {name} AS
+SELECT definition.trial_id AS trial_id, {select}
+FROM trial_definition AS definition
+JOIN {name}_set AS stored ON stored.set_id = definition.set_id
+"""
+
+# Writes of a trial that shares its set go to a copy of the set.
+#   The update keeps the shared set id in the digest until the rows of the
+#   three set tables are copied. Changes invalidate the digest of the set
+UNSHARE = """
+    UPDATE trial_definition
+    SET digest = 'copy ' || set_id, set_id = lower(hex(randomblob(16)))
+    WHERE trial_id = {trial} AND {changed}
+    AND EXISTS (SELECT 1 FROM trial_definition AS other
+                WHERE other.set_id = trial_definition.set_id
+                AND other.trial_id != {trial});
+{copies}
+    UPDATE trial_definition SET digest = NULL
+    WHERE trial_id = {trial} AND digest IS NOT NULL AND {changed};
+"""
+
+COPY = """
+    INSERT INTO {table} (set_id, {columns})
+    SELECT definition.set_id, {stored}
+    FROM trial_definition AS definition
+    JOIN {table} AS stored ON stored.set_id = substr(definition.digest, 6)
+    WHERE definition.trial_id = {trial}
+    AND definition.digest LIKE 'copy %';
+"""
+
+# Stores insert into the views with INSERT OR REPLACE, and SQLite applies
+#   the conflict policy of the outer statement to the trigger statements.
+#   The mapping insert must not conflict, or it would replace shared sets.
+#   Identical rows do not unshare the set
+INSERT_TRIGGER = """
+CREATE TRIGGER {name}_insert INSTEAD OF INSERT ON {name}
+BEGIN
+    INSERT INTO trial_definition (trial_id, set_id)
+    SELECT NEW.trial_id, NEW.trial_id
+    WHERE NOT EXISTS (SELECT 1 FROM trial_definition
+                      WHERE trial_id = NEW.trial_id);
+{unshare}
+    INSERT INTO {name}_set (set_id, {columns})
+    VALUES ((SELECT set_id FROM trial_definition
+             WHERE trial_id = NEW.trial_id), {values});
+END
+"""
+
+# Inserts change the set unless it has an identical row
+CHANGED = """NOT EXISTS (
+        SELECT 1 FROM {name}_set AS stored
+        WHERE stored.set_id = trial_definition.set_id
+        AND stored.id = NEW.id AND {equal})"""
+
+DELETE_TRIGGER = """
+CREATE TRIGGER {name}_delete INSTEAD OF DELETE ON {name}
+BEGIN
+{unshare}
+    DELETE FROM {name}_set
+    WHERE set_id = (SELECT set_id FROM trial_definition
+                    WHERE trial_id = OLD.trial_id)
+    AND id = OLD.id;
+END
+"""
+
+# Foreign keys are not enforced, so trial deletions do not cascade
+TRIAL_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trial_definition_trial_delete
+AFTER DELETE ON trial
+BEGIN
+    DELETE FROM trial_definition WHERE trial_id = OLD.id;
+END
+"""
+
+# Sets are removed when the last trial stops referencing them
+SET_DELETE_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS trial_definition_delete
+AFTER DELETE ON trial_definition
+WHEN NOT EXISTS (SELECT 1 FROM trial_definition WHERE set_id = OLD.set_id)
+BEGIN
+{deletes}
+END
+"""
+
+
+def _migrate(connection, name, columns):
+    """Move rows of a definition table into definition sets"""
+    connection.execute(text(
+        "INSERT OR IGNORE INTO trial_definition (trial_id, set_id) "
+        "SELECT DISTINCT trial_id, trial_id FROM {}".format(name)
+    ))
+    connection.execute(text(
+        "INSERT OR REPLACE INTO {0}_set (set_id, {1}) "
+        "SELECT trial_id, {1} FROM {0}".format(name, columns)
+    ))
+    connection.execute(text("DROP TABLE {}".format(name)))
+
+
+def _kind(connection, name):
+    """Return type of schema object: table, view, or None"""
+    return connection.execute(text(
+        "SELECT type FROM sqlite_master WHERE name = :name"
+    ), {"name": name}).scalar()
+
+
+def _names(model):
+    """Return names of the set columns of a view model"""
+    return [
+        column.name for column in model.__table__.columns
+        if column.name != "trial_id"
+    ]
+
+
+def _unshare(trial, changed):
+    """Return trigger statements that copy the set of a trial when it is
+    shared and the write changes it"""
+    return UNSHARE.format(trial=trial, changed=changed, copies="".join(
+        COPY.format(
+            table=table.name, trial=trial,
+            columns=", ".join(_names(model)),
+            stored=", ".join("stored." + n for n in _names(model)),
+        ) for model, table in DEFINITION_SETS.items()
+    ))
+
+
+def _create_view(connection, model):
+    """Create definition view and triggers of model"""
+    name = model.__tablename__
+    connection.execute(text(VIEW.format(
+        name=name,
+        select=", ".join(
+            "stored.{0} AS {0}".format(n) for n in _names(model))
+    )))
+    _create_triggers(connection, model)
+
+
+def _create_triggers(connection, model):
+    """Create triggers that write view rows into the set of the trial"""
+    name = model.__tablename__
+    names = _names(model)
+    changed = CHANGED.format(name=name, equal=" AND ".join(
+        "stored.{0} IS NEW.{0}".format(n) for n in names))
+    connection.execute(text(INSERT_TRIGGER.format(
+        name=name, columns=", ".join(names),
+        values=", ".join("NEW." + n for n in names),
+        unshare=_unshare("NEW.trial_id", changed),
+    )))
+    connection.execute(text(DELETE_TRIGGER.format(
+        name=name, unshare=_unshare("OLD.trial_id", "1"),
+    )))
+
+
+def _create_cleanup_triggers(connection):
+    """Create triggers that remove sets of deleted trials"""
+    connection.execute(text(TRIAL_DELETE_TRIGGER))
+    connection.execute(text(SET_DELETE_TRIGGER.format(deletes="\n".join(
+        "    DELETE FROM {} WHERE set_id = OLD.set_id;".format(table.name)
+        for table in DEFINITION_SETS.values()
+    ))))
+
+
+def replace_definition_triggers(connection):
+    """Replace view triggers of older databases and create the cleanup
+    triggers. Used by schema migrations"""
+    for model in DEFINITION_SETS:
+        name = model.__tablename__
+        if _kind(connection, name) != "view":
+            continue
+        for kind in ("insert", "delete"):
+            connection.execute(text(
+                "DROP TRIGGER IF EXISTS {}_{}".format(name, kind)))
+        _create_triggers(connection, model)
+    _create_cleanup_triggers(connection)
+
+
+def convert_definition_tables(connection):
+    """Move rows of definition tables into definition sets and create the
+    definition views. Used by the schema migration of older databases"""
+    migrated = False
+    for model in DEFINITION_SETS:
+        name = model.__tablename__
+        kind = _kind(connection, name)
+        if kind == "view":
+            continue
+        if kind == "table":
+            _migrate(connection, name, ", ".join(_names(model)))
+            migrated = True
+        _create_view(connection, model)
+    _create_cleanup_triggers(connection)
+    if migrated:
+        trial_ids = connection.execute(text(
+            "SELECT trial_id FROM trial_definition WHERE digest IS NULL"
+        )).fetchall()
+        for (trial_id,) in trial_ids:
+            _share(connection, trial_id)
+
+
+@event.listens_for(relational.base.metadata, "after_create")
+def create_definition_views(target, connection, **kwargs):
+    """Create definition views of new databases
+    Definition tables of older databases are converted by migrations"""
+    # pylint: disable=unused-argument
+    for model in DEFINITION_SETS:
+        if _kind(connection, model.__tablename__) is None:
+            _create_view(connection, model)
+    _create_cleanup_triggers(connection)
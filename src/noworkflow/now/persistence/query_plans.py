@@ -0,0 +1,134 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Query plans of the standard provenance queries"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import re
+
+from collections import namedtuple
+
+from sqlalchemy import inspect
+
+from .models import ORDER
+
+
+SEARCH = re.compile(r"^SEARCH (\S+) USING (?:COVERING )?"
+                    r"(?:INDEX (\S+)|(?:INTEGER )?PRIMARY KEY) \((.*)\)$")
+
+QueryPlan = namedtuple("QueryPlan", "name sql details problems")
+
+
+def standard_queries(session):
+    """Iterate on (name, statement) of the lazy loads of model relationships
+    They are the queries of the model attributes, trial preloads, and graphs
+    """
+    for model in ORDER:
+        mapper = inspect(model.m)
+        for relationship in sorted(mapper.relationships, key=lambda r: r.key):
+            parent = model.m()
+            for column in mapper.columns:
+                setattr(parent, column.key, 1)
+            query = session.query(relationship.mapper.class_).with_parent(
+                parent, relationship.key)
+            if relationship.order_by:
+                query = query.order_by(*relationship.order_by)
+            yield "{}.{}".format(model.__name__, relationship.key), (
+                query.statement)
+
+
+def unique_indexes(connection):
+    """Return number of columns of unique indexes by name"""
+    result = {}
+    tables = connection.exec_driver_sql(
+        "SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    for table, in tables:
+        for row in connection.exec_driver_sql(
+                'PRAGMA index_list("{}")'.format(table)).fetchall():
+            name, unique = row[1], row[2]
+            if unique:
+                result[name] = len(connection.exec_driver_sql(
+                    'PRAGMA index_info("{}")'.format(name)).fetchall())
+    return result
+
+
+def plan_problems(details, constraints, unique=None):
+    """Return full scans and searches that only use part of the equality
+    constraints of a table. Searches of all columns of unique indexes
+    select a single row and are complete"""
+    unique = unique or {}
+    problems = []
+    for detail in details:
+        if detail.startswith("SCAN ") and "CONSTANT ROW" not in detail:
+            problems.append("full scan: " + detail)
+            continue
+        match = SEARCH.match(detail)
+        if match is None:
+            continue
+        table, index = match.group(1), match.group(2)
+        used = match.group(3).count("=?")
+        expected = constraints.get(table, 0)
+        if index is None or unique.get(index) == used:
+            continue
+        if used < expected:
+            problems.append("partial search ({} of {} columns): {}".format(
+                used, expected, detail))
+    return problems
+
+
+def equality_constraints(statement):
+    """Return number of columns compared to parameters by table alias"""
+    counts = {}
+    for clause in _conjunctions(statement.whereclause):
+        if _operator(clause) != "eq":
+            continue
+        left, right = clause.left, clause.right
+        for column, value in ((left, right), (right, left)):
+            table = getattr(column, "table", None)
+            if table is not None and not hasattr(value, "table"):
+                name = getattr(table, "name", None)
+                counts[name] = counts.get(name, 0) + 1
+    return counts
+
+
+def _conjunctions(clause):
+    """Iterate on the terms of AND clauses"""
+    if clause is None:
+        return
+    if _operator(clause) == "and_":
+        for sub in clause.clauses:
+            for term in _conjunctions(sub):
+                yield term
+    else:
+        yield clause
+
+
+def _operator(clause):
+    """Return operator name of SQL expression"""
+    return getattr(getattr(clause, "operator", None), "__name__", None)
+
+
+def explain(connection, name, statement, unique=None):
+    """Return QueryPlan of statement"""
+    compiled = statement.compile(connection)
+    params = tuple(compiled.params[key] for key in compiled.positiontup)
+    sql = str(compiled)
+    details = [
+        row[-1] for row in connection.exec_driver_sql(
+            "EXPLAIN QUERY PLAN " + sql, params)
+    ]
+    problems = plan_problems(
+        details, equality_constraints(statement), unique)
+    return QueryPlan(name, sql, details, problems)
+
+
+def analyze(engine, session):
+    """Return QueryPlans of the standard queries"""
+    with engine.connect() as connection:
+        unique = unique_indexes(connection)
+        return [
+            explain(connection, name, statement, unique)
+            for name, statement in standard_queries(session)
+        ]
@@ -0,0 +1,65 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Content hashes referenced by the provenance"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from os.path import isfile
+
+from sqlalchemy import select, union
+
+from .event_log import EventLog, event_log_path, pending_logs
+from .models import CodeBlock, FileAccess, GraphCache
+
+
+# Columns that reference contents, by model name
+REFERENCES = {
+    "CodeBlock": ("code_hash",),
+    "FileAccess": ("content_hash_before", "content_hash_after"),
+    "GraphCache": ("content_hash",),
+}
+MODELS = {
+    "CodeBlock": CodeBlock,
+    "FileAccess": FileAccess,
+    "GraphCache": GraphCache,
+}
+
+
+def referenced_hashes(session, provenance_path):
+    """Return set of content hashes referenced by the database and by event
+    logs waiting for ingestion"""
+    columns = [
+        getattr(MODELS[model].m, column)
+        for model, names in sorted(REFERENCES.items())
+        for column in names
+    ]
+    query = union(*[
+        select(column).where(column.isnot(None)) for column in columns
+    ])
+    result = session.execute(
+        query, execution_options={"stream_results": True})
+    live = {content_hash for content_hash, in result}
+    for trial_id in pending_logs(provenance_path):
+        live.update(logged_hashes(event_log_path(provenance_path, trial_id)))
+    return live
+
+
+def logged_hashes(path):
+    """Iterate on content hashes referenced by an event log"""
+    if not isfile(path):
+        return
+    positions = {}
+    for model, columns, row in EventLog(path).read():
+        names = REFERENCES.get(model)
+        if names is None:
+            continue
+        key = (model, tuple(columns))
+        if key not in positions:
+            positions[key] = [
+                columns.index(name) for name in names if name in columns
+            ]
+        for position in positions[key]:
+            if row[position] is not None:
+                yield row[position]
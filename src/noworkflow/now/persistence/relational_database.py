@@ -8,17 +8,32 @@ from __future__ import (absolute_import, print_function,
 
 import threading
 
+from contextlib import contextmanager
 from os.path import join, exists
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from ..utils.io import print_msg
+from .migrations import migrate
 
 
 DB_FILENAME = "db.sqlite"
 
+# SQLite pragmas applied to each connection, by storage profile
+# The bulk profile trades durability of the last transactions on power
+#   loss for faster writes. WAL persists in the database file
+STORAGE_PROFILES = {
+    "default": (),
+    "bulk": (
+        ("journal_mode", "WAL"),
+        ("synchronous", "NORMAL"),
+        ("cache_size", -65536),  # KiB
+        ("temp_store", "MEMORY"),
+    ),
+}
+
 
 class RelationalDatabase(object):
     """Relational Database deal with SQLite connection"""
@@ -28,6 +43,7 @@ class RelationalDatabase(object):
         self.engine = None
         self._session_map = {}
         self.session_factory = sessionmaker()
+        self.ingesting = 0  # Depth of nested ingest modes
 
         self.base = declarative_base()
 
@@ -53,13 +69,68 @@ class RelationalDatabase(object):
         self.engine = create_engine(
             "sqlite://" + ("/" if self.db_path else "") + self.db_path,
             echo=False)
+        pragmas = STORAGE_PROFILES[config.storage_profile]
+        if pragmas:
+            event.listen(self.engine, "connect", apply_pragmas(pragmas))
         self.session_factory.configure(bind=self.engine, autoflush=False,
                                        expire_on_commit=True)
         self._session_map = {}
 
         if new_db:
             print_msg("creating provenance database")
-            self.base.metadata.create_all(self.engine)
+        # Create missing tables of existing databases as well
+        # Tables marked as views are created by after_create listeners
+        self.base.metadata.create_all(self.engine, tables=[
+            table for table in self.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+        migrate(self.engine, new_db)
+        # Recreate indexes of interrupted ingest modes
+        self.create_indexes()
+
+    def secondary_indexes(self):
+        """Return non-unique indexes of tables"""
+        return [
+            index
+            for table in self.base.metadata.sorted_tables
+            if not table.info.get("view")
+            for index in sorted(table.indexes, key=lambda index: index.name)
+            if not index.unique
+        ]
+
+    def create_indexes(self):
+        """Create missing secondary indexes"""
+        with self.engine.begin() as conn:
+            existing = {name for name, in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")}
+            for index in self.secondary_indexes():
+                if index.name not in existing:
+                    index.create(conn)
+
+    @contextmanager
+    def ingest_mode(self, enabled=True):
+        """Drop secondary indexes and recreate them on exit
+        Use it for loads that are large in comparison to the database"""
+        if not enabled:
+            yield
+            return
+        if self.ingesting:
+            self.ingesting += 1
+            try:
+                yield
+            finally:
+                self.ingesting -= 1
+            return
+        with self.engine.begin() as conn:
+            for index in self.secondary_indexes():
+                conn.exec_driver_sql(
+                    'DROP INDEX IF EXISTS "{}"'.format(index.name))
+        self.ingesting = 1
+        try:
+            yield
+        finally:
+            self.ingesting = 0
+            self.create_indexes()
 
     def make_session(self):
         """Create thread safe session"""
@@ -77,3 +148,14 @@ class RelationalDatabase(object):
     def query(self, text):
         """Perform SQL query"""
         return self.session.execute(text).fetchall()
+
+
+def apply_pragmas(pragmas):
+    """Return connect listener that applies SQLite pragmas"""
+    def listener(dbapi_connection, connection_record):                         # pylint: disable=unused-argument
+        """Apply pragmas to new DB-API connection"""
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas:
+            cursor.execute("PRAGMA {} = {}".format(name, value))
+        cursor.close()
+    return listener
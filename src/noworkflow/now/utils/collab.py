@@ -8,12 +8,14 @@ from ..persistence.lightweight import EvaluationLW,FileAccessLW,MemberLW,ModuleL
 
 from ..persistence.models import Trial,Activation,Argument,CodeBlock,CodeComponent,Composition,Dependency,EnvironmentAttr,Evaluation
 from ..persistence.models import FileAccess,StageTags,Member,Module,Tag, User
+from ..persistence.models import TrialDefinition
 from ..persistence.lightweight import ObjectStore
+from ..persistence import relational
 def store_trial_from_experiment(trial,experiment,trial_store):
     trial.experiment_id=experiment
     trial_store.add_from_object(trial)
 
-def import_bundle(bundle, experiment=None):
+def import_bundle(bundle, experiment=None, bulk=False):
     trials_store=ObjectStore(TrialLW)
     codeBlock_store=ObjectStore(CodeBlockLW)
     arguments_store=ObjectStore(ArgumentLW)
@@ -44,24 +46,24 @@ def import_bundle(bundle, experiment=None):
     [module_store.add_from_object(x) for x in bundle.modules]
     [user_store.add_from_object(x) for x in bundle.users]
 
-    trials_store.do_store()
-    arguments_store.do_store()
-    codeBlock_store.do_store()
-    codeComponent_store.do_store()
-    activation_store.do_store()
-    composition_store.do_store()
-    dependency_store.do_store()
-    env_store.do_store()
-    evaluation_store.do_store()
-    fileAccess_store.do_store()
-    stageTags_store.do_store()
-
-    
-    member_store.do_store()
-    module_store.do_store()
-    user_store.do_store()
+    with relational.ingest_mode(bulk):
+        trials_store.do_store()
+        arguments_store.do_store()
+        codeBlock_store.do_store()
+        codeComponent_store.do_store()
+        activation_store.do_store()
+        composition_store.do_store()
+        dependency_store.do_store()
+        env_store.do_store()
+        evaluation_store.do_store()
+        fileAccess_store.do_store()
+        stageTags_store.do_store()
+        member_store.do_store()
+        module_store.do_store()
+        user_store.do_store()
 
     for x in bundle.trials:
+        TrialDefinition.share(x.id)
         main_block=[c for c in bundle.codeBlocks if c.trial_id==x.id and x.main_id==c.id]
         main_block_code_hash=None
         if len(main_block)>0:
@@ -696,7 +696,7 @@ def db_tables():
     conn = relational.engine.raw_connection()
     try:
         cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name")
         tables = [row[0] for row in cursor.fetchall()]
         
         foreign_keys = {}
@@ -22,11 +22,26 @@ persistence_config.mock()
 #from .prov_deployment import TestProvDeployment
 from .prov_definition import TestCodeBlockDefinition
 from .prov_definition import TestCodeComponentDefinition
+from .prov_definition import TestDefinitionCache
 from .prov_definition import TestReconstruction
 from .prov_execution import TestScript, TestStmtExecution, TestExprExecution
 from .prov_execution import TestClassExecution, TestDepthExecution
+from .prov_execution import TestRepresentation
 from .dependency import TestClusterizer, TestClusterizerConfig
 from .dependency import TestProspectiveClusterizer
+from .persistence import TestEventLog, TestColumnarObjectStore
+from .persistence import TestBulkWriter, TestStoreFlusher
+from .persistence import TestIngestMode
+from .persistence import TestSchemaMigrations
+from .persistence import TestDefinitionSets
+from .persistence import TestContentEngines, TestFingerprintCache
+from .persistence import TestFileAccessContent, TestContentCapture
+from .persistence import TestCapturePolicy, TestPackEngine
+from .persistence import TestChunkedEngine, TestContentHashes
+from .persistence import TestThreadingEngine, TestContentSweep
+from .persistence import TestContentIndex
+from .persistence import TestProcessEngines, TestIncrementalTrees
+from .persistence import TestPyGitEngine
 from .dependency import TestActivationClusterizer, TestDependencyClusterizer
 from .cross_version_test import TestCrossVersion
 
@@ -55,6 +70,7 @@ for name, module in viewitems(tests_modules):
 definition = unittest.TestSuite()
 definition.addTests(loader.loadTestsFromTestCase(TestCodeBlockDefinition))
 definition.addTests(loader.loadTestsFromTestCase(TestCodeComponentDefinition))
+definition.addTests(loader.loadTestsFromTestCase(TestDefinitionCache))
 definition.addTests(loader.loadTestsFromTestCase(TestReconstruction))
 
 execution = unittest.TestSuite()
@@ -62,6 +78,7 @@ execution.addTests(loader.loadTestsFromTestCase(TestScript))
 execution.addTests(loader.loadTestsFromTestCase(TestStmtExecution))
 execution.addTests(loader.loadTestsFromTestCase(TestExprExecution))
 execution.addTests(loader.loadTestsFromTestCase(TestDepthExecution))
+execution.addTests(loader.loadTestsFromTestCase(TestRepresentation))
 execution.addTests(loader.loadTestsFromTestCase(TestClassExecution))
 
 collection = unittest.TestSuite()
@@ -75,6 +92,29 @@ dataflow.addTests(loader.loadTestsFromTestCase(TestActivationClusterizer))
 dataflow.addTests(loader.loadTestsFromTestCase(TestProspectiveClusterizer))
 dataflow.addTests(loader.loadTestsFromTestCase(TestClusterizerConfig))
 
+persistence = unittest.TestSuite()
+persistence.addTests(loader.loadTestsFromTestCase(TestEventLog))
+persistence.addTests(loader.loadTestsFromTestCase(TestColumnarObjectStore))
+persistence.addTests(loader.loadTestsFromTestCase(TestBulkWriter))
+persistence.addTests(loader.loadTestsFromTestCase(TestStoreFlusher))
+persistence.addTests(loader.loadTestsFromTestCase(TestIngestMode))
+persistence.addTests(loader.loadTestsFromTestCase(TestSchemaMigrations))
+persistence.addTests(loader.loadTestsFromTestCase(TestDefinitionSets))
+persistence.addTests(loader.loadTestsFromTestCase(TestContentEngines))
+persistence.addTests(loader.loadTestsFromTestCase(TestFingerprintCache))
+persistence.addTests(loader.loadTestsFromTestCase(TestFileAccessContent))
+persistence.addTests(loader.loadTestsFromTestCase(TestContentCapture))
+persistence.addTests(loader.loadTestsFromTestCase(TestCapturePolicy))
+persistence.addTests(loader.loadTestsFromTestCase(TestPackEngine))
+persistence.addTests(loader.loadTestsFromTestCase(TestChunkedEngine))
+persistence.addTests(loader.loadTestsFromTestCase(TestContentHashes))
+persistence.addTests(loader.loadTestsFromTestCase(TestContentSweep))
+persistence.addTests(loader.loadTestsFromTestCase(TestContentIndex))
+persistence.addTests(loader.loadTestsFromTestCase(TestThreadingEngine))
+persistence.addTests(loader.loadTestsFromTestCase(TestProcessEngines))
+persistence.addTests(loader.loadTestsFromTestCase(TestIncrementalTrees))
+persistence.addTests(loader.loadTestsFromTestCase(TestPyGitEngine))
+
 
 def load_tests(loader, tests, pattern):
     """Create test suite"""
@@ -83,5 +123,6 @@ def load_tests(loader, tests, pattern):
     suite.addTests(doctests)
     suite.addTests(collection)
     suite.addTests(dataflow)
+    suite.addTests(persistence)
     suite.addTests(loader.loadTestsFromTestCase(TestCrossVersion))
     return suite
@@ -17,7 +17,7 @@ from ...now.persistence.lightweight import ObjectStore, SharedObjectStore
 from ...now.persistence.lightweight import CodeBlockLW, CodeComponentLW
 from ...now.persistence.lightweight import ActivationLW, EvaluationLW
 from ...now.persistence.lightweight import DependencyLW, FileAccessLW
-from ...now.persistence.lightweight import StageTagsLW
+from ...now.persistence.lightweight import StageTagsLW, LoopSummaryLW
 
 from ...now.persistence.lightweight import ModuleLW
 from ...now.persistence.lightweight import MemberLW
@@ -27,6 +27,8 @@ from ...now.persistence.models.trial import Trial
 from ...now.persistence.models.head import Head
 from ...now.persistence.models.tag import Tag
 from ...now.persistence.models.graph_cache import GraphCache
+from ...now.persistence.models.trial_definition import TrialDefinition
+from ...now.persistence.models.trial_definition import DEFINITION_SETS
 from ...now.persistence import relational
 from ...now.collection.metadata import Metascript
 
@@ -39,7 +41,7 @@ def restart_object_store(trial_id=None):
     """Restart all object store"""
     global components, blocks, evaluations, activations, dependencies
     global file_accesses, modules, members
-    global environment_attrs, arguments
+    global environment_attrs, arguments, loop_summaries
     global meta
 
     if not trial_id:
@@ -57,6 +59,7 @@ def restart_object_store(trial_id=None):
     modules = meta.modules_store
     environment_attrs = meta.environment_attrs_store
     arguments = meta.arguments_store
+    loop_summaries = meta.loop_summaries_store
 
 restart_object_store()
 
@@ -74,10 +77,14 @@ def erase_database():
     relational.session.execute(DependencyLW.model.t.delete())
     relational.session.execute(FileAccessLW.model.t.delete())
     relational.session.execute(StageTagsLW.model.t.delete())
+    relational.session.execute(LoopSummaryLW.model.t.delete())
     relational.session.execute(MemberLW.model.t.delete())
     relational.session.execute(ModuleLW.model.t.delete())
     relational.session.execute(EnvironmentAttrLW.model.t.delete())
     relational.session.execute(ArgumentLW.model.t.delete())
+    relational.session.execute(TrialDefinition.t.delete())
+    for table in DEFINITION_SETS.values():
+        relational.session.execute(table.delete())
     relational.session.expire_all()
     restart_object_store()
 
@@ -0,0 +1,46 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test provenance persistence"""
+
+from __future__ import (absolute_import, print_function,
+                        division)
+
+from .test_event_log import TestEventLog
+from .test_columnar import TestColumnarObjectStore
+from .test_bulk import TestBulkWriter, TestStoreFlusher, TestIngestMode
+from .test_migrations import TestSchemaMigrations
+from .test_trial_definition import TestDefinitionSets
+from .test_content import TestContentEngines, TestFingerprintCache
+from .test_content import TestFileAccessContent, TestContentCapture
+from .test_content import TestCapturePolicy, TestPackEngine
+from .test_content import TestChunkedEngine, TestContentHashes
+from .test_content import TestThreadingEngine, TestContentSweep
+from .test_content import TestContentIndex
+from .test_content import TestProcessEngines, TestIncrementalTrees
+from .test_content import TestPyGitEngine
+
+__all__ = [
+    "TestEventLog",
+    "TestColumnarObjectStore",
+    "TestBulkWriter",
+    "TestStoreFlusher",
+    "TestIngestMode",
+    "TestSchemaMigrations",
+    "TestDefinitionSets",
+    "TestContentEngines",
+    "TestFingerprintCache",
+    "TestFileAccessContent",
+    "TestContentCapture",
+    "TestCapturePolicy",
+    "TestPackEngine",
+    "TestChunkedEngine",
+    "TestContentHashes",
+    "TestContentSweep",
+    "TestContentIndex",
+    "TestThreadingEngine",
+    "TestProcessEngines",
+    "TestIncrementalTrees",
+    "TestPyGitEngine",
+]
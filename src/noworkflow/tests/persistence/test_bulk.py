@@ -0,0 +1,246 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test single-transaction bulk writer, flusher, and ingest mode"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from datetime import datetime
+from unittest import mock
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import StaticPool
+
+from ...now.persistence import relational
+from ...now.persistence.content import safeopen
+from ...now.persistence.models import Trial
+from ...now.persistence.relational_database import STORAGE_PROFILES
+from ...now.persistence.relational_database import apply_pragmas
+from ...now.persistence.lightweight import BulkWriter, ObjectStore
+from ...now.persistence.lightweight import DependencyLW, EvaluationLW
+from ...now.persistence.lightweight import FileAccessLW, StoreFlusher
+from ..collection_testcase import CollectionTestCase
+
+
+class TestBulkWriter(unittest.TestCase):
+    """Test bulk writer of lightweight object rows"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        relational.base.metadata.create_all(self.engine, tables=[
+            table for table in relational.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+
+    def select(self, sql):
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.exec_driver_sql(sql)]
+
+    def test_rows_are_read_from_slots(self):
+        store = ObjectStore(FileAccessLW)
+        access = store.add_object("t", "data.txt", 0.5)
+        self.assertEqual(-1, access.activation_id)
+        self.assertEqual(
+            tuple(access[key] for key in FileAccessLW.columns()), access.row()
+        )
+        self.assertIsNone(
+            access.row()[FileAccessLW.columns().index("activation_id")])
+
+    def test_stores_share_transaction(self):
+        evaluations = ObjectStore(EvaluationLW)
+        evaluations.add("t", 1, 1, None, "<open>")
+        evaluations.add("t", 2, 1, 0.5, "2")
+        dependencies = ObjectStore(DependencyLW)
+        dependencies.add("t", 1, 2, 1, 1, "dependency", True, None, None, None)
+        with BulkWriter(self.engine) as writer:
+            evaluations.do_store(False, writer)
+            dependencies.do_store(False, writer)
+        self.assertEqual({"evaluation": 2, "dependency": 1}, writer.counts)
+        self.assertEqual([(1, None, "<open>"), (2, 0.5, "2")], self.select(
+            "select id, checkpoint, repr from evaluation order by id"))
+        self.assertEqual([(1,)], self.select(
+            "select reference from dependency"))
+
+    def test_store_rows_converts_positional_rows(self):
+        start = datetime(2016, 1, 2, 3, 4, 5)
+        with self.engine.begin() as conn:
+            Trial.store_rows(("id", "start", "status"), [
+                ("t1", start, "finished"), ("t2", None, "running"),
+            ], conn)
+        self.assertEqual([
+            ("t1", str(start), "finished"), ("t2", None, "running"),
+        ], self.select("select id, start, status from trial order by id"))
+
+    def test_errors_roll_back_the_transaction(self):
+        evaluations = ObjectStore(EvaluationLW)
+        evaluations.add("t", 1, 1, 0.5, "1")
+        with self.assertRaises(RuntimeError):
+            with BulkWriter(self.engine) as writer:
+                evaluations.do_store(False, writer)
+                raise RuntimeError("interrupted")
+        self.assertEqual([], self.select("select id from evaluation"))
+
+
+class TestStoreFlusher(CollectionTestCase):
+    """Test background flusher of partial stores"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        # Share the memory database with the writer thread
+        self.engine = create_engine(
+            "sqlite://", poolclass=StaticPool,
+            connect_args={"check_same_thread": False})
+        relational.base.metadata.create_all(self.engine, tables=[
+            table for table in relational.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+        self.evaluations = ObjectStore(EvaluationLW)
+        self.flusher = StoreFlusher([self.evaluations], engine=self.engine)
+
+    def tearDown(self):
+        if self.flusher.is_alive():
+            self.flusher.queue.put(None)
+            self.flusher.join()
+
+    def select(self, sql):
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.exec_driver_sql(sql)]
+
+    def drained_ids(self):
+        position = EvaluationLW.columns().index("id")
+        return [row[position] for row in self.evaluations.drain()]
+
+    def test_drain_removes_complete_objects(self):
+        self.evaluations.add("t", 1, 1, 0.5, "1")
+        running = self.evaluations.add_object("t", 2, 1, -1, "<open>")
+        self.assertEqual([1], self.drained_ids())
+        self.assertEqual([running], list(self.evaluations.values()))
+        self.assertEqual([], self.evaluations.drain())
+        running.checkpoint = 0.7
+        self.assertEqual([2], self.drained_ids())
+        self.assertFalse(self.evaluations.has_items())
+
+    def test_partial_and_final_stores_write_rows_once(self):
+        self.flusher.start()
+        self.evaluations.add("t", 1, 1, 0.5, "1")
+        running = self.evaluations.add_object("t", 2, 1, -1, "<open>")
+        self.flusher.flush()
+        self.flusher.wait()
+        self.assertEqual([(1,)], self.select("select id from evaluation"))
+        running.checkpoint = 0.7
+        self.evaluations.add("t", 3, 1, 0.8, "3")
+        self.evaluations.add("t", 4, 1, -1, "<open>")
+        self.flusher.flush()
+        self.flusher.stop()
+        with BulkWriter(self.engine) as writer:
+            self.evaluations.do_store(False, writer)
+        self.assertEqual({"evaluation": 1}, writer.counts)
+        self.assertEqual([(1, 0.5), (2, 0.7), (3, 0.8), (4, None)], self.select(
+            "select id, checkpoint from evaluation order by id"))
+
+    def test_full_queue_blocks_the_collector(self):
+        self.flusher = StoreFlusher(
+            [self.evaluations], max_batches=1, engine=self.engine)
+        self.evaluations.add("t", 1, 1, 0.5, "1")
+        self.flusher.flush()
+        self.evaluations.add("t", 2, 1, 0.5, "2")
+        collector = threading.Thread(target=self.flusher.flush)
+        collector.start()
+        collector.join(0.2)
+        self.assertTrue(collector.is_alive())
+        self.flusher.start()
+        collector.join()
+        self.flusher.stop()
+        self.assertEqual([(1,), (2,)], self.select(
+            "select id from evaluation order by id"))
+
+    def test_periodic_partial_stores(self):
+        self.script("def f():\n"
+                    "    return 1\n"
+                    "a = f()\n"
+                    "b = f()\n"
+                    "# other", call_storage_frequency=1)
+        collector = self.metascript.execution.collector
+        with mock.patch.object(collector, "partial_store") as partial_store:
+            self.execute()
+        self.assertGreaterEqual(partial_store.call_count, 2)
+
+    def test_writer_errors_are_raised_by_store(self):
+        self.script("a = 1\n"
+                    "# other")
+        self.execute()
+        collector = self.metascript.execution.collector
+        # Database without tables
+        self.flusher = StoreFlusher(
+            collector.storage_stores(), engine=create_engine("sqlite://"))
+        self.flusher.start()
+        collector.flusher = self.flusher
+        collector.partial_store()
+        with self.assertRaises(sqlite3.OperationalError):
+            collector.store(partial=True)
+        evaluations = collector.evaluations
+        id_ = evaluations.add("t", 1, 1, 0.5, "1")
+        collector.partial_store()
+        self.assertIn(id_, [
+            evaluation.id for evaluation in evaluations.values()])
+        with self.assertRaises(sqlite3.OperationalError):
+            collector.store(partial=False)
+        self.assertIsNone(collector.flusher)
+
+
+class TestIngestMode(unittest.TestCase):
+    """Test storage profiles and deferred index creation"""
+    # pylint: disable=missing-docstring
+
+    def indexes(self):
+        with relational.engine.connect() as conn:
+            return {name for name, in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def test_ingest_mode_drops_and_recreates_indexes(self):
+        names = {index.name for index in relational.secondary_indexes()}
+        self.assertIn("ix_evaluation_activation_id", names)
+        self.assertTrue(names <= self.indexes())
+        with relational.ingest_mode():
+            with relational.ingest_mode():
+                self.assertFalse(names & self.indexes())
+            self.assertFalse(names & self.indexes())
+        self.assertTrue(names <= self.indexes())
+
+    def test_disabled_ingest_mode_keeps_indexes(self):
+        with relational.ingest_mode(False):
+            self.assertIn("ix_evaluation_activation_id", self.indexes())
+
+    def test_missing_indexes_are_recreated(self):
+        with relational.engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_evaluation_activation_id")
+        relational.create_indexes()
+        self.assertIn("ix_evaluation_activation_id", self.indexes())
+
+    def test_bulk_profile_pragmas(self):
+        directory = tempfile.mkdtemp()
+        try:
+            engine = create_engine(
+                "sqlite:///" + os.path.join(directory, "db.sqlite"))
+            event.listen(
+                engine, "connect", apply_pragmas(STORAGE_PROFILES["bulk"]))
+            with engine.connect() as conn:
+                values = [
+                    conn.exec_driver_sql("PRAGMA " + name).scalar()
+                    for name in ("journal_mode", "synchronous",
+                                 "cache_size", "temp_store")
+                ]
+            engine.dispose()
+            self.assertEqual(["wal", 1, -65536, 2], values)
+        finally:
+            with safeopen.use_safe_open():
+                shutil.rmtree(directory)
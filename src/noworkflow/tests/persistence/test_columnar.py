@@ -0,0 +1,88 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test columnar object store"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+
+from unittest import mock
+
+from ...now.persistence.lightweight import ObjectStore, EvaluationLW
+from ...now.persistence.lightweight import columnar
+from ...now.persistence.lightweight.columnar import columnar_evaluations
+from ...now.persistence.lightweight.columnar import columnar_dependencies
+
+
+class TestColumnarObjectStore(unittest.TestCase):
+    """Test columnar object store"""
+    # pylint: disable=missing-docstring
+
+    def test_views_behave_as_lightweight_objects(self):
+        store = columnar_evaluations()
+        first = store.add_object("t", 1, 1, None, "<open>")
+        second = store.add_object("t", 2, 1, 0.5, "2")
+        second.set_reference(first)
+        self.assertIsInstance(first, EvaluationLW)
+        self.assertIs(first, store[1])
+        self.assertIs(first, store[2].same())
+        self.assertEqual(1, second.member_container_id)
+        first.members["x"] = 3
+        self.assertEqual({"x": 3}, store[1].members)
+        self.assertFalse(first.is_complete())
+        self.assertTrue(second.is_complete())
+
+    def test_rows_match_object_store(self):
+        regular = ObjectStore(EvaluationLW)
+        store = columnar_evaluations()
+        for args in (("t", 1, 1, None, "<open>"), ("t", 2, 1, 0.5, "2")):
+            regular.add(*args)
+            store.add(*args)
+        self.assertEqual(
+            [obj.row() for obj in regular.values()], list(store.rows())
+        )
+
+    def test_drain_marks_complete_rows(self):
+        store = columnar_evaluations()
+        store.add("t", 1, 1, None, "<open>")
+        store.add("t", 2, 1, 0.5, "2")
+        self.assertEqual(1, len(store.drain()))
+        self.assertEqual([1], [obj.id for obj in store.values()])
+        store[1].checkpoint = 1.0
+        self.assertEqual([(1, 1.0)], [
+            (row[1], row[2]) for row in store.drain()
+        ])
+        self.assertFalse(store.has_items())
+
+    def test_unsupported_values_use_side_storage(self):
+        store = columnar_dependencies()
+        store.add("t", 1, 2, 1, 3, "dependency", False, 1, 4, ("a", 1))
+        self.assertEqual(("a", 1), store[1].key)
+        self.assertEqual(1 << 70, store.add_object(
+            "t", 1 << 70, 2, 1, 3, "dependency", True, None, None, None
+        ).dependent_activation_id)
+        rows = list(store.rows())
+        self.assertEqual((False, 1, 4, ("a", 1)), rows[0][7:])
+        self.assertEqual((True, None, None, None), rows[1][7:])
+
+    def test_flushed_rows_are_removed_from_columns(self):
+        store = columnar_evaluations()
+        running = store.add_object("t", 1, 1, None, "<open>")
+        for index in range(2, 10):
+            store.add("t", index, 1, 0.5, str(index))
+        running.set_reference(store[4])
+        live = store[6]
+        with mock.patch.object(columnar, "COMPACT_ROWS", 2):
+            self.assertEqual(8, len(store.drain()))
+        self.assertEqual([1, 4, 6], list(store.ids))
+        self.assertIs(live, store[6])
+        self.assertEqual("6", live.repr)
+        self.assertEqual("4", running.same().repr)
+        with self.assertRaises(KeyError):
+            store[5]                                                             # pylint: disable=pointless-statement
+        later = store.add_object("t", 10, 1, 0.5, "10")
+        self.assertIs(later, store[10])
+        running.checkpoint = 1.0
+        self.assertEqual([1, 10], [row[1] for row in store.drain()])
@@ -0,0 +1,1049 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test content database engines"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zlib
+
+from types import SimpleNamespace
+from unittest import mock
+
+from ...now.collection.prov_execution.capture import ContentCapture
+from ...now.collection.prov_execution.capture import CapturePolicy
+from ...now.collection.prov_execution.capture import STORE, HASH, SKIP
+from ...now.collection.prov_execution.collector import file_fingerprint
+from ...now.persistence import content
+from ...now.persistence.config import PersistenceConfig
+from ...now.persistence.content_database import ContentDatabase
+from ...now.persistence.lightweight import FileAccessLW
+from ...now.persistence.content import safeopen
+from ...now.persistence.content.base import CHUNK_SIZE, open_content
+from ...now.persistence.content.chunked_engine import ChunkedEngine
+from ...now.persistence.content.chunked_engine import CHUNKS_DIR, MAX_CHUNK
+from ...now.persistence.content.chunked_engine import iter_cdc_chunks
+from ...now.persistence.content.fingerprints import FingerprintCache
+from ...now.persistence.content.gitbase import write_loose_blob
+from ...now.persistence.content.hashes import split, tag
+from ...now.persistence.content.index import ContentIndex, CONTENT_INDEX_FILE
+from ...now.persistence.content.index import append_hashes, locked
+from ...now.persistence.content import index as index_module
+from ...now.persistence.content.gitbase import GitContentDatabaseEngine
+from ...now.persistence.content.pack_engine import PackEngine, index_name
+from ...now.persistence.content.pack_engine import RECORD_SIZE, HASH_SIZE
+from ...now.persistence.content.parallel import create_threading
+from ...now.persistence.content.parallel import create_distributed
+from ...now.persistence.content.parallel import create_pool
+from ...now.persistence.content.plain_engine import PlainEngine
+from ...now.persistence.event_log import EventLog
+from ...now.persistence.references import logged_hashes
+from ..collection_testcase import CollectionTestCase
+
+try:
+    from ...now.persistence.content import pygit_engine
+except ImportError:
+    pygit_engine = None
+
+
+class NonSeekable(io.RawIOBase):
+    """Binary stream that does not support seek"""
+
+    def __init__(self, data):
+        super(NonSeekable, self).__init__()
+        self.stream = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.stream.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class FailingStream(io.BytesIO):
+    """Binary stream that fails after a number of reads"""
+
+    def __init__(self, data, reads):
+        super(FailingStream, self).__init__(data)
+        self.reads = reads
+
+    def read(self, size=-1):
+        self.reads -= 1
+        if self.reads < 0:
+            raise OSError("read failed")
+        return super(FailingStream, self).read(size)
+
+
+def temporary_files(path):
+    """Return names of temporary files in path"""
+    return [
+        name for _, _, names in os.walk(path)
+        for name in names if name.startswith("tmp_")
+    ]
+
+
+class TempProjectTestCase(unittest.TestCase):
+    """Base of tests that store contents in a temporary project"""
+    # pylint: disable=missing-docstring
+
+    engine_class = PlainEngine
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config = PersistenceConfig()
+        self.config.path = self.directory
+
+    def tearDown(self):
+        with safeopen.use_safe_open():
+            shutil.rmtree(self.directory)
+
+    def engine(self, cls=None, content_hash=None):
+        """Create and connect engine of the temporary project"""
+        self.config.content_hash = content_hash
+        engine = (cls or self.engine_class)(self.config)
+        engine.connect(self.config)
+        return engine
+
+
+class TestContentEngines(TempProjectTestCase):
+    """Test chunked puts of bytes, file paths, and streams"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        super(TestContentEngines, self).setUp()
+        self.data = os.urandom(3 * CHUNK_SIZE + 7)
+        self.path = os.path.join(self.directory, "data.bin")
+        with safeopen.std_open(self.path, "wb") as fil:
+            fil.write(self.data)
+
+    def test_open_content_sizes(self):
+        for value in (self.data, self.path, NonSeekable(self.data)):
+            with open_content(value) as (stream, size):
+                self.assertEqual(len(self.data), size)
+                self.assertEqual(self.data, stream.read())
+
+    def test_plain_put_path_and_stream(self):
+        content_path = os.path.join(self.directory, "content")
+        expected = hashlib.sha1(self.data).hexdigest()
+        for value in (self.data, self.path, NonSeekable(self.data)):
+            self.assertEqual(expected, PlainEngine.do_put(content_path, value))
+        with safeopen.std_open(os.path.join(
+                content_path, expected[:2], expected[2:]), "rb") as fil:
+            self.assertEqual(self.data, fil.read())
+        # No temporary files are left behind
+        self.assertEqual([expected[:2]], os.listdir(content_path))
+
+    def test_failed_plain_put_removes_temporary_file(self):
+        content_path = os.path.join(self.directory, "content")
+        with self.assertRaises(OSError):
+            PlainEngine.do_put(content_path, FailingStream(self.data, 2))
+        self.assertEqual([], temporary_files(content_path))
+
+    def test_contents_are_read_once(self):
+        content_path = os.path.join(self.directory, "content")
+        os.makedirs(os.path.join(self.directory, "objects"))
+        # The stream fails if it is read again after its 4 chunks
+        for _ in range(2):
+            PlainEngine.do_put(content_path, FailingStream(self.data, 4))
+            write_loose_blob(self.directory, FailingStream(self.data, 4))
+        self.assertEqual([], temporary_files(self.directory))
+
+    def test_loose_blob(self):
+        os.makedirs(os.path.join(self.directory, "objects"))
+        header = "blob {}\0".format(len(self.data)).encode("ascii")
+        expected = hashlib.sha1(header + self.data).hexdigest()
+        self.assertEqual(expected, write_loose_blob(self.directory, self.path))
+        with safeopen.std_open(os.path.join(
+                self.directory, "objects", expected[:2], expected[2:]),
+                                "rb") as fil:
+            self.assertEqual(header + self.data, zlib.decompress(fil.read()))
+
+
+class TestPackEngine(TempProjectTestCase):
+    """Test contents appended to pack files"""
+    # pylint: disable=missing-docstring
+
+    engine_class = PackEngine
+
+    def packs(self, engine):
+        return sorted(
+            name for name in os.listdir(engine.content_path)
+            if name.endswith(".pack"))
+
+    def test_put_get_and_find_subhash(self):
+        engine = self.engine()
+        hashes = [engine.put("content {}".format(i).encode("ascii"))
+                  for i in range(100)]
+        self.assertEqual(hashes[0], engine.put(b"content 0"))
+        # Contents of the open pack are available before the index
+        self.assertEqual(b"content 7", engine.get(hashes[7]))
+        engine.close()
+        engine = self.engine()
+        self.assertEqual(1, len(self.packs(engine)))
+        for i, content_hash in enumerate(hashes):
+            self.assertEqual(hashlib.sha1(
+                "content {}".format(i).encode("ascii")).hexdigest(),
+                             content_hash)
+            self.assertEqual("content {}".format(i).encode("ascii"),
+                             engine.get(content_hash))
+            self.assertEqual(content_hash,
+                             engine.find_subhash(content_hash[:7]))
+        self.assertEqual(sorted(hashes), engine.listAll())
+        self.assertIsNone(engine.find_subhash("zzzzzz"))
+        with self.assertRaises(KeyError):
+            engine.get("0" * 40)
+        engine.close()
+
+    def test_pack_without_index_is_scanned(self):
+        engine = self.engine()
+        content_hash = engine.put(b"interrupted")
+        engine.writing_file.flush()
+        other = self.engine()
+        self.assertEqual(b"interrupted", other.get(content_hash))
+        self.assertEqual(content_hash, other.put(b"interrupted"))
+        other.close()
+        engine.close()
+
+    def test_contents_are_read_once(self):
+        data = os.urandom(3 * CHUNK_SIZE + 7)
+        engine = self.engine()
+        content_hash = engine.put(FailingStream(data, 4))
+        self.assertEqual(content_hash, engine.put(FailingStream(data, 4)))
+        with self.assertRaises(OSError):
+            engine.put(FailingStream(data + b"x", 2))
+        engine.close()
+        engine = self.engine()
+        self.assertEqual([content_hash], engine.listAll())
+        self.assertEqual(data, engine.get(content_hash))
+        pack_name = os.path.join(engine.content_path, self.packs(engine)[0])
+        # The failed put did not leave an incomplete record
+        self.assertEqual(RECORD_SIZE.size + len(data) + HASH_SIZE,
+                         os.path.getsize(pack_name))
+        engine.close()
+
+    def test_packs_of_duplicates_are_removed(self):
+        engine = self.engine()
+        engine.put(b"content")
+        engine.close()
+        engine = self.engine()
+        engine.put(io.BytesIO(b"content"))
+        engine.close()
+        self.assertEqual(1, len(self.packs(engine)))
+
+    def test_compaction_merges_packs(self):
+        hashes = []
+        for i in range(3):
+            engine = self.engine()
+            hashes.append(engine.put("trial {}".format(i).encode("ascii")))
+            hashes.append(engine.put(b"shared"))
+            engine.close()
+        engine = self.engine()
+        self.assertEqual(3, len(self.packs(engine)))
+        engine.gc(keep=set(hashes[1:]))
+        engine.close()
+        packs = self.packs(engine)
+        self.assertEqual(1, len(packs))
+        self.assertTrue(os.path.isfile(index_name(
+            os.path.join(engine.content_path, packs[0]))))
+        self.assertEqual(sorted(set(hashes[1:])), engine.listAll())
+        self.assertEqual(b"trial 2", engine.get(hashes[4]))
+        with self.assertRaises(KeyError):
+            engine.get(hashes[0])
+        engine.close()
+
+
+class TestChunkedEngine(TempProjectTestCase):
+    """Test contents deduplicated by content-defined chunks"""
+    # pylint: disable=missing-docstring
+
+    engine_class = ChunkedEngine
+
+    def setUp(self):
+        super(TestChunkedEngine, self).setUp()
+        self.chunked = self.engine()
+        self.data = "".join(
+            "{},{},row {}\n".format(i, i * 7919 % 10007, i % 13)
+            for i in range(200000)
+        ).encode("ascii")
+
+    def stored_size(self):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(
+                os.path.join(self.chunked.content_path, CHUNKS_DIR))
+            for name in names
+        )
+
+    def test_chunks_are_bounded_and_reassembled(self):
+        chunks = list(iter_cdc_chunks(io.BytesIO(self.data), len(self.data)))
+        self.assertGreater(len(chunks), 1)
+        self.assertTrue(all(len(chunk) <= MAX_CHUNK for chunk in chunks))
+        self.assertEqual(self.data, b"".join(chunks))
+
+    def test_put_and_get(self):
+        expected = hashlib.sha1(self.data).hexdigest()
+        for value in (self.data, NonSeekable(self.data)):
+            self.assertEqual(expected, self.chunked.put(value, "data.csv"))
+        self.assertEqual(self.data, self.chunked.get(expected))
+        self.assertEqual(expected, self.chunked.find_subhash(expected[:6]))
+        self.assertEqual([expected], self.chunked.listAll())
+        empty = self.chunked.put(b"", "empty")
+        self.assertEqual(b"", self.chunked.get(empty))
+
+    def test_failed_write_removes_temporary_file(self):
+        with mock.patch("os.replace", side_effect=OSError("replace failed")):
+            with self.assertRaises(OSError):
+                self.chunked.put(self.data, "data.csv")
+        self.assertEqual([], temporary_files(self.chunked.content_path))
+        self.assertEqual([], self.chunked.listAll())
+
+    def test_changed_versions_share_chunks(self):
+        self.chunked.put(self.data, "data.csv")
+        size = self.stored_size()
+        position = len(self.data) // 2
+        changed = (self.data[:100] + self.data[150:position] +
+                   b"inserted,row\n" + self.data[position:])
+        content_hash = self.chunked.put(changed, "data.csv")
+        self.assertEqual(changed, self.chunked.get(content_hash))
+        self.assertLess(self.stored_size() - size, len(self.data) // 4)
+
+
+class TestContentHashes(TempProjectTestCase):
+    """Test tagged hashes of content hash algorithms"""
+    # pylint: disable=missing-docstring
+
+    def test_tags(self):
+        self.assertEqual("a" * 40, tag("sha1", "a" * 40))
+        self.assertEqual(("sha1", "a" * 40), split("a" * 40))
+        self.assertEqual(("blake2b", "a" * 40),
+                         split(tag("blake2b", "a" * 40)))
+
+    def test_mixed_store(self):
+        engine = self.engine()
+        sha1_hash = engine.put(b"first", "first")
+        self.assertEqual(hashlib.sha1(b"first").hexdigest(), sha1_hash)
+        engine = self.engine(content_hash="blake2b")
+        blake_hash = engine.put(b"second", "second")
+        expected = hashlib.blake2b(b"second", digest_size=20).hexdigest()
+        self.assertEqual("blake2b-" + expected, blake_hash)
+        self.assertEqual(blake_hash, engine.hash(io.BytesIO(b"second")))
+        self.assertEqual(blake_hash, engine.put(b"second", "other"))
+        # The algorithm is kept without config
+        engine = self.engine()
+        self.assertEqual("blake2b", engine.algorithm)
+        self.assertEqual(b"first", engine.get(sha1_hash))
+        self.assertEqual(b"second", engine.get(blake_hash))
+        self.assertEqual(sorted([sha1_hash, blake_hash]), engine.listAll())
+        self.assertEqual(sha1_hash, engine.find_subhash(sha1_hash[:6]))
+        self.assertEqual(blake_hash, engine.find_subhash(expected[:6]))
+        self.assertEqual(blake_hash, engine.find_subhash(blake_hash[:14]))
+        self.assertIsNone(engine.find_subhash("blake2b-zz"))
+
+    def test_chunked_engine(self):
+        engine = self.engine(ChunkedEngine, "blake2b")
+        data = os.urandom(3 * MAX_CHUNK)
+        content_hash = engine.put(data, "data")
+        self.assertEqual("blake2b", split(content_hash)[0])
+        self.assertEqual(data, engine.get(content_hash))
+        self.assertEqual([content_hash], engine.listAll())
+        self.assertEqual(content_hash,
+                         engine.find_subhash(split(content_hash)[1][:6]))
+
+    def test_unknown_algorithm(self):
+        with self.assertRaises(ValueError):
+            self.engine(content_hash="md4")
+
+
+class TestContentIndex(TempProjectTestCase):
+    """Test persistent index of content hashes"""
+    # pylint: disable=missing-docstring
+
+    def test_puts_of_other_engines_are_read(self):
+        engine, other = self.engine(), self.engine()
+        first = engine.put(b"first", "first")
+        self.assertEqual([first], other.listAll())
+        second = other.put(b"second", "second")
+        self.assertEqual(sorted([first, second]), engine.listAll())
+        self.assertEqual(first, engine.find_subhash(first[:6]))
+
+    def test_index_is_rebuilt_from_existing_contents(self):
+        engine = self.engine()
+        content_hash = engine.put(b"content", "content")
+        os.remove(engine.index.path)
+        self.assertEqual([content_hash], self.engine().listAll())
+        self.assertTrue(engine.index.exists())
+
+    def test_find_prefix_of_tagged_hashes(self):
+        index = ContentIndex(os.path.join(self.directory, CONTENT_INDEX_FILE))
+        sha1_hash = "b" + "1" * 39
+        blake_hash = tag("blake2b", "c" * 40)
+        index.rebuild([sha1_hash, blake_hash])
+        self.assertEqual(sha1_hash, index.find_prefix("b"))
+        self.assertEqual(blake_hash, index.find_prefix("cc"))
+        self.assertEqual(blake_hash, index.find_prefix("blake2b-c"))
+        self.assertIsNone(index.find_prefix("d"))
+
+    def test_removals_compact_the_log(self):
+        path = os.path.join(self.directory, CONTENT_INDEX_FILE)
+        index, other = ContentIndex(path), ContentIndex(path)
+        hashes = ["{:040x}".format(i) for i in range(2000)]
+        index.rebuild([])
+        index.add(hashes)
+        self.assertEqual(2000, len(other))
+        index.remove(hashes[1:])
+        with safeopen.std_open(path, "r") as log:
+            self.assertEqual([hashes[0]], log.read().split())
+        index.add(hashes[1:2])
+        self.assertEqual(hashes[:2], list(other))
+
+    def test_compaction_keeps_appends_of_other_processes(self):
+        path = os.path.join(self.directory, CONTENT_INDEX_FILE)
+        index = ContentIndex(path)
+        hashes = ["{:040x}".format(i) for i in range(3)]
+        index.rebuild(hashes[:2])
+        self.assertEqual(hashes[:2], list(index))
+        append_hashes(path, hashes[2:])
+        index.compact()
+        with safeopen.std_open(path, "r") as log:
+            self.assertEqual(hashes, log.read().split())
+
+    @unittest.skipUnless(index_module.fcntl, "requires fcntl")
+    def test_appends_wait_for_compaction(self):
+        path = os.path.join(self.directory, CONTENT_INDEX_FILE)
+        index = ContentIndex(path)
+        index.rebuild([])
+        thread = threading.Thread(
+            target=append_hashes, args=(path, ["a" * 40]))
+        with locked(path, exclusive=True):
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual([], list(index))
+        thread.join()
+        self.assertEqual(["a" * 40], list(index))
+
+    def test_chunked_engine(self):
+        engine = self.engine(ChunkedEngine)
+        content_hash = engine.put(b"content", "content")
+        engine.put(b"content", "content")
+        self.assertEqual([content_hash], self.engine(ChunkedEngine).listAll())
+        with safeopen.std_open(engine.index.path, "r") as log:
+            self.assertEqual([content_hash], log.read().split())
+
+
+class TestContentSweep(TempProjectTestCase):
+    """Test removal of unreferenced contents"""
+    # pylint: disable=missing-docstring
+
+    def test_plain_engine(self):
+        engine = self.engine(PlainEngine)
+        live = engine.put(b"live", "live")
+        dead = engine.put(b"dead!", "dead")
+        self.assertEqual(([], 0), engine.sweep({live}, dry_run=True))
+        self.assertEqual(([dead], 5), engine.sweep({live}, True, grace=0))
+        self.assertEqual([dead, live], sorted(engine.listAll()))
+        self.assertEqual(([dead], 5), engine.sweep({live}, grace=0))
+        self.assertEqual([live], engine.listAll())
+
+    def test_chunked_engine_keeps_shared_chunks(self):
+        engine = self.engine(ChunkedEngine)
+        data = os.urandom(3 * MAX_CHUNK)
+        live = engine.put(data, "live")
+        dead = engine.put(data + os.urandom(MAX_CHUNK), "dead")
+        removed, size = engine.sweep({live}, grace=0)
+        self.assertEqual([dead], removed)
+        self.assertGreaterEqual(size, MAX_CHUNK)
+        self.assertLess(size, 2 * MAX_CHUNK)
+        self.assertEqual([live], engine.listAll())
+        self.assertEqual(data, engine.get(live))
+
+    def test_pack_engine(self):
+        engine = self.engine(PackEngine)
+        live = engine.put(b"live", "live")
+        dead = engine.put(b"dead!", "dead")
+        engine.close()
+        self.assertEqual(([], 0), engine.sweep({live}, dry_run=True))
+        removed, size = engine.sweep({live}, dry_run=True, grace=0)
+        self.assertEqual([dead], removed)
+        self.assertEqual(8 + 5 + 20, size)
+        self.assertEqual(sorted([live, dead]), engine.listAll())
+        engine.sweep({live}, grace=0)
+        self.assertEqual([live], engine.listAll())
+        self.assertEqual(b"live", engine.get(live))
+        engine.close()
+
+    def age(self, hours=2):
+        """Set modification time of stored files to some hours ago"""
+        mtime = time.time() - hours * 3600
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                os.utime(os.path.join(root, name), (mtime, mtime))
+
+    def check_reused_contents_are_kept(self, engine):
+        reused = engine.put(b"reused", "reused")
+        engine.close()
+        self.age()
+        self.assertEqual(reused, engine.put(b"reused", "reused"))
+        engine.close()
+        self.assertEqual(([], 0), engine.sweep(set()))
+        self.assertEqual([reused], engine.listAll())
+        self.assertEqual(b"reused", engine.get(reused))
+        return reused
+
+    def test_plain_engine_keeps_reused_contents(self):
+        engine = self.engine(PlainEngine)
+        reused = self.check_reused_contents_are_kept(engine)
+        old = engine.put(b"old", "old")
+        self.age()
+        self.assertEqual([old], engine.sweep({reused})[0])
+
+    def test_chunked_engine_keeps_reused_contents(self):
+        self.check_reused_contents_are_kept(self.engine(ChunkedEngine))
+
+    def test_pack_engine_keeps_reused_contents(self):
+        engine = self.engine(PackEngine)
+        self.check_reused_contents_are_kept(engine)
+        engine.close()
+
+    def test_forget_marks_fingerprints_as_not_stored(self):
+        cache = FingerprintCache(os.path.join(self.directory, "log"))
+        name = os.path.join(self.directory, "data.txt")
+        with safeopen.std_open(name, "w") as fil:
+            fil.write("data")
+        os.utime(name, (1, 1))
+        stat = os.stat(name)
+        cache.set(name, stat, "abc")
+        cache.forget(["abc"])
+        cache = FingerprintCache(cache.path)
+        self.assertIsNone(cache.get(name, stat, stored=True))
+        self.assertEqual("abc", cache.get(name, stat))
+
+    def test_logged_hashes(self):
+        path = os.path.join(self.directory, "logs", "trial.nwlog")
+        columns = FileAccessLW.columns()
+        row = [None] * len(columns)
+        row[columns.index("content_hash_before")] = "abc"
+        row[columns.index("content_hash_after")] = "def"
+        log = EventLog(path).open()
+        log.write_rows(FileAccessLW, [tuple(row)])
+        log.close()
+        self.assertEqual(["abc", "def"], sorted(logged_hashes(path)))
+
+
+class TestThreadingEngine(TempProjectTestCase):
+    """Test bounded pool of threads of the threading engines"""
+    # pylint: disable=missing-docstring
+
+    def engine(self, cls=PlainEngine, **kwargs):                                 # pylint: disable=arguments-differ
+        return super(TestThreadingEngine, self).engine(
+            create_threading(cls, **kwargs))
+
+    def test_pool_is_bounded(self):
+        batches = []
+
+        class Recording(PlainEngine):
+            def put_batch(self, batch):
+                batches.append(len(batch))
+                for attrs in batch:
+                    self.do_put(*attrs)
+        started = threading.active_count()
+        engine = self.engine(Recording, workers=2, max_pending=64,
+                             batch_bytes=32)
+        expected = [engine.put("content {}".format(i).encode("ascii"))
+                    for i in range(200)]
+        self.assertLessEqual(threading.active_count(), started + 2)
+        self.assertLessEqual(engine.pending, 64)
+        engine.close()
+        self.assertEqual(0, engine.pending)
+        self.assertEqual(200, sum(batches))
+        self.assertLessEqual(max(batches), 4)
+        for i, content_hash in enumerate(expected):
+            self.assertEqual("content {}".format(i).encode("ascii"),
+                             engine.get(content_hash))
+        self.assertEqual(started, threading.active_count())
+
+    def test_worker_errors_are_raised(self):
+
+        class Failing(PlainEngine):
+            @staticmethod
+            def do_put(content_path, content, algorithm="sha1"):
+                raise OSError("disk full")
+        engine = self.engine(Failing, workers=1)
+        engine.put(b"content")
+        with self.assertRaises(OSError):
+            engine.close()
+
+
+class TestProcessEngines(TempProjectTestCase):
+    """Test batches of contents sent to worker processes"""
+    # pylint: disable=missing-docstring
+
+    def check_engine(self, factory):
+        engine = self.engine(factory(PlainEngine, batch_size=8))
+        contents = [os.urandom(1000 * i) for i in range(20)]
+        hashes = [engine.put(value, "file") for value in contents]
+        self.assertEqual(
+            [hashlib.sha1(value).hexdigest() for value in contents], hashes)
+        engine.commit_content("commit")
+        self.assertFalse(engine.processes_started)
+        for content_hash, value in zip(hashes, contents):
+            self.assertEqual(value, engine.get(content_hash))
+
+    def test_distributed(self):
+        self.check_engine(create_distributed)
+
+    def test_pool(self):
+        self.check_engine(create_pool)
+
+    def test_worker_errors_are_raised(self):
+
+        class Failing(PlainEngine):
+            @staticmethod
+            def do_put(content_path, content, algorithm="sha1"):
+                raise OSError("disk full")
+        engine = self.engine(create_pool(Failing))
+        engine.put(b"content")
+        with self.assertRaises(OSError):
+            engine.close()
+
+
+class MemoryGitEngine(GitContentDatabaseEngine):
+    """Git engine that keeps trees and commits in memory"""
+    # pylint: disable=missing-docstring
+
+    def __init__(self, config):
+        super(MemoryGitEngine, self).__init__(config)
+        self.written = []
+        self.commits = []
+        self.trees = {}
+
+    def close(self):
+        pass
+
+    def create_commit_object(self, message, tree):
+        self.commits.append(tree)
+        return tree
+
+    def new_tree(self, parent):
+        return (parent, {})
+
+    def insert_blob(self, tree, basename, value):
+        tree[1][basename] = value
+
+    def insert_tree(self, tree, basename, value):
+        tree[1][basename] = self.trees[value]
+
+    def write_tree(self, tree):
+        self.written.append(tree[0])
+        tree_hash = hashlib.sha1(repr(sorted(
+            tree[1].items())).encode("utf-8")).hexdigest()
+        self.trees[tree_hash] = tree[1]
+        return tree_hash
+
+
+class TestIncrementalTrees(TempProjectTestCase):
+    """Test trees updated by the git engines commits"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        super(TestIncrementalTrees, self).setUp()
+        self.git = MemoryGitEngine(self.config)
+        self.git.set_path(self.config)
+
+    def put(self, filename, value):
+        self.git.reuse(value, os.path.join(self.directory, filename))
+
+    def test_only_changed_trees_are_written(self):
+        self.put(os.path.join("a", "b", "x.txt"), "1")
+        self.put(os.path.join("c", "y.txt"), "2")
+        self.git.commit_content("first")
+        self.assertEqual(
+            {"a": {"b": {"x.txt": "1"}}, "c": {"y.txt": "2"}},
+            self.git.trees[self.git.commits[-1]])
+        self.git.written = []
+        self.put(os.path.join("a", "b", "z.txt"), "3")
+        self.git.commit_content("second")
+        self.assertEqual([os.path.join("a", "b"), "a", ""],
+                         self.git.written)
+        self.assertEqual(
+            {"a": {"b": {"x.txt": "1", "z.txt": "3"}}, "c": {"y.txt": "2"}},
+            self.git.trees[self.git.commits[-1]])
+
+    def test_commit_without_changes(self):
+        self.git.commit_content("empty")
+        self.assertEqual({}, self.git.trees[self.git.commits[-1]])
+        self.put("x.txt", "1")
+        self.git.commit_content("first")
+        self.git.written = []
+        self.git.commit_content("second")
+        self.assertEqual([], self.git.written)
+        self.assertEqual(self.git.commits[-2], self.git.commits[-1])
+
+    def test_versioned_names_are_unique_across_threads(self):
+        names = []
+
+        def increment():
+            for _ in range(500):
+                names.append(self.git._increment("x.txt"))               # pylint: disable=protected-access
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(2000, len(set(names)))
+        self.assertIn("x.txt - v2000", names)
+
+    def test_full_rebuild(self):
+        self.git.incremental_trees = False
+        self.put(os.path.join("a", "x.txt"), "1")
+        self.git.commit_content("first")
+        self.put("y.txt", "2")
+        self.git.written = []
+        self.git.commit_content("second")
+        self.assertEqual(["a", ""], self.git.written)
+        self.assertEqual({"a": {"x.txt": "1"}, "y.txt": "2"},
+                         self.git.trees[self.git.commits[-1]])
+
+
+@unittest.skipUnless(pygit_engine, "requires pygit2")
+class TestPyGitEngine(TempProjectTestCase):
+    """Test repository handles and batched puts of the pygit2 engine"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        super(TestPyGitEngine, self).setUp()
+        self.pygit = self.engine(pygit_engine.PyGitEngine)
+        self.pygit.set_path(self.config)
+        self.path = os.path.join(self.directory, "data.bin")
+        with safeopen.std_open(self.path, "wb") as fil:
+            fil.write(b"path content")
+
+    def test_handles_are_reused_by_thread(self):
+        content_path = self.pygit.content_path
+        repo = pygit_engine.repository(content_path)
+        self.assertIs(repo, pygit_engine.repository(content_path))
+        self.assertIs(repo, self.pygit.repo)
+        other = []
+        thread = threading.Thread(target=lambda: other.extend([
+            pygit_engine.repository(content_path),
+            pygit_engine.repository(content_path),
+        ]))
+        thread.start()
+        thread.join()
+        self.assertIsNot(repo, other[0])
+        self.assertIs(other[0], other[1])
+
+    def test_handles_are_reopened_after_forks(self):
+        content_path = self.pygit.content_path
+        repo = pygit_engine.repository(content_path)
+        with mock.patch("os.getpid", return_value=os.getpid() + 1):
+            forked = pygit_engine.repository(content_path)
+            self.assertIsNot(repo, forked)
+            self.assertIs(forked, pygit_engine.repository(content_path))
+        self.assertIsNot(forked, pygit_engine.repository(content_path))
+
+    def test_put_many_records_hashes_as_put(self):
+        contents = [
+            (b"bytes content", "a.txt"),
+            (self.path, "b.txt"),
+            (io.BytesIO(b"stream content"), "c.txt"),
+        ]
+        content_path = self.pygit.content_path
+        hashes, many_hashes = {}, {}
+        expected = [
+            pygit_engine.PyGitEngine.do_put(
+                content_path, hashes, content, filename)
+            for content, filename in contents
+        ]
+        for content, _ in contents:
+            if isinstance(content, io.BytesIO):
+                content.seek(0)
+        self.assertEqual(expected, pygit_engine.PyGitEngine.do_put_many(
+            content_path, many_hashes, contents))
+        self.assertEqual(hashes, many_hashes)
+        self.assertEqual(b"bytes content", self.pygit.get(hashes["a.txt"]))
+        self.assertEqual(b"path content", self.pygit.get(hashes["b.txt"]))
+
+    def test_put_batch_records_hashes_of_versioned_names(self):
+        self.pygit.put_batch([
+            self.pygit.put_attr(b"first", "x.txt"),
+            self.pygit.put_attr(b"second", "x.txt"),
+        ])
+        self.assertEqual(2, len(self.pygit.object_hashes))
+        self.assertEqual([b"first", b"second"], sorted(
+            self.pygit.get(content_hash)
+            for content_hash in self.pygit.object_hashes.values()))
+
+
+class TestFingerprintCache(TempProjectTestCase):
+    """Test persistent content hashes of unchanged files"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        super(TestFingerprintCache, self).setUp()
+        self.path = os.path.join(self.directory, "data.txt")
+        self.write("data", 1000)
+
+    def write(self, text, mtime):
+        with safeopen.std_open(self.path, "w") as fil:
+            fil.write(text)
+        os.utime(self.path, (mtime, mtime))
+
+    def database(self, strict=False):
+        config = PersistenceConfig()
+        config.content_engine = "plain"
+        config.strict_fingerprints = strict
+        database = ContentDatabase(config)
+        config.connect(self.directory)
+        puts = []
+        put = database.content_database_engine.put
+
+        def counting_put(value, filename="generic"):
+            puts.append(filename)
+            return put(value, filename)
+        database.content_database_engine.put = counting_put
+        return database, puts
+
+    def test_cache_persists_across_instances(self):
+        log = os.path.join(self.directory, "fingerprints")
+        cache = FingerprintCache(log)
+        stat = os.stat(self.path)
+        self.assertIsNone(cache.get(self.path, stat))
+        cache.set(self.path, stat, "hash")
+        self.assertEqual("hash", FingerprintCache(log).get(self.path, stat))
+        self.write("other", 2000)
+        self.assertIsNone(FingerprintCache(log).get(
+            self.path, os.stat(self.path)))
+
+    def test_recently_modified_files_are_not_cached(self):
+        cache = FingerprintCache(os.path.join(self.directory, "fingerprints"))
+        os.utime(self.path)
+        stat = os.stat(self.path)
+        cache.set(self.path, stat, "hash")
+        self.assertIsNone(cache.get(self.path, stat))
+
+    def test_put_file_skips_unchanged_files(self):
+        database, puts = self.database()
+        expected = hashlib.sha1(b"data").hexdigest()
+        self.assertEqual(expected, database.put_file(self.path))
+        database, puts = self.database()
+        self.assertEqual(expected, database.put_file(self.path))
+        self.assertEqual([], puts)
+        self.write("new", 2000)
+        self.assertEqual(
+            hashlib.sha1(b"new").hexdigest(), database.put_file(self.path))
+        self.assertEqual([self.path], puts)
+
+    def test_strict_mode_hashes_again(self):
+        database, puts = self.database()
+        database.put_file(self.path)
+        # Same size and mtime, different content
+        self.write("atad", 1000)
+        database, puts = self.database()
+        self.assertEqual(
+            hashlib.sha1(b"data").hexdigest(), database.put_file(self.path))
+        database, puts = self.database(strict=True)
+        self.assertEqual(
+            hashlib.sha1(b"atad").hexdigest(), database.put_file(self.path))
+        self.assertEqual([self.path], puts)
+
+
+class TestFileAccessContent(CollectionTestCase):
+    """Test content hashes of file accesses"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "data.txt")
+        with safeopen.std_open(self.path, "w") as fil:
+            fil.write("data")
+        self.puts = []
+        put = content.put
+
+        def counting_put(value, filename="generic"):
+            if filename == self.path:
+                self.puts.append(filename)
+            return put(value, filename)
+        content.put = counting_put
+
+    def tearDown(self):
+        del content.put
+        with safeopen.use_safe_open():
+            shutil.rmtree(self.directory)
+
+    def test_unchanged_file_is_hashed_once_per_activation(self):
+        self.script("def f(name):\n"
+                    "    open(name).read()\n"
+                    "    open(name).read()\n"
+                    "f({!r})\n"
+                    "# other".format(self.path), capture_workers=4)
+        self.execute()
+        self.metascript.execution.collector.content_capture.wait()
+        accesses = list(self.metascript.file_accesses_store.store.values())
+        self.assertEqual(2, len(accesses))
+        expected = hashlib.sha1(b"data").hexdigest()
+        for access in accesses:
+            self.assertEqual(expected, access.content_hash_before)
+            self.assertEqual(expected, access.content_hash_after)
+        self.assertEqual([self.path], self.puts)
+
+    def test_written_file_is_hashed_again(self):
+        self.script("def f(name):\n"
+                    "    open(name).read()\n"
+                    "    with open(name, 'w') as fil:\n"
+                    "        fil.write('new')\n"
+                    "    open(name).read()\n"
+                    "f({!r})\n"
+                    "# other".format(self.path), capture_workers=0)
+        self.execute()
+        accesses = sorted(
+            self.metascript.file_accesses_store.store.values(),
+            key=lambda access: access.id
+        )
+        old = hashlib.sha1(b"data").hexdigest()
+        new = hashlib.sha1(b"new").hexdigest()
+        self.assertEqual(["r", "w", "r"], [access.mode for access in accesses])
+        self.assertEqual(
+            [old, old, new],
+            [access.content_hash_before for access in accesses]
+        )
+        # The write access ends with the open call, after truncating the file
+        self.assertEqual(
+            [old, hashlib.sha1(b"").hexdigest(), new],
+            [access.content_hash_after for access in accesses]
+        )
+
+    def test_capture_skips_changed_files(self):
+        self.script("# other")
+        collector = self.metascript.execution.collector
+        fingerprint = file_fingerprint(self.path)
+        access = FileAccessLW(1, "t", self.path, 0)
+        with safeopen.std_open(self.path, "a") as fil:
+            fil.write("changed")
+        activation = SimpleNamespace(parent=None, content_hashes={})
+        collector.capture_content(
+            activation, self.path, fingerprint, [access])
+        self.assertIsNone(access.content_hash_after)
+        self.assertTrue(access.is_complete())
+        self.assertEqual([], self.puts)
+
+
+class TestContentCapture(unittest.TestCase):
+    """Test bounded pool of content captures"""
+    # pylint: disable=missing-docstring
+
+    def test_wait_for_file_captures(self):
+        capture = ContentCapture(2, max_pending=2)
+        events = {name: threading.Event() for name in "ab"}
+        done = []
+
+        def work(name):
+            events[name].wait(5)
+            done.append(name)
+        capture.submit("a", work, "a")
+        capture.submit("b", work, "b")
+        events["a"].set()
+        capture.wait("a")
+        self.assertEqual(["a"], done)
+        events["b"].set()
+        capture.close()
+        self.assertEqual(["a", "b"], done)
+
+    def test_errors_are_raised(self):
+        capture = ContentCapture(1)
+
+        def fail():
+            raise OSError("capture")
+        capture.submit("a", fail)
+        with self.assertRaises(OSError):
+            capture.close()
+
+
+class TestCapturePolicy(CollectionTestCase):
+    """Test capture policy of file contents"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        with safeopen.use_safe_open():
+            shutil.rmtree(self.directory)
+
+    def path(self, *parts):
+        return os.path.join(self.directory, *parts)
+
+    def test_globs_extensions_and_size(self):
+        policy = CapturePolicy(
+            include=["data/*"], exclude=["*.log"], max_size="1K",
+            hash_only=["NPY"], base_path=self.directory
+        )
+        self.assertEqual(STORE, policy.action(self.path("data", "a.csv"), 10))
+        self.assertEqual(SKIP, policy.action(self.path("out", "a.csv"), 10))
+        self.assertEqual(SKIP, policy.action(self.path("data", "a.log"), 10))
+        self.assertEqual(HASH, policy.action(self.path("data", "a.npy"), 10))
+        self.assertEqual(HASH, policy.action(self.path("data", "b.csv"), 1025))
+        self.assertEqual(STORE, policy.action(self.path("data", "b.csv")))
+
+    def test_sampling_of_large_directories(self):
+        for index in range(20):
+            with safeopen.std_open(self.path(str(index)), "w") as fil:
+                fil.write("x")
+        policy = CapturePolicy(
+            sample_dir_files=10, sample_every=4, base_path=self.directory)
+        actions = [
+            policy.action(self.path(str(index)), 1) for index in range(20)
+        ]
+        self.assertIn(STORE, actions)
+        self.assertIn(HASH, actions)
+        self.assertNotIn(SKIP, actions)
+        policy.sample_dir_files = 20
+        self.assertEqual(STORE, policy.action(self.path("1"), 1))
+
+    def test_file_is_extended_by_arguments(self):
+        filename = self.path("policy.json")
+        with safeopen.std_open(filename, "w") as fil:
+            fil.write('{"exclude": ["*.tmp"], "max_size": 10}')
+        policy = CapturePolicy.load(filename).update(
+            exclude=["*.log"], hash_only=["npy"])
+        self.assertFalse(policy.is_default())
+        self.assertTrue(CapturePolicy().is_default())
+        loaded = CapturePolicy.loads(policy.dumps())
+        self.assertEqual(["*.tmp", "*.log"], loaded.exclude)
+        self.assertEqual([".npy"], loaded.hash_only)
+        self.assertEqual(10, loaded.max_size)
+
+    def test_collection_follows_policy(self):
+        for name in ("a.txt", "b.npy", "c.log"):
+            with safeopen.std_open(self.path(name), "w") as fil:
+                fil.write(name)
+        self.script("for name in ['a.txt', 'b.npy', 'c.log']:\n"
+                    "    open({!r} + name).read()\n"
+                    "# other".format(self.path("")), capture_workers=0,
+                    capture_policy=CapturePolicy(
+                        exclude=["*.log"], hash_only=[".npy"],
+                        base_path=self.directory))
+        self.execute()
+        accesses = {
+            os.path.basename(access.name): access
+            for access in self.metascript.file_accesses_store.store.values()
+        }
+        for name in ("a.txt", "b.npy"):
+            self.assertEqual(
+                hashlib.sha1(name.encode("ascii")).hexdigest(),
+                accesses[name].content_hash_before)
+        self.assertIsNone(accesses["c.log"].content_hash_before)
+        self.assertIsNone(accesses["c.log"].content_hash_after)
+        self.assertIn(accesses["a.txt"].content_hash_before, content.temp)
+        self.assertNotIn(accesses["b.npy"].content_hash_before, content.temp)
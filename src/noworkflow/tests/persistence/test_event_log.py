@@ -0,0 +1,70 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test event log storage"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from ...now.persistence.content import safeopen
+from ...now.persistence.event_log import EventLog
+from ...now.persistence.lightweight import ObjectStore
+from ...now.persistence.lightweight import DependencyLW, EvaluationLW
+
+
+class TestEventLog(unittest.TestCase):
+    """Test append-only event log"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "logs", "trial.nwlog")
+
+    def tearDown(self):
+        with safeopen.use_safe_open():
+            shutil.rmtree(self.directory)
+
+    def test_write_once_objects_are_not_retained(self):
+        log = EventLog(self.path).open()
+        store = ObjectStore(DependencyLW)
+        store.set_event_log(log)
+        store.add("t", 1, 2, 1, 3, "dependency", False, None, None, None)
+        log.close()
+        self.assertFalse(store.has_items())
+        rows = list(EventLog(self.path).read())
+        self.assertEqual(1, len(rows))
+        model, columns, row = rows[0]
+        self.assertEqual("Dependency", model)
+        self.assertEqual(DependencyLW.columns(), columns)
+        self.assertEqual(("t", 1, 1, 2, 1, 3, "dependency", False, None, None,
+                          None), row)
+
+    def test_partial_store_appends_complete_objects(self):
+        log = EventLog(self.path).open()
+        store = ObjectStore(EvaluationLW)
+        store.set_event_log(log)
+        store.add("t", 1, 1, None, "<open>")
+        store.add("t", 2, 1, 0.5, "2")
+        store.do_store(partial=True)
+        log.close()
+        self.assertEqual([1], [obj.id for obj in store.values()])
+        rows = [row for _, _, row in EventLog(self.path).read()]
+        self.assertEqual(2, len(rows))
+        self.assertEqual(None, rows[0][2])
+        self.assertEqual("2", rows[1][5])
+
+    def test_truncated_record_is_ignored(self):
+        log = EventLog(self.path).open()
+        store = ObjectStore(DependencyLW)
+        store.set_event_log(log)
+        for _ in range(3):
+            store.add("t", 1, 2, 1, 3, "dependency", False, None, None, None)
+        log.close()
+        with safeopen.std_open(self.path, "rb+") as fil:
+            fil.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual(2, len(list(EventLog(self.path).read())))
@@ -0,0 +1,117 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test schema migrations and query plans"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+
+from sqlalchemy import create_engine
+
+from ...now.persistence import relational
+from ...now.persistence.migrations import latest_version, migrate
+from ...now.persistence.migrations import schema_version
+from ...now.persistence.models import CodeBlock, CodeComponent, Composition
+from ...now.persistence.query_plans import analyze, plan_problems
+
+
+class TestSchemaMigrations(unittest.TestCase):
+    """Test versioned migrations and analysis of the standard queries"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        relational.base.metadata.create_all(self.engine, tables=[
+            table for table in relational.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+
+    def execute(self, *statements):
+        with self.engine.begin() as conn:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+
+    def indexes(self):
+        with self.engine.connect() as conn:
+            return {name for name, in conn.exec_driver_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+    def version(self):
+        with self.engine.connect() as conn:
+            return schema_version(conn)
+
+    def test_new_databases_start_at_latest_version(self):
+        self.assertEqual([], migrate(self.engine, new_db=True))
+        self.assertEqual(latest_version(), self.version())
+        self.assertEqual([], migrate(self.engine))
+
+    def test_migration_upgrades_existing_database(self):
+        self.execute("DROP INDEX dependency_dependent",
+                     "DROP INDEX evaluation_activation")
+        self.assertEqual(0, self.version())
+        self.assertEqual(list(range(1, latest_version() + 1)),
+                         migrate(self.engine))
+        self.assertEqual(latest_version(), self.version())
+        indexes = self.indexes()
+        self.assertIn("dependency_dependent", indexes)
+        self.assertIn("evaluation_activation", indexes)
+        self.assertEqual([], migrate(self.engine))
+
+    def test_definition_tables_are_converted_to_sets(self):
+        engine = create_engine("sqlite://")
+        rows = {
+            CodeComponent: {"id": 1, "name": "x", "type": "name"},
+            CodeBlock: {"id": 2, "code_hash": "abc"},
+            Composition: {"id": 1, "part_id": 1, "whole_id": 2},
+        }
+        # Databases before definition sets store them in tables
+        with engine.begin() as conn:
+            for model, row in rows.items():
+                model.__table__.create(conn)
+                for trial_id in ("t1", "t2"):
+                    conn.execute(model.__table__.insert(),
+                                 dict(row, trial_id=trial_id))
+        relational.base.metadata.create_all(engine, tables=[
+            table for table in relational.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+        self.assertEqual(list(range(1, latest_version() + 1)),
+                         migrate(engine))
+        with engine.connect() as conn:
+            self.assertEqual("view", conn.exec_driver_sql(
+                "SELECT type FROM sqlite_master "
+                "WHERE name = 'code_component'").scalar())
+            self.assertEqual([("t1", "x"), ("t2", "x")], [
+                tuple(row) for row in conn.exec_driver_sql(
+                    "SELECT trial_id, name FROM code_component "
+                    "ORDER BY trial_id")
+            ])
+            self.assertEqual(1, len(conn.exec_driver_sql(
+                "SELECT DISTINCT set_id FROM trial_definition").fetchall()))
+            self.assertEqual(1, conn.exec_driver_sql(
+                "SELECT count(*) FROM code_block_set").scalar())
+        self.assertEqual([], migrate(engine))
+
+    def test_standard_queries_use_composite_indexes(self):
+        plans = analyze(self.engine, relational.session)
+        self.assertIn("Evaluation.dependencies_as_dependent",
+                      [plan.name for plan in plans])
+        self.assertEqual([], [plan for plan in plans if plan.problems])
+
+    def test_partial_searches_are_reported(self):
+        self.execute("DROP INDEX dependency_dependent",
+                     "DROP INDEX dependency_dependency")
+        plans = {
+            plan.name: plan
+            for plan in analyze(self.engine, relational.session)
+        }
+        problems = plans["Evaluation.dependencies_as_dependent"].problems
+        self.assertEqual(1, len(problems))
+        self.assertTrue(problems[0].startswith("partial search"))
+        self.assertEqual([], plans["Dependency.dependent"].problems)
+
+    def test_full_scans_are_reported(self):
+        self.assertEqual(["full scan: SCAN evaluation"], plan_problems(
+            ["SCAN evaluation", "SCAN CONSTANT ROW"], {"evaluation": 1}))
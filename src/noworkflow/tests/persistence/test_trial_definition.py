@@ -0,0 +1,158 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test definition sets shared by trials"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import unittest
+
+from sqlalchemy import create_engine
+
+from ...now.persistence import relational
+from ...now.persistence.migrations import migrate, schema_version
+from ...now.persistence.migrations import set_schema_version
+from ...now.persistence.models import CodeComponent
+from ...now.persistence.models.trial_definition import _share
+
+
+# Insert trigger of schema version 2
+OLD_INSERT_TRIGGER = """
+CREATE TRIGGER code_component_insert INSTEAD OF INSERT ON code_component
+BEGIN
+    INSERT OR IGNORE INTO trial_definition (trial_id, set_id)
+    VALUES (NEW.trial_id, NEW.trial_id);
+    INSERT INTO code_component_set (set_id, id, name)
+    VALUES ((SELECT set_id FROM trial_definition
+             WHERE trial_id = NEW.trial_id), NEW.id, NEW.name);
+END
+"""
+
+
+class TestDefinitionSets(unittest.TestCase):
+    """Test sharing and removal of definition sets"""
+    # pylint: disable=missing-docstring
+
+    def setUp(self):
+        self.engine = create_engine("sqlite://")
+        relational.base.metadata.create_all(self.engine, tables=[
+            table for table in relational.base.metadata.sorted_tables
+            if not table.info.get("view")
+        ])
+        migrate(self.engine, new_db=True)
+
+    def execute(self, *statements):
+        with self.engine.begin() as conn:
+            for statement in statements:
+                conn.exec_driver_sql(statement)
+
+    def query(self, statement):
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.exec_driver_sql(statement)]
+
+    def store(self, trial_id, names=("x", "y")):
+        """Store components as the collector does"""
+        insert = CodeComponent.__table__.insert().prefix_with("OR REPLACE")
+        with self.engine.begin() as conn:
+            conn.execute(insert, [
+                {"trial_id": trial_id, "id": index, "name": name}
+                for index, name in enumerate(names, 1)
+            ])
+
+    def store_trials(self, *trial_ids):
+        with self.engine.begin() as conn:
+            for trial_id in trial_ids:
+                conn.exec_driver_sql(
+                    "INSERT INTO trial (id) VALUES (?)", (trial_id,))
+        for trial_id in trial_ids:
+            self.store(trial_id)
+            with self.engine.begin() as conn:
+                _share(conn, trial_id)
+
+    def mapping(self):
+        return self.query(
+            "SELECT trial_id, set_id FROM trial_definition ORDER BY trial_id")
+
+    def stored_sets(self):
+        return self.query(
+            "SELECT DISTINCT set_id FROM code_component_set ORDER BY set_id")
+
+    def test_identical_trials_share_a_set(self):
+        self.store_trials("t1", "t2")
+        self.assertEqual([("t1", "t1"), ("t2", "t1")], self.mapping())
+        self.assertEqual([("t1",)], self.stored_sets())
+        self.assertEqual([("t1", "x"), ("t2", "x")], self.query(
+            "SELECT trial_id, name FROM code_component WHERE id = 1 "
+            "ORDER BY trial_id"))
+
+    def test_storing_again_keeps_the_shared_set(self):
+        self.store_trials("t1", "t2")
+        self.store("t2")
+        self.assertEqual([("t1", "t1"), ("t2", "t1")], self.mapping())
+        self.assertEqual([], self.query(
+            "SELECT trial_id FROM trial_definition WHERE digest IS NULL"))
+        self.assertEqual([("t1",)], self.stored_sets())
+        self.assertEqual(2, len(self.query(
+            "SELECT id FROM code_component WHERE trial_id = 't1'")))
+
+    def test_changed_rows_are_written_to_a_copy_of_the_set(self):
+        self.store_trials("t1", "t2")
+        self.store("t2", names=("x", "z"))
+        self.assertEqual([("t1", "x"), ("t1", "y"), ("t2", "x"),
+                          ("t2", "z")], self.query(
+                              "SELECT trial_id, name FROM code_component "
+                              "ORDER BY trial_id, id"))
+        self.assertEqual([("t1", "t1", True), ("t2", None, False)], [
+            (trial_id, digest and set_id, set_id == trial_id)
+            for trial_id, set_id, digest in self.query(
+                "SELECT trial_id, set_id, digest FROM trial_definition "
+                "ORDER BY trial_id")
+        ])
+        self.assertEqual(2, len(self.stored_sets()))
+
+    def test_deleted_rows_are_removed_from_a_copy_of_the_set(self):
+        self.store_trials("t1", "t2")
+        self.execute(
+            "DELETE FROM code_component WHERE trial_id = 't1' AND id = 1")
+        self.assertEqual([("t1", "y"), ("t2", "x"), ("t2", "y")], self.query(
+            "SELECT trial_id, name FROM code_component "
+            "ORDER BY trial_id, id"))
+        self.assertEqual(2, len(self.stored_sets()))
+
+    def test_deleted_trials_stop_referencing_the_set(self):
+        self.store_trials("t1", "t2")
+        self.execute("DELETE FROM trial WHERE id = 't1'")
+        self.assertEqual([("t2", "t1")], self.mapping())
+        self.assertEqual([("t1",)], self.stored_sets())
+        self.execute("DELETE FROM trial WHERE id = 't2'")
+        self.assertEqual([], self.mapping())
+        self.assertEqual([], self.stored_sets())
+
+    def test_distinct_sets_are_removed_with_their_trial(self):
+        self.store_trials("t1")
+        self.store("t2", names=("z",))
+        self.execute("DELETE FROM trial_definition WHERE trial_id = 't2'")
+        self.assertEqual([("t1",)], self.stored_sets())
+
+    def test_migration_replaces_the_view_triggers(self):
+        self.execute(
+            "DROP TRIGGER code_component_insert",
+            "DROP TRIGGER trial_definition_trial_delete",
+            "DROP TRIGGER trial_definition_delete",
+            OLD_INSERT_TRIGGER,
+        )
+        with self.engine.begin() as conn:
+            set_schema_version(conn, 2)
+        self.assertEqual([3, 4], migrate(self.engine))
+        with self.engine.connect() as conn:
+            self.assertEqual(4, schema_version(conn))
+        self.store_trials("t1", "t2")
+        self.store("t2")
+        self.assertEqual([("t1", "t1"), ("t2", "t1")], self.mapping())
+        self.store("t2", names=("z",))
+        self.assertEqual([("t1", "x")], self.query(
+            "SELECT trial_id, name FROM code_component WHERE id = 1 "
+            "AND trial_id = 't1'"))
+        self.execute("DELETE FROM trial")
+        self.assertEqual([], self.stored_sets())
@@ -9,10 +9,12 @@ from __future__ import (absolute_import, print_function,
 
 from .test_code_block_definition import TestCodeBlockDefinition
 from .test_code_component_definition import TestCodeComponentDefinition
+from .test_definition_cache import TestDefinitionCache
 from .test_reconstruction import TestReconstruction
 
 __all__ = [
     "TestCodeBlockDefinition",
     "TestCodeComponentDefinition",
+    "TestDefinitionCache",
     "TestReconstruction",
 ]
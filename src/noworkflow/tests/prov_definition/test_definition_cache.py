@@ -0,0 +1,91 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test definition cache"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+import shutil
+import tempfile
+
+from unittest import mock
+
+from ...now.collection.prov_definition.cache import DefinitionCache
+from ...now.persistence.content import safeopen
+
+from ..collection_testcase import CollectionTestCase
+
+
+CODE = ("def f(x):\n"
+        "    '''doc'''\n"
+        "    if x:\n"
+        "        return [i for i in range(x)]\n"
+        "a = f(2)\n"
+        "# other")
+
+
+class TestDefinitionCache(CollectionTestCase):
+    """Test definition cache"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        with safeopen.use_safe_open():
+            shutil.rmtree(self.directory)
+
+    def cached_script(self, code):
+        """Create metascript that uses the temporary cache"""
+        self.script(code)
+        definition = self.metascript.definition
+        definition.cache = DefinitionCache(self.metascript, self.directory)
+        return definition.cache
+
+    def definition_rows(self):
+        """Return definition provenance without trial ids"""
+        metascript = self.metascript
+        return [
+            [obj.row()[1:] for obj in store.values()]
+            for store in (metascript.code_components_store,
+                          metascript.code_blocks_store,
+                          metascript.compositions_store)
+        ]
+
+    def test_replay_cached_definition(self):
+        self.cached_script(CODE)
+        self.execute()
+        rows = self.definition_rows()
+        var_a = self.get_evaluation(name="a", mode="w")
+        self.assertEqual("[0, 1]", var_a.repr)
+
+        del self.executed
+        cache = self.cached_script(CODE)
+        with mock.patch.object(cache, "save") as save:
+            self.execute()
+        save.assert_not_called()
+        self.assertEqual(rows, self.definition_rows())
+        var_a = self.get_evaluation(name="a", mode="w")
+        self.assertEqual("[0, 1]", var_a.repr)
+
+    def key(self, cache):
+        """Return cache key of the current script"""
+        return cache.key("script", self.metascript.code,
+                         self.metascript.path, "exec", 1)
+
+    def test_changed_source_misses_cache(self):
+        cache = self.cached_script(CODE)
+        self.compile()
+        old_key = self.key(cache)
+        self.assertIsNotNone(cache.load(old_key, 1))
+        cache = self.cached_script(CODE.replace("range(x)", "range(x + 1)"))
+        new_key = self.key(cache)
+        self.assertNotEqual(old_key, new_key)
+        with mock.patch.object(cache, "load", wraps=cache.load) as load, \
+                mock.patch.object(cache, "save", wraps=cache.save) as save:
+            self.compile()
+        load.assert_called_once_with(new_key, 1)
+        save.assert_called_once()
+        self.assertEqual(new_key, save.call_args[0][0])
+        self.assertIsNone(cache.load(old_key, 1))
+        self.assertIsNotNone(cache.load(new_key, 1))
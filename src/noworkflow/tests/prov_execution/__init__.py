@@ -12,6 +12,7 @@ from .test_class_execution import TestClassExecution
 from .test_stmt_execution import TestStmtExecution
 from .test_expr_execution import TestExprExecution
 from .test_depth_execution import TestDepthExecution
+from .test_representation import TestRepresentation
 
 __all__ = [
     "TestScript",
@@ -19,4 +20,5 @@ __all__ = [
     "TestStmtExecution",
     "TestExprExecution",
     "TestDepthExecution",
+    "TestRepresentation",
 ]
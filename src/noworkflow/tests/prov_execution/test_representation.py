@@ -0,0 +1,132 @@
+# Copyright (c) 2016 Universidade Federal Fluminense (UFF)
+# Copyright (c) 2016 Polytechnic Institute of New York University.
+# This file is part of noWorkflow.
+# Please, consult the license terms in the LICENSE file.
+"""Test value representation"""
+from __future__ import (absolute_import, print_function,
+                        division, unicode_literals)
+
+from ...now.collection.prov_execution.representation import BoundedRepr
+from ...now.collection.prov_execution.summarizers import summarize
+
+from ..collection_testcase import CollectionTestCase
+
+
+class TestRepresentation(CollectionTestCase):
+    """Test value representation during collection"""
+    # pylint: disable=invalid-name
+
+    def test_bounded_repr_without_limits_matches_repr(self):
+        bounded = BoundedRepr()
+        for value in ([1, 2], {"b": 1, "a": [1, (2,)]}, (1,), {3, 1},
+                      set(), frozenset(), "x" * 5, {}, [[]], 10 ** 20):
+            self.assertEqual(repr(value), bounded.repr(value))
+
+    def test_bounded_repr_of_empty_sets(self):
+        bounded = BoundedRepr(max_depth=1, max_items=3)
+        self.assertEqual("set()", bounded.repr(set()))
+        self.assertEqual("frozenset()", bounded.repr(frozenset()))
+        self.assertEqual("[set(), frozenset()]",
+                         bounded.repr([set(), frozenset()]))
+
+    def test_bounded_repr_limits_items_and_depth(self):
+        bounded = BoundedRepr(max_depth=1, max_items=3)
+        self.assertEqual("[0, 1, 2, ...]", bounded.repr(list(range(1000))))
+        self.assertEqual("[[...], 1]", bounded.repr([[2], 1]))
+        self.assertEqual("{1: 2, ...}", BoundedRepr(max_items=1).repr(
+            {1: 2, 3: 4}
+        ))
+
+    def test_bounded_repr_limits_chars(self):
+        bounded = BoundedRepr(max_chars=20)
+        result = bounded.repr(["x" * 10] * 1000)
+        self.assertTrue(len(result) <= 20)
+        self.assertTrue(result.endswith("..."))
+
+    def test_repr_limits_in_collection(self):
+        self.script("a = list(range(100))\n"
+                    "# other", repr_max_items=2)
+        var_a = self.get_evaluation(name="a", mode="w")
+        self.assertEqual("[0, 1, ...]", var_a.repr)
+
+    def test_type_names_are_not_limited(self):
+        self.script("a = 1\n"
+                    "# other", repr_max_chars=5)
+        var_int = self.get_evaluation(name=self.rtype("int"), mode="w")
+        self.assertEqual(self.rtype("int"), var_int.repr)
+
+    def test_deferred_repr(self):
+        self.script("a = 1\n"
+                    "b = [a]\n"
+                    "# other", deferred_repr=True)
+        self.execute()
+        var_a = self.get_evaluation(name="a", mode="w")
+        var_b = self.get_evaluation(name="b", mode="w")
+        self.assertIsNone(var_a.repr)
+        self.assertTrue(var_b.repr.startswith("<list object at 0x"))
+        self.metascript.execution.collector.render_reprs()
+        self.assertEqual("1", var_a.repr)
+
+    def test_summarize_bytes(self):
+        self.assertEqual("b'ab'", summarize(b"ab"))
+        summary = summarize(b"x" * 100)
+        self.assertTrue(summary.startswith("<bytes len=100 digest="))
+        self.assertEqual(summary, summarize(bytes(b"x" * 100)))
+        self.assertNotEqual(summary, summarize(b"y" * 100))
+        self.assertIsNone(summarize([1]))
+
+    def test_summarize_ndarray(self):
+        try:
+            import numpy
+        except ImportError:
+            self.skipTest("numpy is not installed")
+        array = numpy.arange(12).reshape(3, 4)
+        summary = summarize(array)
+        self.assertTrue(summary.startswith(
+            "<ndarray shape=(3, 4) dtype={} digest=".format(array.dtype)
+        ))
+        self.assertEqual(summary, summarize(array.copy()))
+        self.assertNotEqual(summary, summarize(array + 1))
+        large = numpy.zeros(10 ** 7)
+        self.assertEqual(summarize(large), summarize(numpy.zeros(10 ** 7)))
+
+    def test_summarize_dataframe(self):
+        try:
+            import pandas
+        except ImportError:
+            self.skipTest("pandas is not installed")
+        frame = pandas.DataFrame({"x": [1, 2], "y": ["a", "b"]})
+        summary = summarize(frame)
+        self.assertTrue(summary.startswith(
+            "<DataFrame shape=(2, 2) columns=['x', 'y'] digests=["
+        ))
+        self.assertEqual(summary, summarize(frame.copy()))
+        frame["y"] = ["a", "c"]
+        self.assertNotEqual(summary, summarize(frame))
+
+    def test_summarize_wide_dataframe(self):
+        try:
+            import pandas
+        except ImportError:
+            self.skipTest("pandas is not installed")
+        frame = pandas.DataFrame({"c{}".format(i): [i] for i in range(50)})
+        summary = summarize(frame)
+        self.assertIn("'c19', '...'] digests=", summary)
+        self.assertNotIn("c20", summary)
+        self.assertEqual(21, summary.split("digests=")[1].count(",") + 1)
+        frame["c40"] = [0]
+        self.assertNotEqual(summary, summarize(frame))
+
+    def test_summaries_are_disabled_by_default(self):
+        self.script("a = b'x' * 100\n"
+                    "# other")
+        self.execute()
+        var_a = self.get_evaluation(name="a", mode="w")
+        self.assertEqual(repr(b"x" * 100), var_a.repr)
+
+    def test_summary_in_collection(self):
+        self.script("a = b'x' * 100\n"
+                    "# other", repr_max_chars=30, summarize_values=True)
+        self.execute()
+        var_a = self.get_evaluation(name="a", mode="w")
+        self.assertTrue(var_a.repr.startswith("<bytes len=100"))
@@ -8,6 +8,7 @@ from __future__ import (absolute_import, print_function,
                         division, unicode_literals)
 
 
+from ...now.collection.prov_execution.structures import LoopSampling
 from ...now.utils.cross_version import PY2, PY3, PY36, only
 from ..collection_testcase import CollectionTestCase
 
@@ -579,6 +580,34 @@ class TestStmtExecution(CollectionTestCase):
         self.assertEqual(var_x1_w.repr, "1")
         self.assertEqual(var_x2_w.repr, "2")
 
+    def test_for_loop_sampling(self):
+        self.script("for x in [1, 2, 3, 4, 5, 6]:\n"
+                    "    y = x\n"
+                    "# other", loop_sampling=LoopSampling(1, 3, 1))
+
+        var_ys_w = self.get_evaluations(name="y", mode="w")
+        self.assertEqual(["1", "4", "6"], [var.repr for var in var_ys_w])
+
+        summaries = list(self.metascript.loop_summaries_store.values())
+        self.assertEqual(1, len(summaries))
+        self.assertEqual(6, summaries[0].iterations)
+        self.assertEqual(3, summaries[0].elided)
+        self.assertTrue(summaries[0].elided_duration >= 0)
+
+    def test_for_loop_sampling_without_length(self):
+        self.script("for x in map(int, '12345'):\n"
+                    "    y = x\n"
+                    "z = 1\n"
+                    "# other", loop_sampling=LoopSampling(2, 0, 1))
+
+        var_ys_w = self.get_evaluations(name="y", mode="w")
+        self.assertEqual(["1", "2"], [var.repr for var in var_ys_w])
+        self.assertIsNotNone(self.get_evaluation(name="z", mode="w"))
+
+        summary, = self.metascript.loop_summaries_store.values()
+        self.assertEqual(5, summary.iterations)
+        self.assertEqual(3, summary.elided)
+
     def test_for_loop_multiple_assignment(self):
         self.script("lis = [(1, 2)]\n"
                     "for x, y in lis:\n"
@@ -630,6 +659,29 @@ class TestStmtExecution(CollectionTestCase):
 
         self.assertEqual(var_y.repr, "3")
 
+    def test_elif(self):
+        self.script("x = 0\n"
+                    "w = 1\n"
+                    "if x:\n"
+                    "    y = 2\n"
+                    "elif w:\n"
+                    "    y = 3\n"
+                    "z = 4\n"
+                    "# other")
+
+        var_x = self.get_evaluation(name="x", mode="r")
+        var_w = self.get_evaluation(name="w", mode="r")
+        var_y = self.get_evaluation(name="y", mode="w")
+        var_z = self.get_evaluation(name="z", mode="w")
+
+        self.assert_dependency(var_w, var_x, "condition")
+        self.assert_dependency(var_y, var_x, "condition")
+        self.assert_dependency(var_y, var_w, "condition")
+        self.assert_no_dependency(var_z, var_x)
+        self.assert_no_dependency(var_z, var_w)
+
+        self.assertEqual(var_y.repr, "3")
+
     def test_while(self):
         self.script("x = 2\n"
                     "while x:\n"